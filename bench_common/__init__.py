@@ -0,0 +1,7 @@
+"""
+Helpers shared by the collection, analysis and plotting scripts of this repository.
+
+The scripts are run from their own directories, they make this package importable with
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+"""
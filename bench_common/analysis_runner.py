@@ -0,0 +1,243 @@
+"""
+Run the symbolic analyses of many benchmarks concurrently.
+
+The analyses are CPU-bound SymPy work, one task per (benchmark, analysis). run_analyses() hands the
+tasks to a pool of IsolatedWorkers. Each task has its own wall-clock and memory limit, and a worker
+that exceeds a limit is killed and replaced. Every task ends in one AnalysisRecord with the status
+success, failure, timeout, memory or crash. store_records() writes the records to the
+analysis_results table:
+
+    records = run_analyses(benchmarks, ["work_depth", "total_volume", "op_in"], workers=16, timeout=600)
+    store_records("npbench_analysis_results.db", records)
+    print_summary(records)
+
+work_depth, total_volume and op_in go through the analysis store, which is keyed by the structural
+hash of the SDFG. After a DaCe or npbench update only the benchmarks whose SDFG changed are analyzed
+again, the others are served from the store and their records have cached set. update_hashes()
+records the hashes of a run and returns the SDFGs that changed since the previous one.
+"""
+import json
+import multiprocessing.connection
+import sqlite3
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from npbench.infrastructure import utilities as util
+
+from bench_common.isolated_worker import POLL_INTERVAL, IsolatedWorker, WorkerFailed
+
+#################### SQL for creating tables and inserting values ##################################
+analysis_results_table_sql = """
+CREATE TABLE IF NOT EXISTS analysis_results(
+    run_timestamp integer NOT NULL,
+    benchmark text NOT NULL,
+    analysis text NOT NULL,
+    preset text NOT NULL,
+    sdfg text NOT NULL,
+    status text NOT NULL,
+    seconds real,
+    result text,
+    detail text,
+    sdfg_hash text,
+    cached integer,
+    PRIMARY KEY (run_timestamp, benchmark, analysis)
+);
+"""
+insert_into_analysis_results_table_sql = """
+INSERT INTO analysis_results(
+    run_timestamp, benchmark, analysis, preset, sdfg, status, seconds, result, detail, sdfg_hash, cached
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+############################################ SQL end ############################################################
+
+# SDFG each analysis runs on by default, as in test_volume.py and test_implementations.py
+ANALYSES = {
+    "work_depth": "parsed",
+    "total_volume": "optimized",
+    "may_access": "optimized",
+    "op_in": "optimized",
+}
+STATUSES = ("success", "failure", "timeout", "memory", "crash")
+
+
+class AnalysisRecord(NamedTuple):
+    benchmark: str
+    analysis: str
+    preset: str
+    sdfg: str  # "parsed" or "optimized"
+    status: str  # one of STATUSES
+    seconds: float
+    result: Optional[List[str]] = None  # result expressions as strings
+    detail: Optional[str] = None  # traceback or reason of the failure
+    sdfg_hash: Optional[str] = None  # structural hash of the analyzed SDFG
+    cached: bool = False  # result served from the analysis store
+
+
+def _get_sdfg(benchmark, framework, kind: str):
+    import dace
+    from bench_common.sdfg_cache import get_bench_sdfg, get_optimized_sdfg
+
+    if kind == "parsed":
+        sdfg, _ = get_bench_sdfg(benchmark, framework)
+        return sdfg
+    return get_optimized_sdfg(benchmark, framework, dace.dtypes.DeviceType.CPU)
+
+
+def _run_analysis(benchmark_name: str, analysis: str, kind: str, preset: str, cache_size: int, line_size: int):
+    """ (result, structural hash of the SDFG, whether the result came from the analysis store) """
+    from npbench.infrastructure import (Benchmark, DaceFramework)
+    from bench_common.analysis_store import is_cached, op_in, structural_hash, total_volume, work_depth
+
+    benchmark = Benchmark(benchmark_name)
+    sdfg = _get_sdfg(benchmark, DaceFramework("dace_cpu"), kind)
+    sdfg_hash = structural_hash(sdfg)
+    substitutions = benchmark.info["parameters"][preset]
+    if analysis == "work_depth":
+        return work_depth(sdfg), sdfg_hash, is_cached(sdfg, "work_depth")
+    if analysis == "total_volume":
+        cached = is_cached(sdfg, "total_volume_closed_form")
+        return total_volume(sdfg), sdfg_hash, cached
+    if analysis == "may_access":
+        import dace.sdfg.performance_evaluation.may_access_analysis as maa
+        maa.analyze_sdfg(sdfg)
+        return (maa.approximate_total_volume(sdfg, substitutions), ), sdfg_hash, False
+    if analysis == "op_in":
+        params = {"cache_size": cache_size, "line_size": line_size, "assumptions": {k: 2 for k in substitutions}}
+        cached = is_cached(sdfg, "op_in", params)
+        return op_in(sdfg, **params), sdfg_hash, cached
+    raise ValueError(f"Unknown analysis {analysis}, expected one of {sorted(ANALYSES)}")
+
+
+def _analysis_worker(conn, preset: str, cache_size: int, line_size: int):
+    while (task := conn.recv()) is not None:
+        benchmark_name, analysis, kind = task
+        start = time.monotonic()
+        try:
+            result, sdfg_hash, cached = _run_analysis(benchmark_name, analysis, kind, preset, cache_size, line_size)
+            conn.send(("success", [str(r) for r in result], None, time.monotonic() - start, sdfg_hash, cached))
+        except Exception:
+            conn.send(("failure", None, traceback.format_exc(), time.monotonic() - start, None, False))
+
+
+def run_analyses(benchmarks: Iterable[str], analyses: Iterable[str] = tuple(ANALYSES), workers: int = 1,
+                 timeout: Optional[float] = None, memory_limit_mb: Optional[float] = None, preset: str = "S",
+                 sdfg: Optional[str] = None, cache_size: int = 2048, line_size: int = 64,
+                 on_record: Optional[Callable[[AnalysisRecord], None]] = None) -> List[AnalysisRecord]:
+    """
+    Run every analysis on every benchmark in up to workers processes.
+
+    :param timeout: Wall-clock limit per task in seconds, None for no limit.
+    :param memory_limit_mb: Resident set size limit per worker, None for no limit.
+    :param preset: Parameters for may_access and the symbols assumed by op_in.
+    :param sdfg: Run all analyses on the "parsed" or "optimized" SDFG instead of the defaults in ANALYSES.
+    :param on_record: Called with each record as soon as its task ends.
+    """
+    analyses = list(analyses)
+    for analysis in analyses:
+        if analysis not in ANALYSES:
+            raise ValueError(f"Unknown analysis {analysis}, expected one of {sorted(ANALYSES)}")
+    pending = deque((b, a, sdfg or ANALYSES[a]) for b in benchmarks for a in analyses)
+    workers = max(1, min(workers, len(pending)))
+    pool: List[Optional[IsolatedWorker]] = [None] * workers
+    running: List[Optional[tuple]] = [None] * workers  # (task, deadline, start)
+    records = []
+
+    def finish(task, status, seconds, result=None, detail=None, sdfg_hash=None, cached=False):
+        record = AnalysisRecord(task[0], task[1], preset, task[2], status, seconds, result, detail, sdfg_hash, cached)
+        records.append(record)
+        if on_record is not None:
+            on_record(record)
+
+    try:
+        while pending or any(running):
+            for i in range(workers):
+                if running[i] is None and pending:
+                    if pool[i] is None:
+                        pool[i] = IsolatedWorker(_analysis_worker, (preset, cache_size, line_size), memory_limit_mb)
+                    task = pending.popleft()
+                    pool[i].send(task)
+                    now = time.monotonic()
+                    running[i] = (task, None if timeout is None else now + timeout, now)
+
+            multiprocessing.connection.wait([pool[i].connection for i in range(workers) if running[i]],
+                                            timeout=POLL_INTERVAL)
+            for i in range(workers):
+                if running[i] is None:
+                    continue
+                task, deadline, start = running[i]
+                try:
+                    msg = pool[i].poll(deadline)
+                except WorkerFailed as e:
+                    pool[i].close()
+                    pool[i] = None
+                    running[i] = None
+                    finish(task, e.kind, time.monotonic() - start, detail=str(e))
+                    continue
+                if msg is not None:
+                    running[i] = None
+                    status, result, detail, seconds, sdfg_hash, cached = msg
+                    finish(task, status, seconds, result, detail, sdfg_hash, cached)
+    finally:
+        for worker in pool:
+            if worker is not None:
+                worker.close()
+    return records
+
+
+def _add_missing_columns(conn):
+    # Databases written before sdfg_hash and cached existed
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(analysis_results)")}
+    with conn:
+        for column, sql_type in (("sdfg_hash", "text"), ("cached", "integer")):
+            if column not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE analysis_results ADD COLUMN {column} {sql_type}")
+                except sqlite3.OperationalError:
+                    pass
+
+
+def store_records(database: str, records: Iterable[AnalysisRecord], run_timestamp: Optional[int] = None) -> int:
+    """ Write records to the analysis_results table and return the run timestamp. """
+    run_timestamp = run_timestamp or int(datetime.now(timezone.utc).timestamp() * 1000)
+    conn = util.create_connection(database)
+    util.create_table(conn=conn, create_table_sql=analysis_results_table_sql)
+    _add_missing_columns(conn)
+    with conn:
+        conn.executemany(insert_into_analysis_results_table_sql, [
+            (run_timestamp, r.benchmark, r.analysis, r.preset, r.sdfg, r.status, r.seconds,
+             json.dumps(r.result) if r.result is not None else None, r.detail, r.sdfg_hash, int(r.cached))
+            for r in records
+        ])
+    conn.close()
+    return run_timestamp
+
+
+def update_hashes(records: Iterable[AnalysisRecord]) -> List[str]:
+    """
+    Record the SDFG hashes of successful records in the manifest of the analysis store and return the
+    "<benchmark>:<sdfg>" whose SDFG changed since the previous run.
+    """
+    from bench_common.analysis_store import update_manifest
+    return update_manifest({f"{r.benchmark}:{r.sdfg}": r.sdfg_hash for r in records if r.sdfg_hash is not None})
+
+
+def print_record(record: AnalysisRecord):
+    origin = ", from store" if record.cached else ""
+    print(f"{record.benchmark} {record.analysis}: {record.status} ({record.seconds:.1f} s{origin})")
+
+
+def print_summary(records: List[AnalysisRecord]):
+    """ Benchmarks per analysis and status, replaces the *_fail lists of the old scripts. """
+    by_status: Dict[str, Dict[str, List[str]]] = dict()
+    for r in records:
+        by_status.setdefault(r.analysis, {}).setdefault(r.status, []).append(r.benchmark)
+    for analysis, statuses in by_status.items():
+        for status in STATUSES:
+            if status in statuses:
+                print(f"{analysis} {status} ({len(statuses[status])}):", sorted(statuses[status]))
+    cached = [r for r in records if r.cached]
+    if cached:
+        print(f"served from the analysis store: {len(cached)} of {len(records)}")
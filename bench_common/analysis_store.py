@@ -0,0 +1,384 @@
+"""
+Persistent store of symbolic analysis results.
+
+The work-depth and volume analyses of DaCe take minutes for some benchmarks and every script used to
+run them again. Results are stored per SDFG, analysis type and analysis variant:
+
+    <cache>/<structural hash of the SDFG>/<analysis>_<variant>.json
+
+The structural hash covers the SDFG JSON without GUIDs, debug information and transformation history,
+and the variant hashes the source of the modules and packages in ANALYSIS_SOURCES and the analysis
+parameters. These cover the analysis code and the parts of DaCe it builds on, the symbolic engine,
+memlet propagation and the performance_evaluation package. A change to the benchmarks therefore only
+causes re-analysis of the benchmarks whose SDFG changed, and a new DaCe version only of the analyses
+whose hashed sources changed, everything else is served from the store. update_manifest() reports
+which SDFGs changed since the previous run.
+
+Each entry holds the srepr of every result expression, which is readable and loads back without
+DaCe-specific code in most cases, and a pickle that is used when the srepr cannot be evaluated.
+
+    work, depth = work_depth(sdfg)
+    vol_r, vol_w = total_volume(sdfg)
+    df = volume_table(["gemm", "atax"], ["S", "L"])  # same columns as volumes_per_preset.csv
+    df = read_volume_table(["gemm", "atax"], ["L"])  # rows of volumes_per_preset.csv, no analysis
+"""
+import base64
+import functools
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import time
+import traceback
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import sympy as sp
+
+import dace
+import dace.symbolic
+
+from bench_common.closed_form import closed_forms
+
+CACHE_DIR = os.environ.get(
+    "BENCH_ANALYSIS_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, ".cache", "analyses"))
+
+
+def _work_depth(sdfg: dace.SDFG):
+    import dace.sdfg.performance_evaluation.work_depth as wd
+    return wd.analyze_sdfg(sdfg, {}, wd.get_tasklet_work_depth, [], False)
+
+
+def _total_volume(sdfg: dace.SDFG):
+    import dace.sdfg.performance_evaluation.total_volume as tv
+    return tv.analyze_sdfg(sdfg)
+
+
+def _total_volume_closed_form(sdfg: dace.SDFG):
+    return closed_forms(cached_analysis(sdfg, "total_volume"))
+
+
+def _op_in(sdfg: dace.SDFG, cache_size: int = 2048, line_size: int = 64, assumptions: Optional[Dict] = None):
+    import dace.sdfg.performance_evaluation.operational_intensity as oi
+    result = oi.analyze_sdfg_op_in(sdfg, {}, cache_size, line_size, assumptions or {})
+    return result if isinstance(result, tuple) else (result, )
+
+
+# Analyses by name, each returns a tuple of SymPy expressions
+ANALYSES: Dict[str, Callable] = {
+    "work_depth": _work_depth,
+    "total_volume": _total_volume,
+    "total_volume_closed_form": _total_volume_closed_form,
+    "op_in": _op_in,
+}
+
+# DaCe code the analyses build on, packages are hashed with all their modules. This is the symbolic
+# engine, memlet propagation and the whole performance_evaluation package.
+DACE_ANALYSIS_SOURCES = ("dace.symbolic", "dace.sdfg.propagation", "dace.sdfg.performance_evaluation")
+
+# Modules and packages whose source decides the result of an analysis, a change to any of them invalidates it
+ANALYSIS_SOURCES = {
+    "work_depth": DACE_ANALYSIS_SOURCES,
+    "total_volume": DACE_ANALYSIS_SOURCES,
+    "total_volume_closed_form": DACE_ANALYSIS_SOURCES + ("bench_common.closed_form", ),
+    "op_in": DACE_ANALYSIS_SOURCES,
+}
+
+# Parts of the SDFG JSON that do not change what it computes
+VOLATILE_KEYS = {"guid", "hash", "debuginfo", "transformation_hist", "orig_sdfg", "build_folder", "instrument"}
+
+
+def _strip(obj):
+    if isinstance(obj, dict):
+        return {k: _strip(v) for k, v in obj.items() if k not in VOLATILE_KEYS}
+    if isinstance(obj, list):
+        return [_strip(v) for v in obj]
+    return obj
+
+
+def structural_hash(sdfg: dace.SDFG) -> str:
+    """
+    Hash of the structure of an SDFG without debug information, GUIDs and the transformation history,
+    so a new DaCe version or source line numbers only change it if the SDFG itself changes.
+    """
+    return hashlib.sha256(json.dumps(_strip(sdfg.to_json()), sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _source_files(spec) -> List[str]:
+    if spec.submodule_search_locations:
+        files = []
+        for location in spec.submodule_search_locations:
+            for root, dirs, names in os.walk(location):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith(".py"))
+        return files
+    return [spec.origin]
+
+
+@functools.lru_cache(maxsize=None)
+def _source_hash(modules: Tuple[str, ...]) -> str:
+    h = hashlib.sha256()
+    for module in modules:
+        try:
+            spec = importlib.util.find_spec(module)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None or (spec.origin is None and not spec.submodule_search_locations):
+            h.update(module.encode())
+            continue
+        for path in _source_files(spec):
+            h.update(os.path.basename(path).encode())
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def analysis_variant(analysis: str, params: Optional[Dict] = None) -> str:
+    """ Hash of the source of the analysis code in ANALYSIS_SOURCES and the parameters of the analysis. """
+    key = json.dumps({"source": _source_hash(ANALYSIS_SOURCES.get(analysis, ())), "params": params or {}},
+                     sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _path(sdfg_hash: str, analysis: str, variant: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, sdfg_hash, f"{analysis}_{variant}.json")
+
+
+def _namespace() -> Dict:
+    namespace = dict(vars(sp))
+    # DaCe symbols and functions (symbol, int_floor, int_ceil, ...) print under their own names
+    namespace.update({name: obj for name, obj in vars(dace.symbolic).items() if isinstance(obj, type)})
+    return namespace
+
+
+def _decode(entry: Dict) -> Tuple:
+    try:
+        namespace = _namespace()
+        return tuple(eval(text, namespace) for text in entry["srepr"])
+    except Exception:
+        return pickle.loads(base64.b64decode(entry["pickle"]))
+
+
+def load_analysis(sdfg_hash: str, analysis: str, variant: str, cache_dir: str = CACHE_DIR) -> Optional[Tuple]:
+    """ Stored result of an analysis, None if there is none. """
+    path = _path(sdfg_hash, analysis, variant, cache_dir)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path) as f:
+            return _decode(json.load(f))
+    except Exception:
+        # Truncated or unreadable with this SymPy version, analyze again
+        return None
+
+
+def store_analysis(sdfg_hash: str, analysis: str, variant: str, result: Tuple, info: Optional[Dict] = None,
+                   cache_dir: str = CACHE_DIR):
+    path = _path(sdfg_hash, analysis, variant, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = dict(info or {}, analysis=analysis, dace=dace.__version__,
+                 srepr=[sp.srepr(expr) for expr in result],
+                 pickle=base64.b64encode(pickle.dumps(tuple(result))).decode())
+    # Write next to the final location and rename, concurrent scripts never read half-written files
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def is_cached(sdfg: dace.SDFG, analysis: str, params: Optional[Dict] = None, cache_dir: str = CACHE_DIR) -> bool:
+    path = _path(structural_hash(sdfg), analysis, analysis_variant(analysis, params), cache_dir)
+    return os.path.isfile(path)
+
+
+def cached_analysis(sdfg: dace.SDFG, analysis: str, use_cache: bool = True, cache_dir: str = CACHE_DIR,
+                    params: Optional[Dict] = None) -> Tuple:
+    """
+    Run an analysis of ANALYSES on sdfg, or return its stored result.
+
+    :param params: Keyword arguments of the analysis, part of the key.
+    """
+    if analysis not in ANALYSES:
+        raise ValueError(f"Unknown analysis {analysis}, expected one of {sorted(ANALYSES)}")
+    params = params or {}
+    if not use_cache:
+        return tuple(ANALYSES[analysis](sdfg, **params))
+
+    # The analyses may annotate the SDFG, hash it before
+    sdfg_hash = structural_hash(sdfg)
+    variant = analysis_variant(analysis, params)
+    result = load_analysis(sdfg_hash, analysis, variant, cache_dir)
+    if result is not None:
+        return result
+    start = time.perf_counter()
+    result = tuple(ANALYSES[analysis](sdfg, **params))
+    store_analysis(sdfg_hash, analysis, variant, result,
+                   {"sdfg_name": sdfg.name, "params": params, "seconds": time.perf_counter() - start}, cache_dir)
+    return result
+
+
+#################### Change detection ##################################
+
+def _manifest_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "manifest.json")
+
+
+def load_manifest(cache_dir: str = CACHE_DIR) -> Dict[str, str]:
+    """ Structural hash of each analyzed SDFG by name, as of the last update_manifest(). """
+    path = _manifest_path(cache_dir)
+    if not os.path.isfile(path):
+        return dict()
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def update_manifest(hashes: Dict[str, str], cache_dir: str = CACHE_DIR) -> List[str]:
+    """
+    Record the structural hashes of SDFGs (e.g. by "<benchmark>:<parsed|optimized>") and return the
+    names whose SDFG is new or changed since the last update.
+    """
+    manifest = load_manifest(cache_dir)
+    changed = sorted(name for name, h in hashes.items() if manifest.get(name) != h)
+    manifest.update(hashes)
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _manifest_path(cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, path)
+    return changed
+
+
+def work_depth(sdfg: dace.SDFG, use_cache: bool = True):
+    """ (work, depth) of wd.analyze_sdfg with the tasklet work-depth model. """
+    return cached_analysis(sdfg, "work_depth", use_cache)
+
+
+def total_volume(sdfg: dace.SDFG, use_cache: bool = True, closed_form: bool = True):
+    """
+    (volume read, volume written) in bytes of tv.analyze_sdfg, by default with the Sum and Max terms
+    resolved by bench_common.closed_form.
+    """
+    return cached_analysis(sdfg, "total_volume_closed_form" if closed_form else "total_volume", use_cache)
+
+
+def op_in(sdfg: dace.SDFG, cache_size: int, line_size: int, assumptions: Dict[str, int], use_cache: bool = True):
+    """ Result of analyze_sdfg_op_in, the cache simulation, as a tuple. """
+    return cached_analysis(sdfg, "op_in", use_cache,
+                           params={"cache_size": cache_size, "line_size": line_size, "assumptions": assumptions})
+
+
+# Table written by work_depth_bytes_accessed/volume_table.py and read by the roofline plots
+VOLUME_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "plots_for_roofline",
+                            "volumes_per_preset.csv")
+VOLUME_COLUMNS = ["kernel", "preset", "symbolic_volume_read_bytes", "symbolic_volume_write_bytes", "work"]
+
+
+def benchmark_volumes(benchmark_name: str) -> Tuple:
+    """
+    (volume read, volume written, work) of a benchmark, with the work of the parsed and the volume of
+    the auto-optimized SDFG, as ANALYSES of the analysis runner and test_volume.py.
+    """
+    from npbench.infrastructure import (Benchmark, DaceFramework)
+    from bench_common.sdfg_cache import get_bench_sdfg, get_optimized_sdfg
+
+    benchmark = Benchmark(benchmark_name)
+    dace_cpu_framework = DaceFramework("dace_cpu")
+    sdfg, _ = get_bench_sdfg(benchmark, dace_cpu_framework)
+    work, _ = work_depth(sdfg)
+    optimized_sdfg = get_optimized_sdfg(benchmark, dace_cpu_framework, dace.dtypes.DeviceType.CPU)
+    vol_r, vol_w = total_volume(optimized_sdfg)
+    return vol_r, vol_w, work
+
+
+def _count(value) -> Optional[int]:
+    return int(value) if np.isfinite(value) else None
+
+
+def preset_table(volumes: Dict[str, Optional[Tuple]], presets: Iterable[str],
+                 failed: Optional[Dict[str, str]] = None):
+    """
+    Evaluate the (volume read, volume written, work) of each benchmark for all presets at once, one
+    vectorized evaluation per expression. Returns a DataFrame with VOLUME_COLUMNS, values that do not
+    evaluate to a number are left empty. Benchmarks whose analysis failed, with None instead of the
+    expressions, get rows with empty values.
+
+    :param failed: Benchmarks with an empty value are added to it, with the reason.
+    """
+    import pandas as pd
+    from npbench.infrastructure import Benchmark
+    from bench_common.expr_eval import compile_expression
+
+    presets = list(presets)
+    failed = failed if failed is not None else dict()
+    rows = []
+    for benchmark_name, exprs in volumes.items():
+        parameters = Benchmark(benchmark_name).info["parameters"]
+        bm_presets = [p for p in presets if p in parameters]
+        counts = [(None, None, None)] * len(bm_presets)
+        if exprs is not None:
+            names = sorted({n for p in bm_presets for n in parameters[p]})
+            values = [np.array([parameters[p].get(n, np.nan) for p in bm_presets], dtype=np.float64) for n in names]
+            try:
+                vol_r, vol_w, work = (np.rint(compile_expression(str(e), names)(*values)) for e in exprs)
+                counts = [(_count(vol_r[i]), _count(vol_w[i]), _count(work[i])) for i in range(len(bm_presets))]
+            except (ValueError, TypeError):
+                print(f"Could not evaluate the analysis of {benchmark_name}")
+                failed[benchmark_name] = traceback.format_exc()
+                print(failed[benchmark_name])
+        for preset, preset_counts in zip(bm_presets, counts):
+            if None in preset_counts and benchmark_name not in failed:
+                columns = [c for c, v in zip(VOLUME_COLUMNS[2:], preset_counts) if v is None]
+                failed[benchmark_name] = f"{', '.join(columns)} not a number for preset {preset}"
+                print(f"{benchmark_name}: {failed[benchmark_name]}")
+            rows.append(dict(zip(VOLUME_COLUMNS, (benchmark_name, preset) + preset_counts)))
+    table = pd.DataFrame(rows, columns=VOLUME_COLUMNS)
+    return table.astype({c: "Int64" for c in VOLUME_COLUMNS[2:]})
+
+
+def volume_table(benchmarks: Iterable[str], presets: Iterable[str], failed: Optional[Dict[str, str]] = None):
+    """
+    Work and read/write volume of benchmarks evaluated for presets, with the columns of
+    volumes_per_preset.csv. Benchmarks whose analysis fails get rows with empty values.
+
+    :param failed: Benchmarks whose analysis or evaluation failed are added to it, with the reason.
+    """
+    failed = failed if failed is not None else dict()
+    volumes = dict()
+    for benchmark_name in benchmarks:
+        try:
+            volumes[benchmark_name] = benchmark_volumes(benchmark_name)
+        except Exception:
+            print(f"Analysis failed for {benchmark_name}")
+            failed[benchmark_name] = traceback.format_exc()
+            print(failed[benchmark_name])
+            volumes[benchmark_name] = None
+    return preset_table(volumes, presets, failed)
+
+
+def read_volume_table(benchmarks: Iterable[str], presets: Iterable[str], path: str = VOLUME_TABLE):
+    """
+    Complete rows of the table written by work_depth_bytes_accessed/volume_table.py for benchmarks and
+    presets. Nothing is analyzed: (kernel, preset) pairs without a complete row are skipped with a
+    warning that names the volume_table.py call that adds them.
+    """
+    import pandas as pd
+
+    benchmarks, presets = list(benchmarks), list(presets)
+    if os.path.isfile(path):
+        table = pd.read_csv(path).astype({c: "Int64" for c in VOLUME_COLUMNS[2:]})
+    else:
+        table = pd.DataFrame(columns=VOLUME_COLUMNS)
+    table = table[table["kernel"].isin(benchmarks) & table["preset"].isin(presets)].dropna()
+    complete = set(zip(table["kernel"], table["preset"]))
+    missing = [(b, p) for b in benchmarks for p in presets if (b, p) not in complete]
+    if missing:
+        print(f"Warning: no complete row in {path} for", ", ".join(f"{b} ({p})" for b, p in missing))
+        print("Add them with: python work_depth_bytes_accessed/volume_table.py"
+              f" -b {' '.join(sorted({b for b, _ in missing}))} -p {' '.join(sorted({p for _, p in missing}))}")
+    return table.reset_index(drop=True)
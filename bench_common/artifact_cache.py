@@ -0,0 +1,153 @@
+"""
+Content-addressed cache of compiled SDFG shared libraries.
+
+Compiling an auto-optimized SDFG takes far longer than generating its code. An artifact is keyed by
+the generated code of the SDFG, the compiler section of the DaCe configuration (compiler, flags,
+libraries, with libpapi for SDFGs that need it), the DaCe version and the CPU model, since
+-march=native builds are machine specific. On a hit the library is loaded from the cache and nothing
+is compiled. On a miss the SDFG is compiled as usual and program.sdfg and the library are copied
+into the cache:
+
+    <cache>/<key>/program.sdfg
+    <cache>/<key>/build/lib<name>.so
+    <cache>/<key>/manifest.json
+
+The generated code writes instrumentation reports to the build folder it was generated for, which is
+part of the code and therefore of the key. The manifest records that folder, and load_artifact()
+sets it as build_folder of the loaded SDFG, so the reports are found as before.
+"""
+import copy
+import hashlib
+import json
+import os
+import platform
+import shutil
+from typing import Dict, Optional
+
+import dace
+from dace.config import Config
+from dace.sdfg.utils import load_precompiled_sdfg
+
+from bench_common.papi_runtime import link_papi
+
+CACHE_DIR = os.environ.get(
+    "BENCH_ARTIFACT_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, ".cache", "artifacts"))
+
+MANIFEST = "manifest.json"
+
+
+def _cpu_model() -> str:
+    if os.path.isfile("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.partition(":")[2].strip()
+    return platform.processor() or platform.machine()
+
+
+def artifact_key(sdfg: dace.SDFG) -> str:
+    """
+    Hash of the generated code of sdfg and everything else that changes the compiled library.
+    """
+    code_objects = copy.deepcopy(sdfg).generate_code()
+    h = hashlib.sha256()
+    for obj in sorted(code_objects, key=lambda o: (o.name, o.language)):
+        h.update(f"{obj.name}.{obj.language}\0".encode())
+        h.update(obj.clean_code.encode())
+    key = {
+        "code": h.hexdigest(),
+        "compiler": Config.get("compiler"),
+        "dace": dace.__version__,
+        "machine": platform.machine(),
+        "cpu": _cpu_model(),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _library_name(sdfg_name: str) -> str:
+    return f"lib{sdfg_name}.{Config.get('compiler', 'library_extension')}"
+
+
+def artifact_folder(key: str, cache_dir: str = CACHE_DIR) -> Optional[str]:
+    """ Folder of a complete artifact, None on a cache miss. """
+    folder = os.path.join(cache_dir, key)
+    return folder if os.path.isfile(os.path.join(folder, MANIFEST)) else None
+
+
+def read_manifest(folder: str) -> Dict:
+    path = os.path.join(folder, MANIFEST)
+    if not os.path.isfile(path):
+        return dict()
+    with open(path) as f:
+        return json.load(f)
+
+
+def store_artifact(key: str, build_folder: str, sdfg_name: str, info: Optional[Dict] = None,
+                   cache_dir: str = CACHE_DIR) -> str:
+    """
+    Copy program.sdfg and the library of a finished build into the cache and return the artifact folder.
+    """
+    folder = os.path.join(cache_dir, key)
+    # Assemble next to the final location and rename, concurrent builders never see half an artifact
+    tmp_folder = f"{folder}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_folder, "build"))
+    shutil.copy2(os.path.join(build_folder, "program.sdfg"), tmp_folder)
+    shutil.copy2(os.path.join(build_folder, "build", _library_name(sdfg_name)), os.path.join(tmp_folder, "build"))
+    manifest = dict(info or {}, key=key, sdfg_name=sdfg_name, build_folder=os.path.abspath(build_folder),
+                    perf_dir=os.path.join(os.path.abspath(build_folder), "perf"))
+    with open(os.path.join(tmp_folder, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=4)
+    try:
+        os.rename(tmp_folder, folder)
+    except OSError:
+        # Another process stored the same artifact first
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+    return folder
+
+
+def build_artifact(sdfg: dace.SDFG, info: Optional[Dict] = None, use_cache: bool = True,
+                   cache_dir: str = CACHE_DIR) -> str:
+    """
+    Return a folder with program.sdfg and the compiled library of sdfg, compiling it only on a
+    cache miss. The folder can be loaded with load_artifact.
+    """
+    with link_papi(sdfg):
+        if not use_cache:
+            sdfg.compile()
+            return os.path.abspath(sdfg.build_folder)
+
+        key = artifact_key(sdfg)
+        folder = artifact_folder(key, cache_dir)
+        if folder is not None:
+            return folder
+        sdfg.compile()
+    return store_artifact(key, sdfg.build_folder, sdfg.name, info, cache_dir)
+
+
+def compile_cached(sdfg: dace.SDFG, info: Optional[Dict] = None, use_cache: bool = True,
+                   cache_dir: str = CACHE_DIR):
+    """
+    Like sdfg.compile(), but loads the library from the cache if it was built before.
+    """
+    with link_papi(sdfg):
+        if not use_cache:
+            return sdfg.compile()
+        key = artifact_key(sdfg)
+        folder = artifact_folder(key, cache_dir)
+        if folder is not None:
+            return load_artifact(folder)
+        c_sdfg = sdfg.compile()
+    store_artifact(key, sdfg.build_folder, sdfg.name, info, cache_dir)
+    return c_sdfg
+
+
+def load_artifact(folder: str):
+    """
+    Load an artifact or build folder. Reports keep going to the build folder the code was generated for.
+    """
+    c_sdfg = load_precompiled_sdfg(folder)
+    c_sdfg.sdfg.build_folder = read_manifest(folder).get("build_folder", folder)
+    os.makedirs(os.path.join(c_sdfg.sdfg.build_folder, "perf"), exist_ok=True)
+    return c_sdfg
@@ -0,0 +1,228 @@
+"""
+Instrumentation backends of the collection engine in bench_common.collector.
+
+A backend decides how the benchmarks are instrumented (the compile jobs), which event sets are
+measured with one compiled SDFG, what has to happen before such a measurement pass and how the
+reports of the measured runs are read and decoded into counter values.
+
+ - papi:   DaCe PAPI_Counters, or PAPI_Runtime_Counters with --runtime_events
+ - likwid: DaCe LIKWID_CPU
+ - timer:  DaCe Timer, the SDFG runtime in ms as the only "event"
+ - fake:   no instrumentation, synthetic counters for testing the engine without counters
+"""
+import itertools
+import random
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import dace
+
+from npbench.infrastructure import utilities as util
+
+from bench_common import papi_runtime
+from bench_common.compile_pipeline import CompileJob
+from bench_common.papi_events import PACKINGS, get_available_papi_events, get_papi_event_sets
+from bench_common.report_stream import ReportStream, iter_counters
+
+# (uuid, sdfg_element, event, thread_id, value), see report_stream.iter_counters
+Counter = Tuple[object, str, str, object, int]
+
+
+class Backend:
+    name = None
+    database = None  # default database file
+
+    def add_arguments(self, parser):
+        pass
+
+    def configure(self, args: Dict):
+        self.args = args
+
+    def jobs(self, benchmarks: Iterable[str]) -> List[CompileJob]:
+        raise NotImplementedError
+
+    def passes(self, job: CompileJob) -> List[Optional[Set[str]]]:
+        """ Event sets measured one after the other with the compiled SDFG of job. """
+        return [set(job.event_set) if job.event_set is not None else None]
+
+    def select(self, job: CompileJob, event_set: Optional[Set[str]]):
+        """ Called before measuring an event set of passes(job). """
+        pass
+
+    def open_reports(self, c_sdfg, job: CompileJob, event_set: Optional[Set[str]]):
+        """ Source of the reports of the following runs, with skip() and take() like ReportStream. """
+        return ReportStream(c_sdfg.sdfg.build_folder)
+
+    def decode(self, report) -> Iterator[Counter]:
+        return iter_counters(report)
+
+
+class PAPIBackend(Backend):
+    name = "papi"
+    database = "npbench_papi_metrics_autoopt.db"
+
+    fp_events = ["PAPI_FP_OPS", "PAPI_DP_OPS"]
+    cache_events = ['PAPI_L1_DCM', 'PAPI_L1_ICM', 'PAPI_L2_DCM', 'PAPI_L2_ICM', 'PAPI_L3_DCM',
+                    'PAPI_L3_ICM', 'PAPI_L1_TCM', 'PAPI_L2_TCM', 'PAPI_L3_TCM', 'PAPI_CA_SNP',
+                    'PAPI_CA_SHR', 'PAPI_CA_CLN', 'PAPI_CA_INV', 'PAPI_CA_ITV', 'PAPI_L3_LDM',
+                    'PAPI_L3_STM', 'PAPI_L1_LDM', 'PAPI_L1_STM', 'PAPI_L2_LDM', 'PAPI_L2_STM',
+                    'PAPI_PRF_DM', 'PAPI_L3_DCH', 'PAPI_LD_INS', 'PAPI_SR_INS', 'PAPI_LST_INS',
+                    'PAPI_L1_DCH', 'PAPI_L2_DCH', 'PAPI_L1_DCA', 'PAPI_L2_DCA', 'PAPI_L3_DCA',
+                    'PAPI_L1_DCR', 'PAPI_L2_DCR', 'PAPI_L3_DCR', 'PAPI_L1_DCW', 'PAPI_L2_DCW',
+                    'PAPI_L3_DCW', 'PAPI_L1_ICH', 'PAPI_L2_ICH', 'PAPI_L3_ICH', 'PAPI_L1_ICA',
+                    'PAPI_L2_ICA', 'PAPI_L3_ICA', 'PAPI_L1_ICR', 'PAPI_L2_ICR', 'PAPI_L3_ICR',
+                    'PAPI_L1_ICW', 'PAPI_L2_ICW', 'PAPI_L3_ICW', 'PAPI_L1_TCH', 'PAPI_L2_TCH',
+                    'PAPI_L3_TCH', 'PAPI_L1_TCA', 'PAPI_L2_TCA', 'PAPI_L3_TCA', 'PAPI_L1_TCR',
+                    'PAPI_L2_TCR', 'PAPI_L3_TCR', 'PAPI_L1_TCW', 'PAPI_L2_TCW', 'PAPI_L3_TCW']
+
+    def add_arguments(self, parser):
+        parser.add_argument("-e",
+                            "--build_event_sets",
+                            type=util.str2bool,
+                            nargs="?",
+                            default=True)
+        parser.add_argument("--event_packing",
+                            choices=PACKINGS,
+                            default="colouring",
+                            help="Algorithm partitioning the cache events into event sets")
+        parser.add_argument("--event_set_cache",
+                            type=util.str2bool,
+                            nargs="?",
+                            default=True,
+                            help="Reuse the event sets cached for this CPU model and PAPI version")
+        parser.add_argument("-t",
+                            "--runtime_events",
+                            type=util.str2bool,
+                            nargs="?",
+                            default=False,
+                            help="Compile each benchmark once and select the PAPI event set at call time")
+
+    def configure(self, args: Dict):
+        super().configure(args)
+        available_papi_events = get_available_papi_events()
+
+        fp_event = ""
+        for event in self.fp_events:
+            if event in available_papi_events:
+                fp_event = event
+                break
+        available_cache_events = [e for e in self.cache_events if e in available_papi_events]
+
+        self.event_sets = [{fp_event}]
+        if args["build_event_sets"]:
+            event_lists = get_papi_event_sets(available_cache_events,
+                                              packing=args["event_packing"],
+                                              use_cache=args["event_set_cache"])
+            self.event_sets.extend([set(l) for l in event_lists])
+        else:
+            self.event_sets.extend([{e} for e in available_cache_events])
+
+    def jobs(self, benchmarks):
+        if self.args["runtime_events"]:
+            # One build per benchmark, the events are read from the environment on every call
+            return [CompileJob(b, papi_runtime.PAPI_RUNTIME_COUNTERS.name) for b in benchmarks]
+        return [CompileJob(b, dace.InstrumentationType.PAPI_Counters.name, tuple(sorted(event_set)))
+                for b in benchmarks for event_set in self.event_sets]
+
+    def passes(self, job):
+        return self.event_sets if job.event_set is None else [set(job.event_set)]
+
+    def select(self, job, event_set):
+        if job.event_set is None:
+            papi_runtime.select_events(event_set)
+
+
+class LikwidBackend(Backend):
+    name = "likwid"
+    database = "npbench_likwid_metrics_autoopt.db"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-e",
+                            "--build_event_sets",
+                            type=util.str2bool,
+                            nargs="?",
+                            default=True,
+                            help="Unused, the LIKWID event group is set through the environment")
+
+    def jobs(self, benchmarks):
+        return [CompileJob(b, dace.InstrumentationType.LIKWID_CPU.name) for b in benchmarks]
+
+
+class TimerBackend(Backend):
+    name = "timer"
+    database = "npbench_timer_metrics_autoopt.db"
+
+    def jobs(self, benchmarks):
+        return [CompileJob(b, dace.InstrumentationType.Timer.name) for b in benchmarks]
+
+    def decode(self, report):
+        for uuid, elements in report.durations.items():
+            for sdfg_element, threads in elements.items():
+                for tid, values in threads.items():
+                    for value in values:
+                        yield uuid, sdfg_element, "Timer", tid, value
+
+
+class FakeReport(NamedTuple):
+    name: str
+    filepath: str
+    counters: Dict
+
+
+class _FakeReportSource:
+    """ Produces one synthetic report per measured run instead of reading them from disk. """
+
+    _stamps = itertools.count(int(time.time() * 1e6))
+
+    def __init__(self, benchmark: str, events: Set[str], threads: int, noise: float):
+        self.events = sorted(events)
+        self.threads = threads
+        self.noise = noise
+        self.base = {e: 1000 + zlib.crc32(f"{benchmark}:{e}".encode()) % 1000000 for e in self.events}
+        self.rng = random.Random(zlib.crc32(benchmark.encode()))
+
+    def skip(self) -> int:
+        return 1
+
+    def take(self) -> List[FakeReport]:
+        counters = {(0, -1, -1): {"SDFG": dict()}}
+        for event in self.events:
+            per_thread = self.base[event] // self.threads
+            counters[(0, -1, -1)]["SDFG"][event] = {
+                tid: [int(per_thread * (1 + self.rng.uniform(-self.noise, self.noise)))]
+                for tid in range(self.threads)
+            }
+        return [FakeReport(str(next(self._stamps)), "fake", counters)]
+
+
+class FakeBackend(Backend):
+    name = "fake"
+    database = "npbench_fake_metrics.db"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fake_events",
+                            type=str,
+                            nargs="+",
+                            default=["FAKE_FP_OPS", "FAKE_L1_DCM", "FAKE_L2_DCM", "FAKE_L3_TCM"],
+                            help="Events reported by the fake backend")
+        parser.add_argument("--fake_event_set_size", type=int, default=2, help="Events per fake event set")
+        parser.add_argument("--fake_threads", type=int, default=2, help="Threads reported per event")
+        parser.add_argument("--fake_noise", type=float, default=0.05, help="Relative noise of the fake counters")
+
+    def configure(self, args):
+        super().configure(args)
+        events, size = args["fake_events"], max(1, args["fake_event_set_size"])
+        self.event_sets = [set(events[i:i + size]) for i in range(0, len(events), size)]
+
+    def jobs(self, benchmarks):
+        return [CompileJob(b, dace.InstrumentationType.No_Instrumentation.name) for b in benchmarks]
+
+    def passes(self, job):
+        return self.event_sets
+
+    def open_reports(self, c_sdfg, job, event_set):
+        return _FakeReportSource(job.benchmark, event_set, self.args["fake_threads"], self.args["fake_noise"])
+
+
+BACKENDS = {backend.name: backend for backend in (PAPIBackend, LikwidBackend, TimerBackend, FakeBackend)}
@@ -0,0 +1,293 @@
+"""
+Registry of the npbench benchmarks and of what works for each of them.
+
+Every script used to carry its own benchmark_set with commented-out entries for the benchmarks that
+fail somewhere. The registry records per benchmark whether each capability works:
+
+    auto_opt    auto_optimize() of the parsed SDFG
+    compiles    the SDFG the collectors build (auto-optimized, unoptimized as fallback) compiles
+    work_depth  work-depth analysis of the parsed SDFG
+    volume      total volume analysis of the auto-optimized SDFG
+    simulation  cache simulation (analyze_sdfg_op_in) of the auto-optimized SDFG
+
+The capabilities are found by a probing pass that runs each benchmark in an IsolatedWorker with a
+timeout per capability. The results are cached in .cache/benchmark_registry.json and are valid as
+long as the benchmark source and the DaCe version do not change:
+
+    python -m bench_common.benchmark_registry --probe
+    python -m bench_common.benchmark_registry --probe -b gemm --capabilities compiles --force
+
+Scripts pick their benchmarks with select_benchmarks(requested, requires=(...)). Benchmarks that
+were not probed yet are only excluded by the known failures seeded below, so nothing is lost before
+the first probe. Stale probe results are reported, and probed again with reprobe=True.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import time
+import traceback
+from typing import Dict, Iterable, List, Optional
+
+import dace
+
+from npbench.infrastructure import (Benchmark, DaceFramework)
+
+from bench_common.isolated_worker import IsolatedWorker, WorkerFailed
+
+CACHE_PATH = os.environ.get(
+    "BENCH_REGISTRY_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, ".cache", "benchmark_registry.json"))
+
+CAPABILITIES = ("auto_opt", "compiles", "work_depth", "volume", "simulation")
+
+BENCHMARKS = ['adi','arc_distance','atax','azimint_hist','azimint_naive','bicg',
+              'cavity_flow','channel_flow','cholesky2','cholesky','compute','contour_integral',
+              'conv2d_bias','correlation','covariance2',
+              'covariance','crc16','deriche','doitgen',
+              'durbin','fdtd_2d','floyd_warshall','gemm',
+              'gemver','gesummv','go_fast','gramschmidt',
+              'hdiff','heat_3d','jacobi_1d','jacobi_2d','k2mm','k3mm','lenet','ludcmp','lu','mandelbrot1',
+              'mandelbrot2','mlp','mvt','nbody','nussinov','resnet','scattering_self_energies','seidel_2d',
+              'softmax','spmv','stockham_fft',
+              'symm','syr2k','syrk','trisolv','trmm','vadv']
+
+# Failures known before any probe, from the comments in the former benchmark_set lists
+KNOWN_FAILURES = {
+    "covariance2": {c: "no DaCe implementation" for c in CAPABILITIES},
+    "doitgen": {"auto_opt": "auto_optimize fails in expand_library_nodes()",
+                "volume": "needs auto_opt", "simulation": "needs auto_opt"},
+    "mandelbrot2": {"auto_opt": "auto_optimize fails", "volume": "needs auto_opt", "simulation": "needs auto_opt"},
+    "stockham_fft": {"compiles": "compilation fails"},
+    "mandelbrot1": {"volume": "excluded from the volume runs"},
+}
+
+PROBE_TIMEOUT = 3 * 60
+
+
+def probe_key(benchmark_name: str) -> str:
+    """
+    Hash of the DaCe implementation source of a benchmark and the DaCe version, found without
+    importing the implementation.
+    """
+    h = hashlib.sha256(dace.__version__.encode())
+    try:
+        info = Benchmark(benchmark_name).info
+        module = "npbench.benchmarks.{r}.{m}_dace".format(r=info["relative_path"].replace('/', '.'),
+                                                          m=info["module_name"])
+        spec = importlib.util.find_spec(module)
+    except Exception:
+        spec = None
+    if spec is None or spec.origin is None:
+        h.update(b"missing")
+    else:
+        with open(spec.origin, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def load_probes(path: str = CACHE_PATH) -> Dict:
+    if not os.path.isfile(path):
+        return dict()
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def store_probes(probes: Dict, path: str = CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(probes, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class BenchmarkRegistry:
+    """
+    Capabilities of the benchmarks from the probe cache and the known failures.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self.probes = load_probes(path)
+
+    def results(self, benchmark_name: str) -> Dict:
+        return self.probes.get(benchmark_name, dict()).get("results", dict())
+
+    def status(self, benchmark_name: str, capability: str) -> Optional[bool]:
+        """ True or False if known, None if the capability was never probed. """
+        result = self.results(benchmark_name).get(capability)
+        if result is not None:
+            return result["ok"]
+        if capability in KNOWN_FAILURES.get(benchmark_name, {}):
+            return False
+        return None
+
+    def reason(self, benchmark_name: str, capability: str) -> Optional[str]:
+        result = self.results(benchmark_name).get(capability)
+        if result is not None:
+            return result["error"]
+        return KNOWN_FAILURES.get(benchmark_name, {}).get(capability)
+
+    def query(self, requires: Iterable[str] = (), probed_only: bool = False) -> List[str]:
+        """
+        Benchmarks with all required capabilities. Unprobed capabilities count as working unless
+        probed_only is set.
+        """
+        selected = []
+        for name in BENCHMARKS:
+            states = [self.status(name, c) for c in requires]
+            if all(s is True or (s is None and not probed_only) for s in states):
+                selected.append(name)
+        return selected
+
+    def is_stale(self, benchmark_name: str) -> bool:
+        return self.probes.get(benchmark_name, {}).get("key") != probe_key(benchmark_name)
+
+    def record(self, benchmark_name: str, capability: str, ok: bool, error: Optional[str], seconds: float):
+        entry = self.probes.setdefault(benchmark_name, {"key": probe_key(benchmark_name), "results": {}})
+        entry["results"][capability] = {"ok": ok, "error": error, "seconds": seconds}
+
+    def save(self):
+        store_probes(self.probes, self.path)
+
+
+def _last_line(text: Optional[str]) -> str:
+    lines = (text or "").strip().splitlines()
+    return lines[-1] if lines else "failed"
+
+
+def select_benchmarks(requested: Optional[List[str]], requires: Iterable[str] = (),
+                      registry: Optional[BenchmarkRegistry] = None, reprobe: bool = False) -> List[str]:
+    """
+    The requested benchmarks, or all of them, without those lacking a required capability.
+
+    :param reprobe: Probe the required capabilities of benchmarks whose probe results are stale
+                    (benchmark source or DaCe version changed) again, instead of only warning.
+    """
+    registry = registry or BenchmarkRegistry()
+    requires = tuple(requires)
+    candidates = list(requested) if requested else list(BENCHMARKS)
+    stale = [b for b in candidates if b in registry.probes and registry.is_stale(b)]
+    if stale and reprobe and requires:
+        probe(stale, requires, registry=registry)
+    elif stale:
+        print(f"Probe results of {stale} are stale, run python -m bench_common.benchmark_registry --probe "
+              f"-b {' '.join(stale)}")
+    usable = set(registry.query(requires))
+    benchmarks = list()
+    for benchmark_name in candidates:
+        if benchmark_name not in BENCHMARKS:
+            print(f"Could not find a benchmark with the name {benchmark_name}")
+        elif benchmark_name not in usable:
+            failed = [c for c in requires if registry.status(benchmark_name, c) is False]
+            print(f"Skipping {benchmark_name}:",
+                  "; ".join(f"{c} ({_last_line(registry.reason(benchmark_name, c))})" for c in failed))
+        else:
+            benchmarks.append(benchmark_name)
+    return benchmarks
+
+
+#################### Probing ##################################
+
+def _probe_capability(capability: str, benchmark_name: str, framework: DaceFramework, sdfgs: Dict):
+    from bench_common.analysis_store import total_volume, work_depth
+    from bench_common.sdfg_cache import get_bench_sdfg, get_optimized_sdfg
+
+    benchmark = Benchmark(benchmark_name)
+
+    if capability == "auto_opt":
+        sdfgs["optimized"] = get_optimized_sdfg(benchmark, framework, dace.dtypes.DeviceType.CPU)
+    elif capability == "compiles":
+        from bench_common.artifact_cache import build_artifact
+        from bench_common.compile_pipeline import CompileJob, build_job_sdfg
+        job = CompileJob(benchmark_name, dace.InstrumentationType.No_Instrumentation.name)
+        build_artifact(build_job_sdfg(job, framework), job._asdict())
+    elif capability == "work_depth":
+        sdfg, _ = get_bench_sdfg(benchmark, framework)
+        work_depth(sdfg)
+    else:
+        if "optimized" not in sdfgs:
+            sdfgs["optimized"] = get_optimized_sdfg(benchmark, framework, dace.dtypes.DeviceType.CPU)
+        sdfg = sdfgs["optimized"]
+        if capability == "volume":
+            total_volume(sdfg)
+        elif capability == "simulation":
+            import dace.sdfg.performance_evaluation.operational_intensity as oi
+            assumptions = {k: 2 for k in benchmark.info["parameters"]["S"]}
+            oi.analyze_sdfg_op_in(sdfg, {}, 2048, 64, assumptions)
+        else:
+            raise ValueError(f"Unknown capability {capability}, expected one of {CAPABILITIES}")
+
+
+def _probe_worker(conn, capabilities):
+    framework = DaceFramework("dace_cpu")
+    while (benchmark_name := conn.recv()) is not None:
+        sdfgs = dict()
+        for capability in capabilities:
+            start = time.monotonic()
+            try:
+                _probe_capability(capability, benchmark_name, framework, sdfgs)
+                conn.send((capability, True, None, time.monotonic() - start))
+            except Exception:
+                conn.send((capability, False, traceback.format_exc(), time.monotonic() - start))
+        conn.send("done")
+
+
+def probe(benchmarks: Iterable[str], capabilities: Iterable[str] = CAPABILITIES, timeout: float = PROBE_TIMEOUT,
+          memory_limit_mb: Optional[float] = None, force: bool = False,
+          registry: Optional[BenchmarkRegistry] = None) -> BenchmarkRegistry:
+    """
+    Probe the capabilities of benchmarks, each benchmark in a fresh worker. Cached results are
+    kept unless force is set or the benchmark changed.
+    """
+    registry = registry or BenchmarkRegistry()
+    capabilities = list(capabilities)
+    for benchmark_name in benchmarks:
+        if registry.is_stale(benchmark_name):
+            registry.probes.pop(benchmark_name, None)
+        todo = [c for c in capabilities if force or c not in registry.results(benchmark_name)]
+        if not todo:
+            continue
+        print("="*50, benchmark_name, "="*50)
+        worker = IsolatedWorker(_probe_worker, (todo, ), memory_limit_mb)
+        worker.send(benchmark_name)
+        pending = list(todo)
+        try:
+            while (msg := worker.receive(time.monotonic() + timeout)) != "done":
+                capability, ok, error, seconds = msg
+                pending.remove(capability)
+                registry.record(benchmark_name, capability, ok, error, seconds)
+                print(f"{capability}: {'ok' if ok else 'failed'} ({seconds:.1f} s)")
+        except WorkerFailed as e:
+            # The capability being probed killed the worker, the remaining ones are probed next time
+            registry.record(benchmark_name, pending[0], False, f"{e.kind}: {e}", timeout if e.kind == "timeout" else 0.0)
+            print(f"{pending[0]}: {e.kind}")
+        finally:
+            worker.close()
+        registry.save()
+    return registry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--probe", action="store_true", help="Probe the benchmarks before printing the table")
+    parser.add_argument("--capabilities", type=str, nargs="+", choices=CAPABILITIES, default=list(CAPABILITIES))
+    parser.add_argument("--force", action="store_true", help="Probe again even if a cached result exists")
+    parser.add_argument("--timeout", type=float, default=PROBE_TIMEOUT, help="Seconds per capability")
+    parser.add_argument("--memory_limit", type=float, default=None, help="Resident set size limit in MB")
+    parser.add_argument("-b", "--benchmarks", type=str, nargs="+", default=None)
+    args = vars(parser.parse_args())
+
+    benchmarks = args["benchmarks"] or BENCHMARKS
+    registry = BenchmarkRegistry()
+    if args["probe"]:
+        probe(benchmarks, args["capabilities"], args["timeout"], args["memory_limit"], args["force"], registry)
+
+    symbols = {True: "ok", False: "FAIL", None: "-"}
+    print(f"{'benchmark':<26}" + "".join(f"{c:>12}" for c in CAPABILITIES))
+    for name in benchmarks:
+        print(f"{name:<26}" + "".join(f"{symbols[registry.status(name, c)]:>12}" for c in CAPABILITIES))
@@ -0,0 +1,109 @@
+"""
+Closed forms of the total-volume expressions.
+
+tv.analyze_sdfg returns sums over loop ranges and maxima of access sizes as they appear in the
+SDFG, e.g. for floyd_warshall and nussinov:
+
+    12*N**3 + 4*Sum(Max(k, N - 1)**2 + 2*Max(k, N - 1) + 1, (k, 0, N - 1))
+    ... + Max(0, 8*N*(N - 1)) + Max(2*N*(N - 1), 10*N*(N - 1))
+
+closed_form() decides Max and Min under the assumption that the size symbols are at least their lower
+bound (1 by default) and that each summation index lies within its bounds, sums the resulting
+summands in closed form and returns the expanded polynomial. Terms it cannot decide are kept, so the
+result is always equal to the input:
+
+    closed_form(floyd_warshall_volume)  # 16*N**3
+
+A comparison is decided by substituting each size symbol s by lower(s) + t with t >= 0 and checking
+that all coefficients of the expanded difference are non-negative. Differences that are linear in a
+summation index are checked at both ends of its range.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import sympy as sp
+
+# (index, lower, upper) of the enclosing sums, outermost first
+Ranges = List[Tuple[sp.Symbol, sp.Expr, sp.Expr]]
+
+
+def _nonnegative(expr: sp.Expr, shifts: Dict[sp.Symbol, sp.Expr]) -> Optional[bool]:
+    """ True if expr >= 0 for all size symbols at or above their lower bounds, None if unknown. """
+    expr = sp.expand(expr.xreplace(shifts))
+    if expr.is_number:
+        return bool(expr >= 0)
+    generators = sorted((s for s in expr.free_symbols if isinstance(s, sp.Dummy)), key=str)
+    if not generators:
+        return None
+    try:
+        poly = sp.Poly(expr, *generators)
+    except sp.PolynomialError:
+        return None
+    coeffs = poly.coeffs()
+    if not all(c.is_number for c in coeffs):
+        return None
+    return True if all(c >= 0 for c in coeffs) else None
+
+
+def _greater_equal(a: sp.Expr, b: sp.Expr, ranges: Ranges, shifts: Dict[sp.Symbol, sp.Expr]) -> Optional[bool]:
+    """ True if a >= b everywhere in the ranges of the enclosing sums. """
+    difference = sp.expand(a - b)
+    corners = [difference]
+    # Innermost index first, its bounds may contain the outer indices
+    for index, lower, upper in reversed(ranges):
+        if not any(c.has(index) for c in corners):
+            continue
+        if any(sp.degree(c, index) > 1 for c in corners if c.has(index)):
+            return None
+        corners = [c.subs(index, bound) for c in corners for bound in (lower, upper)]
+    return True if all(_nonnegative(c, shifts) for c in corners) else None
+
+
+def _decide(args: Sequence[sp.Expr], larger: bool, ranges: Ranges, shifts) -> Optional[sp.Expr]:
+    """ The argument of Max (larger) or Min that dominates all others, None if there is none. """
+    for candidate in args:
+        if all(other is candidate or (_greater_equal(candidate, other, ranges, shifts) if larger else
+                                      _greater_equal(other, candidate, ranges, shifts))
+               for other in args):
+            return candidate
+    return None
+
+
+def _resolve(expr: sp.Expr, ranges: Ranges, shifts) -> sp.Expr:
+    if isinstance(expr, sp.Sum):
+        limits = list(expr.limits)
+        # limits are innermost first, the ranges outermost first
+        inner_ranges = ranges + [tuple(l) for l in reversed(limits)]
+        summand = _resolve(expr.function, inner_ranges, shifts)
+        closed = sp.summation(summand, *limits)
+        return sp.expand(closed) if not closed.has(sp.Sum) else sp.Sum(summand, *limits)
+    if not expr.args:
+        return expr
+    args = [_resolve(a, ranges, shifts) for a in expr.args]
+    if isinstance(expr, (sp.Max, sp.Min)):
+        dominant = _decide(args, isinstance(expr, sp.Max), ranges, shifts)
+        if dominant is not None:
+            return dominant
+    return expr.func(*args)
+
+
+def closed_form(expr: sp.Expr, lower_bounds: Optional[Dict[str, int]] = None, default_lower: int = 1,
+                piecewise: bool = False) -> sp.Expr:
+    """
+    Equivalent of expr without the Sum, Max and Min terms that can be decided, expanded.
+
+    :param lower_bounds: Smallest value of size symbols by name, default_lower for the others.
+    :param piecewise: Rewrite the Max and Min terms that remain as Piecewise.
+    """
+    expr = sp.sympify(expr)
+    if not expr.has(sp.Sum, sp.Max, sp.Min):
+        return sp.expand(expr)
+    lower_bounds = lower_bounds or {}
+    bound_indices = {l[0] for s in expr.atoms(sp.Sum) for l in s.limits}
+    shifts = {s: lower_bounds.get(str(s), default_lower) + sp.Dummy(f"{s}_t", nonnegative=True)
+              for s in expr.free_symbols if s not in bound_indices}
+    result = sp.expand(_resolve(expr, [], shifts))
+    return result.rewrite(sp.Piecewise) if piecewise else result
+
+
+def closed_forms(exprs: Sequence[sp.Expr], **kwargs) -> Tuple[sp.Expr, ...]:
+    return tuple(closed_form(e, **kwargs) for e in exprs)
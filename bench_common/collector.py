@@ -0,0 +1,912 @@
+"""
+Collection engine shared by the roofline metric collectors.
+
+The engine owns everything the collectors have in common: the command line, the result tables,
+compiling ahead, cache flushing, input reset, the measured runs, report aggregation and statistics.
+What differs between PAPI, LIKWID and the other instrumentations is behind the Backend interface in
+bench_common.backends.
+
+    python collect_roofline_metrics/collect_roofline_metrics.py --backend likwid -b gemm -r 5
+
+collect_roofline_metrics_papi.py and collect_roofline_metrics_likwid.py call main() with a fixed
+backend and keep writing to their previous databases.
+"""
+import argparse
+import json
+import os
+import time
+import traceback
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime, timezone
+from math import sqrt
+from statistics import median
+from typing import Dict, List, Optional, Tuple
+
+from npbench.infrastructure import (Benchmark, utilities as util)
+
+from bench_common.backends import BACKENDS, Backend
+from bench_common.benchmark_registry import select_benchmarks as registry_select
+from bench_common.cache_flush import CacheFlusher
+from bench_common.compile_pipeline import REGISTRY, iter_compiled
+from bench_common.convergence import ConvergenceCheck, fixed
+from bench_common.db_writer import BatchedResultWriter
+from bench_common.input_arena import MODES as INPUT_RESET_MODES, InputArena, written_arguments
+from bench_common.isolated_worker import IsolatedWorker, WorkerFailed
+from bench_common.measurement_env import MeasurementEnvironment, parse_cpu_list
+from bench_common.report_stream import element_uuid
+from bench_common.size_sweep import add_sweep_preset, point_name, sweep_factors
+
+#################### SQL for creating tables and inserting values ##################################
+event_averages_table_sql = """
+CREATE TABLE IF NOT EXISTS event_averages(
+    collection_script_timestamp integer NOT NULL,
+    repetitions integer NOT NULL,
+    benchmark text NOT NULL,
+    preset text NOT NULL,
+    event_name text NOT NULL,
+    average real NOT NULL,
+    median integer NOT NULL,
+    variance real NOT NULL,
+    standard_dev real NOT NULL,
+    standard_dev_percent real NOT NULL,
+    time real,
+    PRIMARY KEY (collection_script_timestamp, benchmark, event_name)
+);
+"""
+insert_into_averages_table_sql = """
+INSERT INTO event_averages(
+    collection_script_timestamp, repetitions, benchmark, preset, event_name, average, median, variance,
+    standard_dev, standard_dev_percent, time
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+event_counts_table_sql = """
+CREATE TABLE IF NOT EXISTS event_counts(
+    report_timestamp integer NOT NULL,
+    report_path text NOT NULL,
+    collection_script_timestamp integer NOT NULL,
+    benchmark text NOT NULL,
+    preset text NOT NULL,
+    event text NOT NULL,
+    total_count integer NOT NULL,
+    time real NOT NULL,
+    PRIMARY KEY (report_timestamp, event)
+);
+"""
+insert_into_event_table_sql = """
+INSERT INTO event_counts(
+    report_timestamp, report_path, collection_script_timestamp, benchmark, preset, event, total_count, time
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+sdfg_elements_table_sql = """
+CREATE TABLE IF NOT EXISTS sdfg_elements(
+    benchmark text NOT NULL,
+    element_uuid text NOT NULL,
+    element_name text NOT NULL,
+    PRIMARY KEY (benchmark, element_uuid)
+);
+"""
+insert_into_sdfg_elements_table_sql = """
+INSERT OR IGNORE INTO sdfg_elements(
+    benchmark, element_uuid, element_name
+) VALUES (?, ?, ?);
+"""
+
+
+thread_counts_table_sql = """
+CREATE TABLE IF NOT EXISTS thread_counts(
+    report_timestamp integer NOT NULL,
+    collection_script_timestamp integer NOT NULL,
+    benchmark text NOT NULL,
+    preset text NOT NULL,
+    element_uuid text NOT NULL,
+    thread_id integer NOT NULL,
+    event text NOT NULL,
+    count integer NOT NULL,
+    PRIMARY KEY (report_timestamp, benchmark, element_uuid, thread_id, event)
+);
+"""
+thread_counts_event_index_sql = """
+CREATE INDEX IF NOT EXISTS thread_counts_benchmark_event ON thread_counts(benchmark, event, element_uuid);
+"""
+thread_counts_run_index_sql = """
+CREATE INDEX IF NOT EXISTS thread_counts_run ON thread_counts(collection_script_timestamp, benchmark);
+"""
+insert_into_thread_counts_table_sql = """
+INSERT INTO thread_counts(
+    report_timestamp, collection_script_timestamp, benchmark, preset, element_uuid, thread_id, event, count
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+collection_runs_table_sql = """
+CREATE TABLE IF NOT EXISTS collection_runs(
+    collection_script_timestamp integer NOT NULL,
+    backend text NOT NULL,
+    preset text NOT NULL,
+    arguments text NOT NULL,
+    finished_timestamp integer,
+    PRIMARY KEY (collection_script_timestamp)
+);
+"""
+insert_into_collection_runs_table_sql = """
+INSERT OR IGNORE INTO collection_runs(
+    collection_script_timestamp, backend, preset, arguments, finished_timestamp
+) VALUES (?, ?, ?, ?, NULL);
+"""
+finish_collection_run_sql = """
+UPDATE collection_runs SET finished_timestamp = ? WHERE collection_script_timestamp = ?;
+"""
+select_run_arguments_sql = """
+SELECT arguments FROM collection_runs WHERE collection_script_timestamp = ?;
+"""
+latest_unfinished_run_sql = """
+SELECT collection_script_timestamp FROM collection_runs
+WHERE finished_timestamp IS NULL AND backend = ? AND preset = ? AND collection_script_timestamp IN (
+    SELECT collection_script_timestamp FROM run_environment WHERE threads IS ?
+)
+ORDER BY collection_script_timestamp DESC LIMIT 1;
+"""
+
+
+run_environment_table_sql = """
+CREATE TABLE IF NOT EXISTS run_environment(
+    collection_script_timestamp integer NOT NULL,
+    hostname text,
+    threads integer,
+    cores text,
+    omp_proc_bind text,
+    omp_places text,
+    governor text,
+    cur_freq_khz real,
+    min_freq_khz integer,
+    max_freq_khz integer,
+    turbo text,
+    smt_active integer,
+    smt_control text,
+    PRIMARY KEY (collection_script_timestamp)
+);
+"""
+insert_into_run_environment_table_sql = """
+INSERT OR REPLACE INTO run_environment(
+    collection_script_timestamp, hostname, threads, cores, omp_proc_bind, omp_places, governor, cur_freq_khz,
+    min_freq_khz, max_freq_khz, turbo, smt_active, smt_control
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+completed_event_sets_table_sql = """
+CREATE TABLE IF NOT EXISTS completed_event_sets(
+    collection_script_timestamp integer NOT NULL,
+    benchmark text NOT NULL,
+    preset text NOT NULL,
+    event_set text NOT NULL,
+    repetitions integer NOT NULL,
+    PRIMARY KEY (collection_script_timestamp, benchmark, preset, event_set)
+);
+"""
+insert_into_completed_event_sets_table_sql = """
+INSERT OR REPLACE INTO completed_event_sets(
+    collection_script_timestamp, benchmark, preset, event_set, repetitions
+) VALUES (?, ?, ?, ?, ?);
+"""
+select_completed_event_sets_sql = """
+SELECT benchmark, event_set, repetitions FROM completed_event_sets WHERE collection_script_timestamp = ? AND preset = ?;
+"""
+
+
+failures_table_sql = """
+CREATE TABLE IF NOT EXISTS failures(
+    collection_script_timestamp integer NOT NULL,
+    benchmark text NOT NULL,
+    preset text NOT NULL,
+    event_set text NOT NULL,
+    kind text NOT NULL,
+    detail text,
+    elapsed real
+);
+"""
+insert_into_failures_table_sql = """
+INSERT INTO failures(
+    collection_script_timestamp, benchmark, preset, event_set, kind, detail, elapsed
+) VALUES (?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+thread_scaling_table_sql = """
+CREATE TABLE IF NOT EXISTS thread_scaling(
+    sweep_id integer NOT NULL,
+    collection_script_timestamp integer NOT NULL,
+    benchmark text NOT NULL,
+    preset text NOT NULL,
+    threads integer NOT NULL,
+    event text NOT NULL,
+    median_count real NOT NULL,
+    median_time real NOT NULL,
+    repetitions integer NOT NULL,
+    PRIMARY KEY (sweep_id, benchmark, preset, threads, event)
+);
+"""
+insert_into_thread_scaling_table_sql = """
+INSERT OR REPLACE INTO thread_scaling(
+    sweep_id, collection_script_timestamp, benchmark, preset, threads, event, median_count, median_time, repetitions
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+# Runs of a scaling sweep, one per thread count, so a resumed sweep keeps its sweep id
+sweep_runs_table_sql = """
+CREATE TABLE IF NOT EXISTS sweep_runs(
+    collection_script_timestamp integer NOT NULL,
+    sweep_id integer NOT NULL,
+    threads integer,
+    PRIMARY KEY (collection_script_timestamp)
+);
+"""
+insert_into_sweep_runs_table_sql = """
+INSERT OR IGNORE INTO sweep_runs(
+    collection_script_timestamp, sweep_id, threads
+) VALUES (?, ?, ?);
+"""
+# Databases written before sweep_runs existed only have the sweep id in thread_scaling
+select_sweep_of_run_sql = """
+SELECT sweep_id FROM sweep_runs WHERE collection_script_timestamp = ?
+UNION ALL
+SELECT sweep_id FROM thread_scaling WHERE collection_script_timestamp = ?
+LIMIT 1;
+"""
+select_sweep_runs_sql = """
+SELECT s.threads, r.collection_script_timestamp, r.finished_timestamp FROM collection_runs AS r JOIN (
+    SELECT threads, collection_script_timestamp FROM sweep_runs WHERE sweep_id = ?
+    UNION
+    SELECT DISTINCT threads, collection_script_timestamp FROM thread_scaling WHERE sweep_id = ?
+) AS s ON s.collection_script_timestamp = r.collection_script_timestamp;
+"""
+latest_unfinished_sweep_run_sql = """
+SELECT collection_script_timestamp FROM collection_runs
+WHERE finished_timestamp IS NULL AND backend = ? AND preset = ? AND collection_script_timestamp IN (
+    SELECT collection_script_timestamp FROM sweep_runs
+    UNION
+    SELECT collection_script_timestamp FROM thread_scaling
+)
+ORDER BY collection_script_timestamp DESC LIMIT 1;
+"""
+
+
+sweep_points_table_sql = """
+CREATE TABLE IF NOT EXISTS sweep_points(
+    collection_script_timestamp integer NOT NULL,
+    benchmark text NOT NULL,
+    base_benchmark text NOT NULL,
+    preset text NOT NULL,
+    factor real NOT NULL,
+    parameters text NOT NULL,
+    PRIMARY KEY (collection_script_timestamp, benchmark)
+);
+"""
+insert_into_sweep_points_table_sql = """
+INSERT OR REPLACE INTO sweep_points(
+    collection_script_timestamp, benchmark, base_benchmark, preset, factor, parameters
+) VALUES (?, ?, ?, ?, ?, ?);
+"""
+############################################ SQL end ############################################################
+
+TABLES = [event_averages_table_sql, event_counts_table_sql, sdfg_elements_table_sql, thread_counts_table_sql,
+          thread_counts_event_index_sql, thread_counts_run_index_sql, collection_runs_table_sql,
+          completed_event_sets_table_sql, failures_table_sql, run_environment_table_sql,
+          thread_scaling_table_sql, sweep_runs_table_sql, sweep_points_table_sql]
+
+def add_common_arguments(parser: argparse.ArgumentParser, backend: Backend):
+    parser.add_argument("-p",
+                        "--preset",
+                        choices=['S', 'M', 'L', 'paper'],
+                        nargs="?",
+                        default='S')
+    parser.add_argument("-v",
+                        "--validate",
+                        type=util.str2bool,
+                        nargs="?",
+                        default=True)
+    parser.add_argument("-c",
+                        "--compile_ahead",
+                        type=int,
+                        nargs="?",
+                        default=0,
+                        help="Number of processes compiling the next benchmarks while the current one is measured")
+    parser.add_argument("--reuse_builds",
+                        type=util.str2bool,
+                        nargs="?",
+                        default=True,
+                        help="Keep compiled SDFGs loaded and reuse them for other cache modes, thread counts and sizes")
+    parser.add_argument("--artifact_cache",
+                        type=util.str2bool,
+                        nargs="?",
+                        default=True,
+                        help="Load and store compiled libraries in the on-disk artifact cache")
+    parser.add_argument("--measure_core",
+                        type=int,
+                        default=None,
+                        help="Core of the measuring thread, one of --cores. Without --threads the "
+                             "measurement is pinned to it alone, compile workers use the cores not measured on")
+    parser.add_argument("-f",
+                        "--flush_cache",
+                        type=util.str2bool,
+                        nargs="+",
+                        default=[False],
+                        help="Sweep over these cache modes, True evicts the caches before every measured run instead of a warmup")
+    parser.add_argument("--flush_size", type=int, default=20, help="MB touched per core when flushing the caches")
+    parser.add_argument("--input_reset",
+                        choices=INPUT_RESET_MODES,
+                        default="arena",
+                        help="How the inputs are restored before every run, arena/mmap only copy the arrays the SDFG writes")
+    parser.add_argument("--thread_counts",
+                        type=util.str2bool,
+                        nargs="?",
+                        default=True,
+                        help="Also store the counters per SDFG element and thread")
+    parser.add_argument("--database", type=str, default=backend.database, help="SQLite file the results are written to")
+    parser.add_argument("-r", "--repeat", type=int, nargs="?", default=10)
+    parser.add_argument("-a",
+                        "--adaptive",
+                        type=util.str2bool,
+                        nargs="?",
+                        default=False,
+                        help="Repeat until the median CI of every event and the runtime is narrower than --target_ci, ignores --repeat")
+    parser.add_argument("--min_repeat", type=int, default=3, help="Minimum number of runs in adaptive mode")
+    parser.add_argument("--max_repeat", type=int, default=30, help="Maximum number of runs in adaptive mode")
+    parser.add_argument("--target_ci",
+                        type=float,
+                        default=0.02,
+                        help="Width of the 95%% confidence interval of the median relative to the median")
+    parser.add_argument("--resume",
+                        type=str,
+                        nargs="?",
+                        const="latest",
+                        default=None,
+                        help="Continue an interrupted run, the latest unfinished one of this backend and preset or the given run id. "
+                             "With --scaling the sweep of that run is continued under its sweep id")
+    parser.add_argument("-i",
+                        "--isolate",
+                        type=util.str2bool,
+                        nargs="?",
+                        default=False,
+                        help="Compile and measure every benchmark in a subprocess that is killed on timeout or excess memory")
+    parser.add_argument("--timeout", type=float, default=3600, help="Wall-clock limit per benchmark in seconds with --isolate")
+    parser.add_argument("--memory_limit",
+                        type=float,
+                        default=None,
+                        help="Resident set size limit of the benchmark subprocess in MB with --isolate")
+    parser.add_argument("--recycle",
+                        type=int,
+                        default=1,
+                        help="Benchmarks run by one subprocess before it is replaced, 1 starts a fresh one for every benchmark")
+    parser.add_argument("-n",
+                        "--threads",
+                        type=int,
+                        nargs="+",
+                        default=None,
+                        help="OpenMP thread counts, one run id per thread count. Default: leave it to the OpenMP runtime")
+    parser.add_argument("--cores",
+                        type=parse_cpu_list,
+                        default=None,
+                        help="Cores the measurements may use, e.g. 0-7,16. Default: the current affinity")
+    parser.add_argument("--pin_threads",
+                        type=util.str2bool,
+                        nargs="?",
+                        default=True,
+                        help="Restrict the affinity to as many of the cores as there are threads")
+    parser.add_argument("--proc_bind", type=str, default="close", help="OMP_PROC_BIND of the measured runs")
+    parser.add_argument("--places", type=str, default="cores", help="OMP_PLACES of the measured runs")
+    parser.add_argument("-s",
+                        "--scaling",
+                        type=util.str2bool,
+                        nargs="?",
+                        default=False,
+                        help="Strong-scaling sweep, stores the medians per thread count in thread_scaling. "
+                             "Without --threads it runs 1, 2, 4, ... up to all cores")
+    parser.add_argument("--size_sweep",
+                        type=float,
+                        nargs=2,
+                        default=None,
+                        metavar=("MIN", "MAX"),
+                        help="Sweep the problem size by scaling the parameters of --preset from MIN to MAX times, "
+                             "the benchmark label gets the factor as suffix (e.g. gemm_x0.5)")
+    parser.add_argument("--size_points", type=int, default=8, help="Number of geometrically spaced sizes of --size_sweep")
+    parser.add_argument("--size_fixed",
+                        type=str,
+                        nargs="+",
+                        default=[],
+                        help="Parameters not scaled by --size_sweep, in addition to the time step counts")
+    parser.add_argument("-b", "--benchmarks", type=str, nargs="+", default=None)
+
+
+def scaling_thread_counts(cores: int) -> List[int]:
+    """ Powers of two below cores, and cores itself. """
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    if cores > 1:
+        counts.append(cores)
+    return counts
+
+
+# Arguments that do not change the measured values, a run may be resumed with different ones
+RESUMABLE_ARGUMENTS = {"resume", "database", "benchmarks", "compile_ahead", "reuse_builds", "artifact_cache",
+                       "event_set_cache", "isolate", "timeout", "memory_limit", "recycle", "validate"}
+
+
+def event_set_key(event_set) -> str:
+    """ Text form of an event set in completed_event_sets, empty for backends without event sets. """
+    return ",".join(sorted(event_set)) if event_set is not None else ""
+
+
+def stored_sweep_id(conn, run_id: int) -> Optional[int]:
+    """ Sweep id of a run of a scaling sweep, None if the run was not part of one. """
+    row = conn.execute(select_sweep_of_run_sql, (run_id, run_id)).fetchone()
+    return row[0] if row is not None else None
+
+
+def resume_sweep(conn, backend: str, preset: str, resume: str) -> Tuple[Optional[int], Dict]:
+    """
+    Sweep id of the scaling sweep to resume, the latest unfinished one or that of the given run id,
+    and its runs as {threads: (run id, finished)}. (None, {}) if there is no sweep to resume.
+    """
+    if resume == "latest":
+        row = conn.execute(latest_unfinished_sweep_run_sql, (backend, preset)).fetchone()
+        if row is None:
+            return None, dict()
+        run_id = row[0]
+    else:
+        run_id = int(resume)
+    sweep_id = stored_sweep_id(conn, run_id)
+    if sweep_id is None:
+        return None, dict()
+    runs = conn.execute(select_sweep_runs_sql, (sweep_id, sweep_id)).fetchall()
+    return sweep_id, {threads: (run_id, finished is not None) for threads, run_id, finished in runs}
+
+
+def select_benchmarks(requested: Optional[List[str]]) -> List[str]:
+    # The engine falls back to the unoptimized SDFG if auto_optimize fails, building is what counts
+    return registry_select(requested, requires=("compiles", ))
+
+
+class _PipeWriter:
+    """
+    Stands in for the BatchedResultWriter in an isolated worker, the rows go to the parent. The parent
+    buffers the rows of a group until its end, so an event set cut short by a killed worker leaves
+    no rows behind.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def add(self, sql: str, row):
+        self.conn.send(("row", sql, tuple(row)))
+
+    def flush(self):
+        pass
+
+    @contextmanager
+    def group(self, key="group"):
+        self.conn.send(("group_begin", key))
+        try:
+            yield self
+        except BaseException:
+            self.conn.send(("group_abort", key))
+            raise
+        self.conn.send(("group_end", key))
+
+    @contextmanager
+    def transaction(self):
+        # The parent wraps every benchmark in a transaction of its writer
+        yield self
+
+
+def _isolated_worker(conn, backend: Backend, args: Dict, state: Dict):
+    """
+    Target of the IsolatedWorker processes: measure the (job, flush cache) items sent by the parent.
+    """
+    engine = CollectionEngine.worker(backend, dict(args, compile_ahead=0, isolate=False), _PipeWriter(conn), state)
+    flusher = None
+    try:
+        while True:
+            item = conn.recv()
+            if item is None:
+                break
+            job, fc = item
+            if fc and flusher is None:
+                flusher = CacheFlusher(args["flush_size"])
+            engine._run_jobs([job], flusher if fc else None)
+            conn.send("done")
+    finally:
+        if flusher is not None:
+            flusher.close()
+
+
+class CollectionEngine:
+
+    def __init__(self, backend: Backend, args: Dict, environment: Optional[MeasurementEnvironment] = None,
+                 sweep_id: Optional[int] = None):
+        self._setup(backend, args)
+        self.environment = environment or MeasurementEnvironment()
+        self.threads = self.environment.threads
+        self.conn = util.create_connection(args["database"])
+        self.writer = BatchedResultWriter(self.conn)
+        for table_sql in TABLES:
+            util.create_table(conn=self.conn, create_table_sql=table_sql)
+        self.start = int(datetime.now(timezone.utc).timestamp() * 1000)
+        self.run_id = self.start
+        self.completed = set()  # (benchmark label, event set key) measured in an earlier attempt
+        if args["resume"] is not None:
+            self._resume(args["resume"])
+        # Run id of the first thread count, shared by all runs of a scaling sweep. A resumed run keeps
+        # the sweep it was started in.
+        self.sweep_id = None
+        if args["scaling"]:
+            resumed = stored_sweep_id(self.conn, self.run_id) if self.run_id != self.start else None
+            self.sweep_id = resumed or sweep_id or self.run_id
+        self.writer.add(insert_into_collection_runs_table_sql,
+                        (self.run_id, backend.name, self.preset, json.dumps(args, sort_keys=True, default=str)))
+        env = self.environment.describe()
+        if self.sweep_id is not None:
+            self.writer.add(insert_into_sweep_runs_table_sql, (self.run_id, self.sweep_id, env["threads"]))
+        self.writer.add(insert_into_run_environment_table_sql,
+                        (self.run_id, env["hostname"], env["threads"], env["cores"], env["omp_proc_bind"],
+                         env["omp_places"], env["governor"], env["cur_freq_khz"], env["min_freq_khz"],
+                         env["max_freq_khz"], env["turbo"], env["smt_active"], env["smt_control"]))
+        self.writer.flush()
+        print(f"Run {self.run_id}: {env['threads'] or 'default'} threads on cores {env['cores']}, "
+              f"governor {env['governor']}, turbo {env['turbo']}, SMT {env['smt_control']}")
+
+    def _setup(self, backend: Backend, args: Dict):
+        self.backend = backend
+        self.args = args
+        self.preset = args["preset"]
+        if args["adaptive"]:
+            self.convergence = ConvergenceCheck(args["min_repeat"], args["max_repeat"], args["target_ci"])
+        else:
+            self.convergence = fixed(args["repeat"])
+        if args["size_sweep"]:
+            self.size_factors = sweep_factors(*args["size_sweep"], args["size_points"])
+        else:
+            self.size_factors = [None]
+
+    def _worker_state(self) -> Dict:
+        return {"run_id": self.run_id, "completed": self.completed, "threads": self.threads, "sweep_id": self.sweep_id}
+
+    @classmethod
+    def worker(cls, backend: Backend, args: Dict, writer, state: Dict) -> "CollectionEngine":
+        """ Engine of an isolated worker, it has no database and sends its rows through writer. """
+        engine = cls.__new__(cls)
+        engine._setup(backend, args)
+        engine.conn = None
+        engine.environment = None
+        engine.writer = writer
+        engine.run_id = engine.start = state["run_id"]
+        engine.completed = state["completed"]
+        engine.threads = state["threads"]
+        engine.sweep_id = state["sweep_id"]
+        return engine
+
+    def _resume(self, resume: str):
+        if resume == "latest":
+            row = self.conn.execute(latest_unfinished_run_sql,
+                                    (self.backend.name, self.preset, self.environment.threads)).fetchone()
+            if row is None:
+                print("No unfinished run to resume, starting a new one")
+                return
+            self.run_id = row[0]
+        else:
+            self.run_id = int(resume)
+        self._check_resumable()
+        rows = self.conn.execute(select_completed_event_sets_sql, (self.run_id, self.preset)).fetchall()
+        if not self.args["adaptive"]:
+            mismatched = sorted({label for label, _, repetitions in rows if repetitions != self.args["repeat"]})
+            if mismatched:
+                raise SystemExit(f"Cannot resume run {self.run_id}: {mismatched} were measured with a different "
+                                 f"number of repetitions than --repeat {self.args['repeat']}")
+        self.completed = {(label, event_set) for label, event_set, _ in rows}
+        print(f"Resuming run {self.run_id}, {len(self.completed)} event sets already measured")
+
+    def _check_resumable(self):
+        """ Refuse to resume a run whose measurements were taken with different settings. """
+        row = self.conn.execute(select_run_arguments_sql, (self.run_id, )).fetchone()
+        if row is None:
+            raise SystemExit(f"Cannot resume run {self.run_id}: it is not in {self.args['database']}")
+        stored = json.loads(row[0])
+        current = json.loads(json.dumps(self.args, sort_keys=True, default=str))
+        differing = sorted(k for k in set(stored) | set(current)
+                           if k not in RESUMABLE_ARGUMENTS and stored.get(k) != current.get(k))
+        if differing:
+            raise SystemExit(f"Cannot resume run {self.run_id}, it was measured with different arguments: " +
+                             ", ".join(f"{k}={stored.get(k)!r} (now {current.get(k)!r})" for k in differing))
+
+    def _done(self, label: str, event_set) -> bool:
+        return (label, event_set_key(event_set)) in self.completed
+
+    @staticmethod
+    def _label(benchmark: str, factor: Optional[float], suffix: str) -> str:
+        return benchmark + (f"_{point_name(factor)}" if factor is not None else "") + suffix
+
+    def _pending(self, jobs, suffix: str):
+        # Jobs whose event sets were all measured before the interruption are not even compiled
+        return [job for job in jobs
+                if not all(self._done(self._label(job.benchmark, factor, suffix), es)
+                           for factor in self.size_factors for es in self.backend.passes(job))]
+
+    def record_failure(self, label: str, event_set, kind: str, detail: str, elapsed: Optional[float] = None):
+        self.writer.add(insert_into_failures_table_sql,
+                        (self.run_id, label, self.preset, event_set_key(event_set), kind, detail, elapsed))
+
+    def run(self, benchmarks: List[str]):
+        jobs = self.backend.jobs(benchmarks)
+        flush_cache = self.args["flush_cache"]
+        isolate = self.args["isolate"]
+        flusher = CacheFlusher(self.args["flush_size"]) if any(flush_cache) and not isolate else None
+        try:
+            for fc in flush_cache:
+                if isolate:
+                    self._run_isolated(jobs, fc)
+                else:
+                    self._run_jobs(jobs, flusher if fc else None)
+        finally:
+            if flusher is not None:
+                flusher.close()
+        end = (int(datetime.now(timezone.utc).timestamp() * 1000))
+        self.writer.add(finish_collection_run_sql, (end, self.run_id))
+        self.writer.flush()
+        self._report_rejected_rows()
+        print("Duration:",  (end - self.start)/(1000*60), "min")
+
+    def _report_rejected_rows(self):
+        """ Record the event sets whose rows the database rejected, they are measured again on --resume. """
+        if not self.writer.errors:
+            return
+        for key, sql, row, error in self.writer.errors:
+            if key is not None:
+                label, event_set = key
+                self.writer.add(insert_into_failures_table_sql,
+                                (self.run_id, label, self.preset, event_set, "database", f"{error}: {row}", None))
+        self.writer.flush()
+        print(f"{len(self.writer.errors)} rows could not be written, "
+              f"{len(self.writer.failed_groups)} event sets were dropped:", self.writer.failed_groups)
+
+    def _run_isolated(self, jobs, fc: bool):
+        """
+        Send every job to an IsolatedWorker and write the rows it streams back. Timeouts, excess
+        memory and crashes are recorded in the failures table and the next job gets a new worker.
+        """
+        suffix = "_cache_flushed" if fc else ""
+        timeout = self.args["timeout"]
+        worker = None
+        try:
+            for job in self._pending(jobs, suffix):
+                if worker is None or not worker.alive or worker.items >= max(1, self.args["recycle"]):
+                    if worker is not None:
+                        worker.close()
+                    worker = IsolatedWorker(_isolated_worker,
+                                            (self.backend, self.args, self._worker_state()),
+                                            rss_limit_mb=self.args["memory_limit"])
+                start = time.monotonic()
+                group_rows = None  # rows of the open group, dropped if the worker dies before its end
+                with self.writer.transaction():
+                    worker.send((job, fc))
+                    try:
+                        while True:
+                            msg = worker.receive(start + timeout if timeout else None)
+                            if msg == "done":
+                                break
+                            if msg[0] == "row":
+                                if group_rows is not None:
+                                    group_rows.append(msg[1:])
+                                else:
+                                    self.writer.add(*msg[1:])
+                            elif msg[0] == "group_begin":
+                                group_rows = []
+                            elif msg[0] == "group_end":
+                                with self.writer.group(msg[1]):
+                                    for sql, row in group_rows:
+                                        self.writer.add(sql, row)
+                                group_rows = None
+                            elif msg[0] == "group_abort":
+                                group_rows = None
+                    except WorkerFailed as e:
+                        print(f"{job.benchmark + suffix}: {e.kind}, {e}")
+                        self.record_failure(job.benchmark + suffix, job.event_set, e.kind, str(e), time.monotonic() - start)
+                        worker = None
+        finally:
+            if worker is not None:
+                worker.close()
+
+    def _run_jobs(self, jobs, flusher: Optional[CacheFlusher]):
+        suffix = "_cache_flushed" if flusher is not None else ""
+        jobs = self._pending(jobs, suffix)
+        benchmark = None
+        bdata_preset, bdata = None, None
+        registry = REGISTRY if self.args["reuse_builds"] else None
+        # Isolated workers compile in place and have no environment
+        compile_cores = self.environment.compile_cores() if self.environment is not None else None
+        for job, c_sdfg, error in iter_compiled(jobs, workers=self.args["compile_ahead"],
+                                                compile_cores=compile_cores, registry=registry,
+                                                artifact_cache=self.args["artifact_cache"]):
+            if benchmark is None or job.benchmark != benchmark.bname:
+                print("="*50, job.benchmark + suffix, "="*50)
+                benchmark = Benchmark(job.benchmark)
+            if error is not None:
+                print(error)
+                with self.writer.transaction():
+                    self.record_failure(job.benchmark + suffix, job.event_set, "compile", error)
+                continue
+
+            # All sizes of a sweep run with the same build, the SDFG is symbolic in the sizes
+            for factor in self.size_factors:
+                label = self._label(job.benchmark, factor, suffix)
+                passes = [es for es in self.backend.passes(job) if not self._done(label, es)]
+                if not passes:
+                    continue
+                preset = self.preset
+                if factor is not None:
+                    preset = add_sweep_preset(benchmark, self.preset, factor, self.args["size_fixed"])
+                    print("-"*20, label, benchmark.info["parameters"][preset], "-"*20)
+                if (job.benchmark, preset) != bdata_preset:
+                    bdata = None  # release the previous inputs before generating the next ones
+                    bdata = benchmark.get_data(preset)
+                    bdata_preset = (job.benchmark, preset)
+                self._run_passes(c_sdfg, job, label, passes, bdata, flusher)
+                if factor is not None:
+                    with self.writer.transaction():
+                        self.writer.add(insert_into_sweep_points_table_sql,
+                                        (self.run_id, label, job.benchmark, self.preset, factor,
+                                         json.dumps(benchmark.info["parameters"][preset], default=str)))
+
+    def _run_passes(self, c_sdfg, job, label: str, passes, bdata, flusher: Optional[CacheFlusher]):
+        arena = InputArena(bdata, written_arguments(c_sdfg.sdfg), self.args["input_reset"])
+        # One transaction per benchmark, flushed even if the measurement is interrupted
+        with arena, self.writer.transaction():
+            for event_set in passes:
+                try:
+                    # The results and the completion marker are written all or nothing, a rejected row
+                    # or an error while storing only costs this event set
+                    with self.writer.group((label, event_set_key(event_set))):
+                        self.backend.select(job, event_set)
+                        time_list, reports = self.measure(c_sdfg, job, event_set, arena, flusher)
+                        self.store(label, time_list, reports)
+                        self.writer.add(insert_into_completed_event_sets_table_sql,
+                                        (self.run_id, label, self.preset, event_set_key(event_set), len(time_list)))
+                except Exception as e:
+                    print(e)
+                    traceback.print_exc()
+                    self.record_failure(label, event_set, "error", traceback.format_exc())
+                    continue
+
+    def event_totals(self, report) -> Dict[str, int]:
+        """ Counter values of a report summed over all SDFG elements and threads. """
+        totals = defaultdict(int)
+        for _, _, event_name, _, value in self.backend.decode(report):
+            totals[event_name] += value
+        return totals
+
+    def measure(self, c_sdfg, job, event_set, arena: InputArena, flusher: Optional[CacheFlusher]):
+        """
+        Run the SDFG until self.convergence is satisfied and return the measured times and reports,
+        in run order.
+        """
+        time_list = []
+        flush_times = []
+        measured_reports = []
+        series = defaultdict(list)  # event -> totals per run, plus the runtime
+        reports = self.backend.open_reports(c_sdfg, job, event_set)
+        while not self.convergence.done(len(time_list), series):
+            run_bdata = arena.reset()
+            if flusher is None:
+                #warmup
+                c_sdfg(**run_bdata)
+                reports.skip()
+            else:
+                flush_times.append(flusher.flush())
+            #measured run
+            _, raw_time_list = util.benchmark("c_sdfg(**run_bdata)", context=locals(), verbose=False, repeat=1)
+            time_list.extend(raw_time_list)
+            series["runtime"].extend(raw_time_list)
+            for report in reports.take():
+                measured_reports.append(report)
+                for event_name, total in self.event_totals(report).items():
+                    series[event_name].append(total)
+
+        if flush_times:
+            print(f"Cache flush: {sum(flush_times)/len(flush_times)*1000:.2f} ms per run (not part of the measured time)")
+        if self.args["adaptive"]:
+            widths = self.convergence.widths(series)
+            worst = max(widths, key=widths.get)
+            print(f"{len(time_list)} runs, widest median CI: {worst} {widths[worst]*100:.2f}%")
+        return time_list, measured_reports
+
+    def store(self, label: str, time_list: List[float], reports):
+        event_sums = dict()
+        for i, report in enumerate(reports):
+            if self.args["thread_counts"]:
+                for uuid, sdfg_element, event_name, tid, value in self.backend.decode(report):
+                    self.writer.add(insert_into_sdfg_elements_table_sql, (label, element_uuid(uuid), str(sdfg_element)))
+                    self.writer.add(insert_into_thread_counts_table_sql, (int(report.name), self.run_id, label, self.preset, element_uuid(uuid), int(tid), event_name, value))
+            for event_name, event_sum in self.event_totals(report).items():
+                if event_name not in event_sums.keys():
+                    event_sums[event_name] = []
+
+                event_sums[event_name].append(event_sum)
+                self.writer.add(insert_into_event_table_sql, tuple([int(report.name), str(report.filepath), self.run_id, label, self.preset, event_name, event_sum, time_list[i]]))
+
+        repetitions = len(time_list)
+        for event, sums in event_sums.items():
+            event_average = sum(sums)/repetitions
+            event_median = median(sums)
+            event_variance = sum([(counter_value-event_average)**2 for counter_value in sums])/repetitions
+            event_stddev = sqrt(event_variance)
+            time_average = sum(time_list)/repetitions
+            stddev_perc = event_stddev/(event_average)*100 if event_average>0 else -1
+            print(
+                f"{event:<14} | "
+                f"Max: {max(sums):>16.4f} | "
+                f"Min: {min(sums):>16.4f} | "
+                f"Avg: {event_average:>16.4f} | "
+                f"Var: {event_variance:>20.4f} | "
+                f"StdDev: {event_stddev:>16.4f} | "
+                f"StdDev%: {stddev_perc:>16.4f}%"
+            )
+            self.writer.add(insert_into_averages_table_sql, tuple([self.run_id, repetitions, label, self.preset, event, event_average, event_median, event_variance, event_stddev, stddev_perc, time_average]))
+            if self.sweep_id is not None:
+                self.writer.add(insert_into_thread_scaling_table_sql, (self.sweep_id, self.run_id, label, self.preset, self.threads, event, event_median, median(time_list), repetitions))
+
+
+def main(backend: Optional[str] = None, argv: Optional[List[str]] = None):
+    """
+    Parse the command line and collect the metrics. Without a fixed backend it is chosen with --backend.
+    """
+    parser = argparse.ArgumentParser()
+    if backend is None:
+        # The backend has to be known before its arguments can be added
+        pre_parser = argparse.ArgumentParser(add_help=False)
+        pre_parser.add_argument("--backend", choices=sorted(BACKENDS), default="papi")
+        backend = pre_parser.parse_known_args(argv)[0].backend
+        parser.add_argument("--backend", choices=sorted(BACKENDS), default="papi")
+
+    instance = BACKENDS[backend]()
+    add_common_arguments(parser, instance)
+    instance.add_arguments(parser)
+    args = vars(parser.parse_args(argv))
+
+    instance.configure(args)
+    benchmarks = select_benchmarks(args["benchmarks"])
+    # Read once, apply() narrows the affinity of this process to the cores of each thread count
+    all_cores = args["cores"] or sorted(os.sched_getaffinity(0))
+    thread_counts = args["threads"]
+    if args["scaling"] and not thread_counts:
+        thread_counts = scaling_thread_counts(len(all_cores))
+    # One run id per thread count
+    sweep_id, sweep_runs = None, dict()
+    if args["scaling"] and args["resume"] is not None:
+        conn = util.create_connection(args["database"])
+        for table_sql in TABLES:
+            util.create_table(conn=conn, create_table_sql=table_sql)
+        sweep_id, sweep_runs = resume_sweep(conn, instance.name, args["preset"], args["resume"])
+        conn.close()
+        if sweep_id is not None:
+            print(f"Resuming sweep {sweep_id}")
+    for threads in thread_counts or [None]:
+        run_args = args
+        if sweep_id is not None:
+            # Continue the run of this thread count in the interrupted sweep, or start it in that sweep
+            run_id, finished = sweep_runs.get(threads, (None, False))
+            if finished:
+                print(f"Run {run_id} with {threads} threads of sweep {sweep_id} is finished, skipping it")
+                continue
+            run_args = dict(args, resume=str(run_id) if run_id is not None else None)
+        environment = MeasurementEnvironment(threads, all_cores, args["proc_bind"], args["places"],
+                                             args["pin_threads"], args["measure_core"])
+        environment.apply()
+        engine = CollectionEngine(instance, run_args, environment, sweep_id)
+        sweep_id = engine.sweep_id
+        engine.run(benchmarks)
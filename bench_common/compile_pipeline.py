@@ -0,0 +1,252 @@
+"""
+Compile benchmark SDFGs ahead of their measurement.
+
+The collectors used to compile a benchmark, measure it and only then compile the next one. With
+iter_compiled(..., workers=N) the next SDFGs are built in a process pool on the cores the
+measurement does not use, while the current one is measured. Finished builds are handed to the measuring
+process through a bounded queue that limits how far compilation runs ahead.
+
+A CompiledSDFG cannot be sent between processes, so the workers return their build folders and the
+measuring process loads the shared libraries with load_precompiled_sdfg.
+
+Loaded builds are kept in a CompiledSDFGRegistry, so a job that comes up again in the same process
+(another cache-flush mode, thread count or problem size) reuses its CompiledSDFG instead of being
+built again.
+
+Builds go through the on-disk artifact cache of bench_common.artifact_cache unless it is disabled, so
+an SDFG whose generated code and compiler flags did not change is never compiled twice, not even in a
+later run. collect_roofline_metrics/build_all.py fills the cache for all benchmarks ahead of time.
+"""
+import hashlib
+import os
+import queue
+import threading
+import traceback
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+import dace
+from dace.codegen.instrumentation import papi
+
+from npbench.infrastructure import (Benchmark, DaceFramework)
+
+from bench_common import papi_runtime  # registers PAPI_Runtime_Counters in the workers
+from bench_common.artifact_cache import build_artifact, compile_cached, load_artifact
+from bench_common.sdfg_cache import PIPELINE_SIMPLIFY, auto_optimize_pipeline, get_bench_sdfg, get_optimized_sdfg
+
+# auto_optimize for the CPU, the unoptimized SDFG if that fails
+PIPELINE_AUTO_OPT = auto_optimize_pipeline(dace.dtypes.DeviceType.CPU)
+PIPELINES = (PIPELINE_AUTO_OPT, PIPELINE_SIMPLIFY)
+
+
+class CompileJob(NamedTuple):
+    benchmark: str
+    instrument: str  # name of a dace.InstrumentationType
+    event_set: Optional[Tuple[str, ...]] = None  # compile-time PAPI events, None for other instrumentation
+    pipeline: str = PIPELINE_AUTO_OPT
+
+    @property
+    def tag(self) -> str:
+        """ Suffix of the build folder after the benchmark and SDFG name, jobs must not share one. """
+        key = f"{self.instrument}:{','.join(self.event_set or ())}"
+        if self.pipeline != PIPELINE_AUTO_OPT:
+            key += f":{self.pipeline}"
+        return hashlib.sha1(key.encode()).hexdigest()[:10]
+
+
+class CompiledJob(NamedTuple):
+    job: CompileJob
+    compiled_sdfg: Optional[object]  # dace CompiledSDFG, None if the build failed
+    error: Optional[str] = None
+
+
+class CompiledSDFGRegistry:
+    """
+    Loaded CompiledSDFGs of this process by job, i.e. by (benchmark, instrumentation, event set,
+    pipeline). The handles stay loaded until clear() is called.
+    """
+
+    def __init__(self, artifact_cache: bool = True):
+        self.artifact_cache = artifact_cache
+        self._compiled: Dict[CompileJob, object] = dict()
+
+    def __contains__(self, job: CompileJob) -> bool:
+        return job in self._compiled
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+    def get(self, job: CompileJob):
+        return self._compiled.get(job)
+
+    def put(self, job: CompileJob, compiled_sdfg):
+        self._compiled[job] = compiled_sdfg
+
+    def get_or_compile(self, job: CompileJob):
+        if job not in self._compiled:
+            self._compiled[job] = compile_cached(build_job_sdfg(job), job._asdict(), self.artifact_cache)
+        return self._compiled[job]
+
+    def clear(self):
+        self._compiled.clear()
+
+
+REGISTRY = CompiledSDFGRegistry()
+
+
+def build_job_sdfg(job: CompileJob, dace_framework: Optional[DaceFramework] = None) -> dace.SDFG:
+    """
+    Return the transformed and instrumented SDFG of a job. With PIPELINE_AUTO_OPT it falls back to
+    the unoptimized SDFG if auto_optimize fails.
+    """
+    dace_framework = dace_framework or DaceFramework("dace_cpu")
+    benchmark = Benchmark(job.benchmark)
+    if job.pipeline == PIPELINE_SIMPLIFY:
+        _, sdfg = get_bench_sdfg(benchmark, dace_framework)
+    elif job.pipeline == PIPELINE_AUTO_OPT:
+        try:
+            sdfg = get_optimized_sdfg(benchmark, dace_framework, dace.dtypes.DeviceType.CPU)
+        except Exception:
+            sdfg, _ = get_bench_sdfg(benchmark, dace_framework)
+    else:
+        raise ValueError(f"Unknown pipeline {job.pipeline}, expected one of {PIPELINES}")
+
+    if job.event_set is not None:
+        papi.PAPIInstrumentation._counters = set(job.event_set)
+    sdfg.instrument = getattr(dace.InstrumentationType, job.instrument)
+    # Most benchmark SDFGs are called "kernel", the benchmark keeps concurrent builds apart
+    sdfg.build_folder = os.path.join(dace.config.Config.get("default_build_folder"),
+                                     f"{job.benchmark}_{sdfg.name}_{job.tag}")
+    return sdfg
+
+
+def compile_job(job: CompileJob, artifact_cache: bool = True) -> Tuple[CompileJob, Optional[str], Optional[str]]:
+    """
+    Pool worker: build a job and return (job, folder, error). The folder is a cached artifact or,
+    without the artifact cache, the build folder.
+    """
+    try:
+        return job, build_artifact(build_job_sdfg(job), job._asdict(), artifact_cache), None
+    except Exception:
+        return job, None, traceback.format_exc()
+
+
+def load_compiled(folder: str):
+    """
+    Load a build produced by compile_job. Reports keep going to <build_folder>/perf.
+    """
+    return load_artifact(folder)
+
+
+def _pin_compile_worker(cores):
+    if cores:
+        os.sched_setaffinity(0, cores)
+
+
+def iter_compiled(jobs: Iterable[CompileJob], workers: int = 0, depth: int = 2,
+                  compile_cores: Optional[Iterable[int]] = None,
+                  registry: Optional[CompiledSDFGRegistry] = REGISTRY,
+                  artifact_cache: bool = True) -> Iterator[CompiledJob]:
+    """
+    Yield the compiled SDFGs of jobs in order.
+
+    :param workers: Size of the compile pool, 0 compiles each job in this process when it is reached.
+    :param depth: Number of finished builds buffered for the measuring process.
+    :param compile_cores: Cores the compile workers are pinned to, e.g.
+                          MeasurementEnvironment.compile_cores(). None leaves their affinity as is.
+    :param registry: Jobs found in it are not compiled again, new builds are added. None disables reuse.
+    :param artifact_cache: Load and store the libraries in the on-disk artifact cache.
+    """
+    jobs = list(jobs)
+    if registry is None:
+        registry = CompiledSDFGRegistry(artifact_cache)  # private to this call, nothing is reused
+    else:
+        registry.artifact_cache = artifact_cache
+    if workers <= 0:
+        for job in jobs:
+            try:
+                yield CompiledJob(job, registry.get_or_compile(job))
+            except Exception:
+                yield CompiledJob(job, None, traceback.format_exc())
+        return
+
+    to_build = list(dict.fromkeys(job for job in jobs if job not in registry))
+    if not to_build:
+        for job in jobs:
+            yield CompiledJob(job, registry.get(job))
+        return
+
+    compile_cores = sorted(compile_cores) if compile_cores is not None else None
+    ready = queue.Queue(maxsize=depth)
+    done = object()
+
+    def feed(pool):
+        in_flight = []
+        pending = iter(to_build)
+        for job in pending:
+            in_flight.append((job, pool.submit(compile_job, job, artifact_cache)))
+            if len(in_flight) >= depth:
+                break
+        while in_flight:
+            job, future = in_flight.pop(0)
+            try:
+                result = future.result()
+            except Exception:
+                # The worker process died (e.g. the compiler was OOM-killed)
+                result = (job, None, traceback.format_exc())
+            ready.put(result)  # blocks while the measuring side is behind
+            job = next(pending, None)
+            if job is not None:
+                in_flight.append((job, pool.submit(compile_job, job, artifact_cache)))
+        ready.put(done)
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=mp.get_context("spawn"),
+                             initializer=_pin_compile_worker,
+                             initargs=(compile_cores, )) as pool:
+        feeder = threading.Thread(target=feed, args=(pool, ), daemon=True)
+        feeder.start()
+        expected = set(to_build)
+        for job in jobs:
+            if job not in expected:
+                c_sdfg = registry.get(job)
+                yield CompiledJob(job, c_sdfg, None if c_sdfg is not None else "build failed earlier in this run")
+                continue
+            expected.remove(job)
+            # The builds arrive in the order of to_build, which is the order of the uncached jobs
+            built_job, build_folder, error = ready.get()
+            if error is not None:
+                yield CompiledJob(built_job, None, error)
+                continue
+            try:
+                c_sdfg = load_compiled(build_folder)
+            except Exception:
+                yield CompiledJob(built_job, None, traceback.format_exc())
+                continue
+            registry.put(built_job, c_sdfg)
+            yield CompiledJob(built_job, c_sdfg)
+        ready.get()  # done
+        feeder.join()
+
+
+def build_all(jobs: Iterable[CompileJob], workers: int = 0) -> Dict[CompileJob, Optional[str]]:
+    """
+    Compile jobs into the artifact cache in a process pool and return the error of each job, None on
+    success. Jobs that are already cached only cost their code generation.
+    """
+    jobs = list(dict.fromkeys(jobs))
+    errors = dict()
+    workers = workers or max(1, len(os.sched_getaffinity(0)))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        futures = {pool.submit(compile_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                _, folder, error = future.result()
+            except Exception:
+                folder, error = None, traceback.format_exc()
+            errors[job] = error
+            print(f"[{len(errors)}/{len(jobs)}] {job.benchmark} ({job.instrument}, {job.tag}):",
+                  folder if error is None else "failed")
+    return errors
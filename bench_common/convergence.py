@@ -0,0 +1,80 @@
+"""
+Stopping rule for adaptive repetition counts.
+
+The confidence interval of the median is taken from order statistics: with n samples, the number of
+samples below the true median is Binomial(n, 1/2) distributed, so [x_(j), x_(k)] covers the median
+with probability P(j <= B < k). This needs no assumption about the distribution of the counter
+values, which are often skewed or bimodal. At 95% confidence such an interval exists from 6 samples
+on. For fewer samples the full range [x_(1), x_(n)] is used, which covers the median with probability
+1 - 2^(1-n) only, so a kernel whose first 3 runs agree within the target may stop early.
+"""
+from math import comb, inf
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def median_ci_ranks(n: int, confidence: float = 0.95) -> Optional[Tuple[int, int]]:
+    """
+    Return the 0-based ranks (j, k) of the narrowest symmetric order-statistic interval covering
+    the median with at least the given confidence, None if n samples are too few.
+    """
+    if n < 1:
+        return None
+    pmf = [comb(n, i) / 2**n for i in range(n + 1)]
+    # Symmetric intervals [x_(j), x_(n-1-j)] from the narrowest outwards
+    for j in range((n - 1) // 2, -1, -1):
+        k = n - 1 - j
+        if sum(pmf[j + 1:k + 1]) >= confidence:
+            return j, k
+    return None
+
+
+def median_ci_width(values: Sequence[float], confidence: float = 0.95) -> float:
+    """
+    Width of the confidence interval of the median relative to the median.
+    """
+    if len(values) < 2:
+        return inf
+    ranks = median_ci_ranks(len(values), confidence) or (0, len(values) - 1)
+    ordered = sorted(values)
+    low, high = ordered[ranks[0]], ordered[ranks[1]]
+    n = len(ordered)
+    med = (ordered[(n - 1) // 2] + ordered[n // 2]) / 2
+    if high == low:
+        return 0.0
+    return (high - low) / abs(med) if med != 0 else inf
+
+
+class ConvergenceCheck:
+    """
+    Decides after each run whether a series of measurements may stop.
+
+    :param min_repeat: Runs that are always done.
+    :param max_repeat: Runs after which the series stops even if it did not converge.
+    :param target_ci: Relative width of the median confidence interval every series has to reach.
+    """
+
+    def __init__(self, min_repeat: int = 3, max_repeat: int = 30, target_ci: float = 0.02,
+                 confidence: float = 0.95):
+        self.min_repeat = min_repeat
+        self.max_repeat = max(max_repeat, min_repeat)
+        self.target_ci = target_ci
+        self.confidence = confidence
+
+    def widths(self, series: Dict[str, List[float]]) -> Dict[str, float]:
+        return {name: median_ci_width(values, self.confidence) for name, values in series.items()}
+
+    def done(self, runs: int, series: Dict[str, List[float]]) -> bool:
+        """
+        :param runs: Number of runs done so far.
+        :param series: Measured values per event (and the runtime) so far.
+        """
+        if runs < self.min_repeat:
+            return False
+        if runs >= self.max_repeat:
+            return True
+        return all(w <= self.target_ci for w in self.widths(series).values())
+
+
+def fixed(repetitions: int) -> ConvergenceCheck:
+    """ A check that stops after exactly repetitions runs. """
+    return ConvergenceCheck(min_repeat=repetitions, max_repeat=repetitions)
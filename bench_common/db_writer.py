@@ -0,0 +1,123 @@
+"""
+Buffered writer for the result rows of the collectors.
+
+util.create_result commits every single row, so each report x event paid for its own fsync between
+two measured runs. The writer buffers rows per INSERT statement and writes them with executemany in
+one transaction, normally once per benchmark:
+
+    writer = BatchedResultWriter(conn)
+    with writer.transaction():
+        with writer.group(("gemm", "PAPI_L1_DCM,PAPI_L2_DCM")):
+            writer.add(insert_into_event_table_sql, row)
+            ...
+
+Leaving the transaction block flushes the buffer, also when it is left through an exception, so the
+rows of a crashed benchmark are kept. The rows of a group, e.g. one event set and its completion
+marker, are written all or nothing, and dropped if the group block raises.
+
+If the batch fails, it is written again group by group and row by row, so a rejected row only costs
+its own group, or itself if it is in none. The rejected rows and groups are printed and kept in
+errors and failed_groups for the summary of the run.
+"""
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# (group key or None, statement, row, error) of a row the database rejected
+Rejected = Tuple[Optional[Hashable], str, tuple, str]
+
+
+class BatchedResultWriter:
+
+    def __init__(self, conn: sqlite3.Connection, wal: bool = True):
+        self.conn = conn
+        # (group key, statement -> rows) in insertion order, key None for rows outside of groups
+        self._buffer: List[Tuple[Optional[Hashable], Dict[str, List[tuple]]]] = []
+        self._group: Optional[Dict[str, List[tuple]]] = None
+        self.errors: List[Rejected] = []
+        self.failed_groups: List[Hashable] = []
+        if wal:
+            # WAL only appends to the log on commit, synchronous=NORMAL skips the fsync per commit
+            self.conn.execute("PRAGMA journal_mode=WAL;")
+            self.conn.execute("PRAGMA synchronous=NORMAL;")
+
+    def add(self, sql: str, row):
+        if self._group is not None:
+            rows = self._group
+        else:
+            if not self._buffer or self._buffer[-1][0] is not None:
+                self._buffer.append((None, dict()))
+            rows = self._buffer[-1][1]
+        rows.setdefault(sql, []).append(tuple(row))
+
+    def pending(self) -> int:
+        return sum(len(rows) for _, statements in self._buffer for rows in statements.values())
+
+    @contextmanager
+    def group(self, key: Hashable = "group"):
+        """
+        Rows added in the block are written all or nothing, and dropped if the block raises.
+        """
+        if self._group is not None:
+            raise RuntimeError("Groups of the result writer cannot be nested")
+        self._group = dict()
+        try:
+            yield self
+        except BaseException:
+            self._group = None
+            raise
+        rows, self._group = self._group, None
+        if rows:
+            self._buffer.append((key, rows))
+
+    def flush(self) -> List[Rejected]:
+        """
+        Write all buffered rows in one transaction and return the rows that were rejected.
+        """
+        if not self._buffer:
+            return []
+        buffer, self._buffer = self._buffer, []
+        try:
+            with self.conn:  # commits, or rolls back if an insert fails
+                for _, statements in buffer:
+                    for sql, values in statements.items():
+                        self.conn.executemany(sql, values)
+            return []
+        except sqlite3.Error:
+            return self._write_separately(buffer)
+
+    def _write_separately(self, buffer) -> List[Rejected]:
+        errors = []
+        for key, statements in buffer:
+            if key is None:
+                with self.conn:
+                    for sql, values in statements.items():
+                        for row in values:
+                            try:
+                                self.conn.execute(sql, row)
+                            except sqlite3.Error as e:
+                                errors.append((None, sql, row, str(e)))
+                continue
+            try:
+                with self.conn:
+                    for sql, values in statements.items():
+                        for row in values:
+                            try:
+                                self.conn.execute(sql, row)
+                            except sqlite3.Error as e:
+                                errors.append((key, sql, row, str(e)))
+                                raise
+            except sqlite3.Error:
+                self.failed_groups.append(key)
+        for key, sql, row, error in errors:
+            statement = " ".join(sql.split()[:3])
+            print(f"Could not write {row} ({statement}){f' of {key}' if key is not None else ''}: {error}")
+        self.errors.extend(errors)
+        return errors
+
+    @contextmanager
+    def transaction(self):
+        try:
+            yield self
+        finally:
+            self.flush()
@@ -0,0 +1,134 @@
+"""
+Vectorized numeric evaluation of the symbolic work, volume and fitted expressions.
+
+The scripts used to evaluate an expression string with sympify + lambdify(modules="math") for every
+row and then call the result in a Python loop over the problem sizes. compile_expression() parses and
+lambdifies an expression once per (string, variables, fixed values) and returns a function that takes
+NumPy arrays:
+
+    volume = compile_expression("12*N**3 + 4*Sum(Max(k, N - 1)**2, (k, 0, N - 1))", fixed={"TSTEPS": 5})
+    volume(np.geomspace(2, 1e8, 60))
+
+Sum and Max terms are first resolved with bench_common.closed_form. Sums that remain are summed over
+NumPy ranges of the summation index, in chunks, for each point. Max and Min are evaluated element-wise, so their arguments may mix scalars and arrays.
+"""
+import functools
+import re
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import sympy as sp
+
+from bench_common.closed_form import closed_form
+
+SUM_CHUNK = 1 << 20
+
+# Names that may appear in expression strings in addition to those of SymPy
+_LOCALS = {
+    "int_floor": lambda a, b: sp.floor(a / b),
+    "int_ceil": lambda a, b: sp.ceiling(a / b),
+}
+
+_vmax = sp.Function("_vmax")
+_vmin = sp.Function("_vmin")
+_NUMPY_FUNCTIONS = {
+    "_vmax": lambda *args: functools.reduce(np.maximum, args),
+    "_vmin": lambda *args: functools.reduce(np.minimum, args),
+}
+
+
+_NAME = re.compile(r"\b([A-Za-z_]\w*)\b(?!\s*\()")
+_CONSTANTS = {"oo", "zoo", "nan", "pi", "True", "False"}
+
+
+def parse_expression(expr_str: str) -> sp.Expr:
+    """ Parse an expression string with plain symbols, also for names that are SymPy objects (N, S, E, ...). """
+    local_dict = {name: sp.Symbol(name) for name in _NAME.findall(expr_str) if name not in _CONSTANTS}
+    local_dict.update(_LOCALS)
+    return sp.sympify(expr_str, locals=local_dict)
+
+
+@functools.lru_cache(maxsize=None)
+def _free_names(expr_str: str) -> Tuple[str, ...]:
+    return tuple(sorted(str(s) for s in parse_expression(expr_str).free_symbols))
+
+
+def _lambdify(variables: Sequence[sp.Symbol], expr: sp.Expr) -> Callable:
+    expr = expr.replace(sp.Max, _vmax).replace(sp.Min, _vmin)
+    return sp.lambdify(list(variables), expr, modules=[_NUMPY_FUNCTIONS, "numpy"])
+
+
+def _outermost_sums(expr: sp.Expr):
+    sums = expr.atoms(sp.Sum)
+    return sorted((s for s in sums if not any(o != s and o.has(s) for o in sums)), key=sp.default_sort_key)
+
+
+def _build(expr: sp.Expr, variables: Tuple[sp.Symbol, ...]) -> Callable:
+    sums = _outermost_sums(expr)
+    dummies = [sp.Dummy(f"sum{i}") for i in range(len(sums))]
+    body = _lambdify(variables + tuple(dummies), expr.xreplace(dict(zip(sums, dummies))))
+    sum_fns = [_sum_evaluator(s, variables) for s in sums]
+
+    def evaluate(*args):
+        args = np.broadcast_arrays(*[np.asarray(a, dtype=np.float64) for a in args])
+        result = body(*args, *[g(*args) for g in sum_fns])
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), np.broadcast(*args).shape if args else ())
+
+    return evaluate
+
+
+def _sum_evaluator(s: sp.Sum, variables: Tuple[sp.Symbol, ...]) -> Callable:
+    # Sum(f, l_1, ..., l_n) is Sum(Sum(f, l_1, ..., l_n-1), l_n)
+    index, lower, upper = s.limits[-1]
+    inner = sp.Sum(s.function, *s.limits[:-1]) if len(s.limits) > 1 else s.function
+    summand = _build(inner, variables + (index, ))
+    lower_fn, upper_fn = _lambdify(variables, lower), _lambdify(variables, upper)
+
+    def evaluate(*args):
+        shape = np.broadcast(*args).shape if args else ()
+        out = np.empty(shape, dtype=np.float64)
+        for idx in np.ndindex(*shape):
+            values = [a[idx] for a in args]
+            lo, hi = int(np.floor(lower_fn(*values))), int(np.floor(upper_fn(*values)))
+            total = 0.0
+            for start in range(lo, hi + 1, SUM_CHUNK):
+                ks = np.arange(start, min(hi + 1, start + SUM_CHUNK), dtype=np.float64)
+                total += float(np.sum(summand(*values, ks)))
+            out[idx] = total
+        return out
+
+    return evaluate
+
+
+def _prepare(expr: sp.Expr, fixed: Dict[str, float]) -> sp.Expr:
+    expr = expr.subs({sp.Symbol(name): value for name, value in fixed.items()})
+    # Sums and maxima that can be decided become polynomials, evaluating them is O(1)
+    return closed_form(expr).doit()
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(expr_str: str, variables: Tuple[str, ...], fixed: Tuple[Tuple[str, float], ...]) -> Callable:
+    expr = _prepare(parse_expression(expr_str), dict(fixed))
+    symbols = tuple(sp.Symbol(v) for v in variables)
+    unbound = {str(s) for s in expr.free_symbols} - set(variables)
+    if unbound:
+        raise ValueError(f"{expr_str} has symbols {sorted(unbound)} that are neither variables nor fixed")
+    return _build(expr, symbols)
+
+
+def compile_expression(expr: Union[str, sp.Expr], variables: Sequence[str] = ("N", ),
+                       fixed: Optional[Dict[str, float]] = None) -> Callable:
+    """
+    Evaluator of expr as a function of variables, broadcasting over NumPy arrays and returning
+    float64. Symbols in fixed are replaced by their values first. Evaluators are cached by the
+    expression string.
+    """
+    return _compile(str(expr), tuple(variables), tuple(sorted((fixed or {}).items())))
+
+
+def evaluate(expr: Union[str, sp.Expr], values: Dict[str, float]) -> float:
+    """
+    Value of expr for values of all its symbols, e.g. the parameters of a preset.
+    """
+    names = [n for n in _free_names(str(expr)) if n in values]
+    return float(compile_expression(expr, names)(*[values[n] for n in names]))
@@ -0,0 +1,75 @@
+"""
+Counter model of the stand-in PAPI tools in this directory.
+
+Every event can only be counted on some of the hardware counters. A set of events can be counted
+together if each event gets its own counter (bipartite matching), which reproduces both pairwise
+conflicts and the limited number of counters of real PMUs.
+
+Set FAKE_PAPI_MODEL to a JSON file with the keys of DEFAULT_MODEL to use a different machine.
+"""
+import json
+import os
+
+_GENERAL = [0, 1, 2, 3]
+_L1 = [0, 1]
+_L3 = [4, 5]
+
+DEFAULT_MODEL = {
+    "papi_version": "7.1.0.0 (fake)",
+    "cpu_model": "Fake PMU with 6 counters (0, 0x0)",
+    "events": {
+        "PAPI_FP_OPS": [0],
+        "PAPI_DP_OPS": [0],
+        "PAPI_L1_DCM": _L1,
+        "PAPI_L1_ICM": _L1,
+        "PAPI_L1_TCM": _L1,
+        "PAPI_L1_LDM": _L1,
+        "PAPI_L1_STM": _L1,
+        "PAPI_L2_DCM": _GENERAL,
+        "PAPI_L2_ICM": _GENERAL,
+        "PAPI_L2_TCM": _GENERAL,
+        "PAPI_L2_DCA": _GENERAL,
+        "PAPI_L2_DCR": _GENERAL,
+        "PAPI_L2_DCW": _GENERAL,
+        "PAPI_L3_DCM": _L3,
+        "PAPI_L3_TCM": _L3,
+        "PAPI_L3_DCA": _L3,
+        "PAPI_L3_DCR": _L3,
+        "PAPI_L3_DCW": _L3,
+        "PAPI_LD_INS": _GENERAL,
+        "PAPI_SR_INS": _GENERAL,
+        "PAPI_LST_INS": [2, 3],
+        "PAPI_PRF_DM": [5],
+    }
+}
+
+
+def load_model():
+    path = os.environ.get("FAKE_PAPI_MODEL")
+    if not path:
+        return DEFAULT_MODEL
+    with open(path) as f:
+        return json.load(f)
+
+
+def event_code(model, event):
+    return 0x80000000 + sorted(model["events"]).index(event)
+
+
+def can_count(model, events):
+    """
+    True if every event can be assigned to a distinct counter.
+    """
+    assignment = dict()  # counter -> event
+
+    def assign(event, visited):
+        for counter in model["events"][event]:
+            if counter in visited:
+                continue
+            visited.add(counter)
+            if counter not in assignment or assign(assignment[counter], visited):
+                assignment[counter] = event
+                return True
+        return False
+
+    return all(event in model["events"] and assign(event, set()) for event in events)
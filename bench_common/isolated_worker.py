@@ -0,0 +1,125 @@
+"""
+Subprocess that runs work items with a wall-clock and memory limit.
+
+A hung or crashing compiled SDFG takes down the process that called it, so the collectors can run
+each benchmark in an IsolatedWorker instead of the main process. The worker talks to the parent
+through a pipe. The parent watches the deadline and the worker's resident set size while it waits
+for messages, and kills the worker when either limit is exceeded:
+
+    worker = IsolatedWorker(serve, (config, ), rss_limit_mb=8192)
+    worker.send(item)
+    try:
+        while (msg := worker.receive(deadline)) != "done":
+            ...
+    except WorkerFailed as e:
+        print(e.kind, e)  # "timeout", "memory" or "crash", the worker is dead afterwards
+
+target(conn, *args) runs in the spawned process and receives the items with conn.recv(), None asks
+it to exit.
+"""
+import multiprocessing as mp
+import os
+import time
+from typing import Callable, Optional, Sequence
+
+POLL_INTERVAL = 0.5
+
+
+class WorkerFailed(Exception):
+
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """ Resident set size of a process in MB, None if it is gone. """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        return None
+    return 0.0
+
+
+class IsolatedWorker:
+    """
+    :param target: Module-level function run in the worker as target(conn, *args).
+    :param rss_limit_mb: Resident set size above which the worker is killed, None for no limit.
+    """
+
+    def __init__(self, target: Callable, args: Sequence = (), rss_limit_mb: Optional[float] = None):
+        self.rss_limit_mb = rss_limit_mb
+        self.items = 0
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        # Not a daemon, the worker may start processes of its own (cache flusher, compile pool)
+        self._process = ctx.Process(target=target, args=(child_conn, *args))
+        self._process.start()
+        child_conn.close()  # so that receive() sees EOF when the worker dies
+
+    @property
+    def alive(self) -> bool:
+        return self._process.is_alive()
+
+    def send(self, item):
+        self.items += 1
+        self._conn.send(item)
+
+    @property
+    def connection(self):
+        """ Parent end of the pipe, for multiprocessing.connection.wait over several workers. """
+        return self._conn
+
+    def receive(self, deadline: Optional[float] = None):
+        """
+        Wait for the next message of the worker until deadline (a time.monotonic() value).
+        """
+        while True:
+            wait = POLL_INTERVAL if deadline is None else min(POLL_INTERVAL, deadline - time.monotonic())
+            has_message, msg = self._check(deadline, wait)
+            if has_message:
+                return msg
+
+    def poll(self, deadline: Optional[float] = None):
+        """
+        Like receive(), but return None at once if the worker has not sent a message yet.
+        """
+        return self._check(deadline, 0)[1]
+
+    def _check(self, deadline: Optional[float], wait: float):
+        if self._conn.poll(max(0, wait)):
+            try:
+                return True, self._conn.recv()
+            except (EOFError, OSError):
+                self._process.join()
+                raise WorkerFailed("crash", f"worker exited with code {self._process.exitcode}")
+        if deadline is not None and time.monotonic() >= deadline:
+            self.kill()
+            raise WorkerFailed("timeout", "wall-clock limit exceeded")
+        if self.rss_limit_mb is not None:
+            rss = rss_mb(self._process.pid)
+            if rss is not None and rss > self.rss_limit_mb:
+                self.kill()
+                raise WorkerFailed("memory", f"resident set size {rss:.0f} MB exceeds {self.rss_limit_mb} MB")
+        if not self._process.is_alive() and not self._conn.poll():
+            raise WorkerFailed("crash", f"worker exited with code {self._process.exitcode}")
+        return False, None
+
+    def kill(self):
+        if self._process.is_alive():
+            self._process.kill()
+        self._process.join()
+        self._conn.close()
+
+    def close(self, timeout: float = 10):
+        """ Ask the worker to exit, kill it if it does not. """
+        if self._process.is_alive():
+            try:
+                self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(timeout)
+        self.kill()
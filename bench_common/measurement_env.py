@@ -0,0 +1,162 @@
+"""
+Control and record the environment a collection run is measured in.
+
+MeasurementEnvironment sets the OpenMP thread count, binding and places and the CPU affinity of the
+measuring process, and reads the frequency governor, frequency limits, turbo and SMT state from
+sysfs so they can be stored next to the run_id.
+
+OpenMP reads OMP_PROC_BIND and OMP_PLACES only when the runtime is initialized. Once a compiled SDFG
+has loaded it in this process, apply() can still change the thread count (omp_set_num_threads through
+ctypes) and the affinity of the measuring thread, but not the binding of the existing worker threads.
+Thread-count sweeps that need exact pinning should therefore run with --isolate, where each benchmark
+starts in a fresh process that inherits the environment.
+"""
+import ctypes
+import os
+import socket
+from typing import Dict, Iterable, List, Optional
+
+SYSFS_CPU = "/sys/devices/system/cpu"
+OPENMP_LIBRARIES = ("libgomp", "libiomp5", "libomp")
+
+
+def parse_cpu_list(cpus: str) -> List[int]:
+    """ Parse a cpu list like "0-3,8,10-11" as used by sysfs and taskset. """
+    cores = []
+    for part in cpus.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cores.extend(range(int(first), int(last) + 1))
+        else:
+            cores.append(int(part))
+    return cores
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _loaded_openmp_runtimes() -> List[str]:
+    paths = []
+    try:
+        with open("/proc/self/maps") as f:
+            for line in f:
+                path = line.split()[-1]
+                name = os.path.basename(path)
+                if name.startswith(OPENMP_LIBRARIES) and path not in paths:
+                    paths.append(path)
+    except OSError:
+        pass
+    return paths
+
+
+def set_openmp_threads(threads: int) -> bool:
+    """
+    Call omp_set_num_threads in every OpenMP runtime already loaded into this process. Returns False
+    if none is loaded yet, the runtime then picks up OMP_NUM_THREADS when it is loaded.
+    """
+    runtimes = _loaded_openmp_runtimes()
+    for path in runtimes:
+        ctypes.CDLL(path).omp_set_num_threads(ctypes.c_int(threads))
+    return bool(runtimes)
+
+
+def _turbo() -> Optional[str]:
+    no_turbo = _read(os.path.join(SYSFS_CPU, "intel_pstate", "no_turbo"))
+    if no_turbo is not None:
+        return "off" if no_turbo == "1" else "on"
+    boost = _read(os.path.join(SYSFS_CPU, "cpufreq", "boost"))
+    if boost is not None:
+        return "on" if boost == "1" else "off"
+    return None
+
+
+class MeasurementEnvironment:
+    """
+    The environment owns the CPU affinity of the run: apply() pins the measuring process to cores and
+    compile_cores() are the cores left for compiling ahead. Neither reads the live affinity, which
+    apply() has changed.
+
+    :param threads: OpenMP thread count, None leaves it to the runtime.
+    :param cores: Cores the run may use, defaults to the current affinity of this process.
+    :param pin: Restrict the affinity to the first threads cores instead of all given cores.
+    :param measure_core: Core of the measuring thread, first of the measurement cores. Without
+                         threads the measurement is pinned to this core alone.
+    """
+
+    def __init__(self, threads: Optional[int] = None, cores: Optional[Iterable[int]] = None,
+                 proc_bind: str = "close", places: str = "cores", pin: bool = True,
+                 measure_core: Optional[int] = None):
+        self.threads = threads
+        self.all_cores = sorted(cores if cores is not None else os.sched_getaffinity(0))
+        self.proc_bind = proc_bind
+        self.places = places
+        self.measure_core = measure_core
+        ordered = self.all_cores
+        if measure_core is not None:
+            if measure_core not in self.all_cores:
+                raise ValueError(f"Measure core {measure_core} is not one of the cores {self.all_cores}")
+            ordered = [measure_core] + [c for c in self.all_cores if c != measure_core]
+        if threads is not None and pin:
+            if threads > len(self.all_cores):
+                print(f"{threads} threads on {len(self.all_cores)} cores, the cores will be oversubscribed")
+            self.cores = ordered[:max(1, threads)]
+        elif measure_core is not None and threads is None:
+            self.cores = [measure_core]
+        else:
+            self.cores = ordered
+
+    def compile_cores(self) -> List[int]:
+        """
+        Cores for the compile workers: those not measured on, or all but the measure core (the first
+        measurement core) if the measurement uses every core.
+        """
+        spare = [c for c in self.all_cores if c not in self.cores]
+        if spare:
+            return spare
+        return [c for c in self.all_cores if c != self.cores[0]] or list(self.all_cores)
+
+    def apply(self):
+        os.environ["OMP_PROC_BIND"] = self.proc_bind
+        os.environ["OMP_PLACES"] = self.places
+        if self.threads is not None:
+            os.environ["OMP_NUM_THREADS"] = str(self.threads)
+            set_openmp_threads(self.threads)
+        os.sched_setaffinity(0, self.cores)
+
+    def describe(self) -> Dict[str, object]:
+        """ State of the environment for the run_environment table. """
+        governors, cur_freqs, min_freqs, max_freqs = set(), [], [], []
+        for core in self.cores:
+            cpufreq = os.path.join(SYSFS_CPU, f"cpu{core}", "cpufreq")
+            governor = _read(os.path.join(cpufreq, "scaling_governor"))
+            if governor is not None:
+                governors.add(governor)
+            for name, values in (("scaling_cur_freq", cur_freqs), ("scaling_min_freq", min_freqs),
+                                 ("scaling_max_freq", max_freqs)):
+                value = _read(os.path.join(cpufreq, name))
+                if value is not None and value.isdigit():
+                    values.append(int(value))
+
+        smt_active = _read(os.path.join(SYSFS_CPU, "smt", "active"))
+        return {
+            "hostname": socket.gethostname(),
+            "threads": self.threads,
+            "cores": ",".join(str(c) for c in self.cores),
+            "omp_proc_bind": self.proc_bind,
+            "omp_places": self.places,
+            "governor": ",".join(sorted(governors)) or None,
+            "cur_freq_khz": sum(cur_freqs) / len(cur_freqs) if cur_freqs else None,
+            "min_freq_khz": min(min_freqs) if min_freqs else None,
+            "max_freq_khz": max(max_freqs) if max_freqs else None,
+            "turbo": _turbo(),
+            "smt_active": int(smt_active) if smt_active is not None and smt_active.isdigit() else None,
+            "smt_control": _read(os.path.join(SYSFS_CPU, "smt", "control")),
+        }
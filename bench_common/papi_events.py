@@ -0,0 +1,296 @@
+"""
+Discovery of the available PAPI events and their partitioning into event sets that can be counted
+together.
+
+papi_event_chooser is asked whether events can be added to a set. Asking it once per event on
+every run is slow, so the partitions are cached on disk per machine (CPU model and PAPI version, see
+machine_key) and per requested event list.
+
+Two packing strategies are available:
+ - "greedy":    the original approach, grow one set until nothing else can be added.
+ - "colouring": build the pairwise conflict graph of the events and colour it with DSatur, each
+                colour is one event set. Every placement is confirmed with papi_event_chooser, since
+                pairwise compatible events can still exceed the number of hardware counters.
+                Afterwards the smallest sets are dissolved into the others where possible,
+                moving events directly or swapping them with an event that fits elsewhere.
+                This usually needs fewer event sets, i.e. fewer measured passes. The extra
+                papi_event_chooser calls are only paid once per machine thanks to the cache.
+
+The stand-in tools in bench_common/fake_papi make this usable without PAPI:
+
+    PATH=bench_common/fake_papi:$PATH python collect_roofline_metrics_papi.py ...
+"""
+import hashlib
+import json
+import os
+import re
+import subprocess
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+CACHE_DIR = os.environ.get(
+    "BENCH_PAPI_EVENT_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, ".cache", "papi_event_sets"))
+
+PACKINGS = ("greedy", "colouring")
+
+
+def _papi_avail_output() -> Optional[str]:
+    try:
+        result = subprocess.run(["papi_avail"], stdout=subprocess.PIPE, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout
+
+
+def get_available_papi_events():
+    """
+    Extract available (Avail == Yes) PAPI preset event names
+    from papi_avail output.
+    """
+    events = []
+
+    result = subprocess.run(
+        ["papi_avail"],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    output = result.stdout
+    for line in output.splitlines():
+        line = line.strip()
+
+        # Capture: name, code, availability
+        match = re.match(
+            r"^(PAPI_[A-Z0-9_]+)\s+0x[0-9a-fA-F]+\s+(Yes|No)\b",
+            line,
+        )
+        if match and match.group(2) == "Yes":
+            events.append(match.group(1))
+
+    return set(events)
+
+
+def get_native_papi_events():
+    result = subprocess.run(
+        ["papi_native_avail"],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    output = result.stdout
+    events: dict[str, list[str]] = defaultdict(list)
+    current_event = None
+
+    event_header_re = re.compile(r"^\|\s*([A-Za-z0-9_:.-]+)\s*\|$")
+    modifier_re = re.compile(r"^\|\s*:([A-Za-z0-9_]+)")
+
+    for line in output.splitlines():
+        line = line.rstrip()
+
+        # Match event header
+        header_match = event_header_re.match(line)
+        if header_match:
+            current_event = header_match.group(1)
+            events[current_event] = []
+            continue
+
+        # Match modifiers within an event block
+        if current_event:
+            mod_match = modifier_re.match(line)
+            if mod_match:
+                modifier = mod_match.group(1)
+                events[current_event].append(modifier)
+
+    return dict(events)
+
+
+def machine_key() -> Dict[str, str]:
+    """
+    CPU model and PAPI version of this machine, read from the papi_avail header with
+    /proc/cpuinfo as fallback for the model.
+    """
+    key = {"cpu_model": "unknown", "papi_version": "unknown"}
+    output = _papi_avail_output() or ""
+    for line in output.splitlines():
+        name, _, value = line.partition(":")
+        name = name.strip()
+        if name == "PAPI version":
+            key["papi_version"] = value.strip()
+        elif name == "Model string and code":
+            key["cpu_model"] = value.strip()
+
+    if key["cpu_model"] == "unknown" and os.path.isfile("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    key["cpu_model"] = line.partition(":")[2].strip()
+                    break
+    return key
+
+
+def papi_addable_events(current: list[str]|set[str]) -> Optional[set[str]]:
+    """
+    Return preset events that can be added to the given event set,
+    None if the given events can not be counted together.
+    """
+    proc = subprocess.run(
+        ["papi_event_chooser", "PRESET", *current],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        return None
+
+    addable = set()
+    for line in proc.stdout.splitlines():
+        line = line.strip()
+        if line.startswith("PAPI_"):
+            event = line.split(None, 1)[0]
+            addable.add(event)
+    return addable
+
+
+class _EventChooser:
+    """ Memoizes papi_event_chooser queries for one partitioning run. """
+
+    def __init__(self):
+        self._addable: Dict[FrozenSet[str], Optional[Set[str]]] = dict()
+
+    def addable(self, current: Iterable[str]) -> Set[str]:
+        key = frozenset(current)
+        if key not in self._addable:
+            self._addable[key] = papi_addable_events(sorted(key))
+        return self._addable[key] or set()
+
+
+def build_papi_event_sets(events:set[str]|list[str]):
+    remaining = set(events)
+    event_sets = []
+
+    while remaining:
+        x = next(iter(remaining))
+        current = [x]
+
+        while True:
+            addable = papi_addable_events(current) or set()
+            candidates = addable & remaining
+
+            if not candidates:
+                break
+
+            y = next(iter(candidates))
+            current.append(y)
+
+        event_sets.append(current)
+        remaining -= set(current)
+
+    return event_sets
+
+
+def build_papi_event_sets_colouring(events:set[str]|list[str]) -> List[List[str]]:
+    """
+    Partition events into event sets by DSatur colouring of their pairwise conflict graph.
+    """
+    events = sorted(set(events))
+    chooser = _EventChooser()
+
+    compatible = {e: chooser.addable([e]) for e in events}
+    conflicts = {e: set() for e in events}
+    for i, a in enumerate(events):
+        for b in events[i + 1:]:
+            if b not in compatible[a] or a not in compatible[b]:
+                conflicts[a].add(b)
+                conflicts[b].add(a)
+
+    colour_classes: List[List[str]] = []
+    colour_of: Dict[str, int] = dict()
+    uncoloured = set(events)
+    while uncoloured:
+        # DSatur: most distinct neighbour colours first, ties broken by degree and name
+        event = max(uncoloured,
+                    key=lambda e: (len({colour_of[n] for n in conflicts[e] if n in colour_of}), len(conflicts[e]), e))
+        for colour, members in enumerate(colour_classes):
+            if conflicts[event] & set(members):
+                continue
+            if event in chooser.addable(members):
+                members.append(event)
+                colour_of[event] = colour
+                break
+        else:
+            colour_of[event] = len(colour_classes)
+            colour_classes.append([event])
+        uncoloured.remove(event)
+
+    return _merge_smallest_sets(colour_classes, chooser)
+
+
+def _merge_smallest_sets(event_sets: List[List[str]], chooser: _EventChooser) -> List[List[str]]:
+    """
+    Try to empty the smallest event set by moving its events into the others, directly or by
+    swapping them with an event that fits into a third set. Repeats until no set can be removed.
+    """
+    event_sets = sorted((list(s) for s in event_sets), key=len)
+    while len(event_sets) > 1:
+        smallest, trial = event_sets[0], [list(s) for s in event_sets[1:]]
+        for event in smallest:
+            if _place(event, trial, chooser):
+                continue
+            if not _place_by_swap(event, trial, chooser):
+                break
+        else:
+            event_sets = sorted(trial, key=len)
+            continue
+        break
+    return event_sets
+
+
+def _place(event: str, event_sets: List[List[str]], chooser: _EventChooser, skip: int = -1) -> bool:
+    for i, members in enumerate(event_sets):
+        if i != skip and event in chooser.addable(members):
+            members.append(event)
+            return True
+    return False
+
+
+def _place_by_swap(event: str, event_sets: List[List[str]], chooser: _EventChooser) -> bool:
+    for i, members in enumerate(event_sets):
+        for other in members:
+            rest = [e for e in members if e != other]
+            if event not in chooser.addable(rest):
+                continue
+            if _place(other, event_sets, chooser, skip=i):
+                members.remove(other)
+                members.append(event)
+                return True
+    return False
+
+
+def get_papi_event_sets(events:set[str]|list[str], packing: str = "colouring", use_cache: bool = True,
+                        cache_dir: str = CACHE_DIR) -> List[List[str]]:
+    """
+    Return compatible event sets covering events, cached per machine, packing and event list.
+    """
+    if packing not in PACKINGS:
+        raise ValueError(f"Unknown event set packing {packing}, expected one of {PACKINGS}")
+
+    key = json.dumps({"machine": machine_key(), "packing": packing, "events": sorted(set(events))}, sort_keys=True)
+    path = os.path.join(cache_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+    if use_cache and os.path.isfile(path):
+        with open(path) as f:
+            return json.load(f)["event_sets"]
+
+    if packing == "greedy":
+        event_sets = build_papi_event_sets(events)
+    else:
+        event_sets = build_papi_event_sets_colouring(events)
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": json.loads(key), "event_sets": event_sets}, f, indent=4)
+        os.replace(tmp_path, path)
+    return event_sets
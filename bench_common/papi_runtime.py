@@ -0,0 +1,166 @@
+"""
+PAPI instrumentation whose event set is chosen when the compiled SDFG is called, not when it is built.
+
+DaCe's PAPI_Counters instrumentation bakes the events into C++ template arguments
+(dace::perf::PAPIValues<...>), so every event set requires a full rebuild. The provider in this
+module instead emits plain PAPI low-level calls that read a comma separated event list from the
+environment variable EVENTS_ENV_VAR on every invocation. A benchmark is compiled once and the
+collector swaps event sets with select_events() between calls.
+
+Counters are recorded at SDFG scope for every thread of the OpenMP team: the event sets are created
+and started in an OpenMP parallel region before the SDFG body and read in another one after it, on
+the same pool threads that run the parallel regions of the SDFG. They are written per thread to the
+regular instrumentation report, so report.counters[uuid][sdfg_element][event][tid] looks the same as
+for DaCe's PAPI_Counters instrumentation of the SDFG, and summing over the threads gives the total.
+Parallel regions with more threads than omp_get_max_threads() at the start of the call, or threads
+created outside of OpenMP, are not counted.
+
+The generated code needs libpapi. link_papi(sdfg) adds it to the linker flags only while that SDFG
+is compiled, bench_common.artifact_cache does this for every build.
+
+Import this module before compiling or loading an SDFG that uses PAPI_RUNTIME_COUNTERS.
+"""
+import os
+from contextlib import contextmanager
+from typing import Iterable
+
+import dace
+from dace import dtypes, registry
+from dace.config import Config
+from dace.codegen.instrumentation.provider import InstrumentationProvider
+
+EVENTS_ENV_VAR = "BENCH_PAPI_EVENTS"
+
+if "PAPI_Runtime_Counters" not in dtypes.InstrumentationType.__members__:
+    dtypes.InstrumentationType.register("PAPI_Runtime_Counters")
+PAPI_RUNTIME_COUNTERS = dtypes.InstrumentationType.PAPI_Runtime_Counters
+
+
+def select_events(events: Iterable[str]):
+    """
+    Select the PAPI events counted by the next calls of a compiled SDFG in this process.
+    """
+    os.environ[EVENTS_ENV_VAR] = ",".join(sorted(events))
+
+
+def _sdfg_id(sdfg: dace.SDFG) -> int:
+    # Renamed from sdfg_id to cfg_id in newer DaCe versions
+    return sdfg.cfg_id if hasattr(sdfg, "cfg_id") else sdfg.sdfg_id
+
+
+def uses_runtime_counters(sdfg: dace.SDFG) -> bool:
+    return any(s.instrument == PAPI_RUNTIME_COUNTERS for s in sdfg.all_sdfgs_recursive())
+
+
+@contextmanager
+def link_papi(sdfg: dace.SDFG):
+    """
+    Link libpapi into the libraries compiled in this block if sdfg uses PAPI_RUNTIME_COUNTERS, and
+    restore the compiler configuration afterwards.
+    """
+    libs = Config.get("compiler", "cpu", "libs") or ""
+    if not uses_runtime_counters(sdfg) or "papi" in libs.split():
+        yield
+        return
+    Config.set("compiler", "cpu", "libs", value=(libs + " papi").strip())
+    try:
+        yield
+    finally:
+        Config.set("compiler", "cpu", "libs", value=libs)
+
+
+@registry.autoregister_params(type=PAPI_RUNTIME_COUNTERS)
+class PAPIRuntimeInstrumentation(InstrumentationProvider):
+    """ SDFG-scope PAPI counters per OpenMP thread, with the event set read from the environment at call time. """
+
+    def on_sdfg_begin(self, sdfg, local_stream, global_stream, codegen):
+        if sdfg.instrument != PAPI_RUNTIME_COUNTERS:
+            return
+        sid = _sdfg_id(sdfg)
+        global_stream.write('''
+#include <papi.h>
+#include <omp.h>
+#include <pthread.h>
+#include <cstdio>
+#include <cstdlib>
+#include <sstream>
+#include <string>
+#include <vector>
+''', sdfg)
+        local_stream.write(f'''
+const int __papi_rt_threads_{sid} = omp_get_max_threads();
+std::vector<std::string> __papi_rt_names_{sid};
+std::vector<int> __papi_rt_codes_{sid};
+std::vector<int> __papi_rt_eventsets_{sid}(__papi_rt_threads_{sid}, PAPI_NULL);
+std::vector<std::vector<long long>> __papi_rt_values_{sid}(__papi_rt_threads_{sid});
+{{
+    if (PAPI_is_initialized() == PAPI_NOT_INITED) {{
+        if (PAPI_library_init(PAPI_VER_CURRENT) != PAPI_VER_CURRENT) {{
+            fprintf(stderr, "PAPI_library_init failed\\n");
+        }} else if (PAPI_thread_init((unsigned long (*)(void)) pthread_self) != PAPI_OK) {{
+            fprintf(stderr, "PAPI_thread_init failed\\n");
+        }}
+    }}
+    const char *__papi_rt_env = std::getenv("{EVENTS_ENV_VAR}");
+    std::stringstream __papi_rt_stream(__papi_rt_env ? __papi_rt_env : "");
+    std::string __papi_rt_event;
+    while (std::getline(__papi_rt_stream, __papi_rt_event, ',')) {{
+        if (__papi_rt_event.empty()) continue;
+        int __papi_rt_code;
+        int __papi_rt_err = PAPI_event_name_to_code(__papi_rt_event.c_str(), &__papi_rt_code);
+        if (__papi_rt_err != PAPI_OK) {{
+            fprintf(stderr, "Unknown PAPI event %s: %s\\n", __papi_rt_event.c_str(), PAPI_strerror(__papi_rt_err));
+            continue;
+        }}
+        __papi_rt_names_{sid}.push_back(__papi_rt_event);
+        __papi_rt_codes_{sid}.push_back(__papi_rt_code);
+    }}
+    if (!__papi_rt_names_{sid}.empty()) {{
+        #pragma omp parallel num_threads(__papi_rt_threads_{sid})
+        {{
+            const int __papi_rt_tid = omp_get_thread_num();
+            int &__papi_rt_set = __papi_rt_eventsets_{sid}[__papi_rt_tid];
+            __papi_rt_values_{sid}[__papi_rt_tid].assign(__papi_rt_names_{sid}.size(), 0);
+            PAPI_register_thread();
+            if (PAPI_create_eventset(&__papi_rt_set) != PAPI_OK ||
+                PAPI_add_events(__papi_rt_set, __papi_rt_codes_{sid}.data(), __papi_rt_codes_{sid}.size()) != PAPI_OK ||
+                PAPI_start(__papi_rt_set) != PAPI_OK) {{
+                fprintf(stderr, "Could not start the PAPI events on thread %d\\n", __papi_rt_tid);
+                if (__papi_rt_set != PAPI_NULL) {{
+                    PAPI_cleanup_eventset(__papi_rt_set);
+                    PAPI_destroy_eventset(&__papi_rt_set);
+                }}
+                __papi_rt_set = PAPI_NULL;
+                __papi_rt_values_{sid}[__papi_rt_tid].clear();
+            }}
+        }}
+    }}
+}}
+''', sdfg)
+
+    def on_sdfg_end(self, sdfg, local_stream, global_stream):
+        if sdfg.instrument != PAPI_RUNTIME_COUNTERS:
+            return
+        sid = _sdfg_id(sdfg)
+        local_stream.write(f'''
+if (!__papi_rt_names_{sid}.empty()) {{
+    #pragma omp parallel num_threads(__papi_rt_threads_{sid})
+    {{
+        const int __papi_rt_tid = omp_get_thread_num();
+        int &__papi_rt_set = __papi_rt_eventsets_{sid}[__papi_rt_tid];
+        if (__papi_rt_set != PAPI_NULL) {{
+            PAPI_stop(__papi_rt_set, __papi_rt_values_{sid}[__papi_rt_tid].data());
+            PAPI_cleanup_eventset(__papi_rt_set);
+            PAPI_destroy_eventset(&__papi_rt_set);
+        }}
+        PAPI_unregister_thread();
+    }}
+    for (int __papi_rt_tid = 0; __papi_rt_tid < __papi_rt_threads_{sid}; ++__papi_rt_tid) {{
+        if (__papi_rt_values_{sid}[__papi_rt_tid].empty()) continue;
+        for (size_t __papi_rt_i = 0; __papi_rt_i < __papi_rt_names_{sid}.size(); ++__papi_rt_i) {{
+            __state->report.add_counter("SDFG {sdfg.name}", "papi", __papi_rt_names_{sid}[__papi_rt_i].c_str(),
+                                        __papi_rt_values_{sid}[__papi_rt_tid][__papi_rt_i], __papi_rt_tid, {sid}, -1, -1);
+        }}
+    }}
+}}
+''', sdfg)
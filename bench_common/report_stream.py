@@ -0,0 +1,80 @@
+"""
+Incremental reading of the instrumentation reports of a compiled SDFG.
+
+sdfg.get_instrumentation_reports() parses every report ever written to <build_folder>/perf, and the
+collectors sorted all of them after each event set to slice off the newest ones. That gets slower
+with every report the sweep adds, and the slice also mixed warmup reports into the measured ones.
+ReportStream keeps a watermark of the report files it has already seen and parses only the new ones,
+each exactly once:
+
+    stream = ReportStream(c_sdfg.sdfg.build_folder)
+    c_sdfg(**args)              # warmup
+    stream.skip()               # warmup report is marked as seen, not parsed
+    c_sdfg(**args)              # measured run
+    reports = stream.take()     # the measured report
+"""
+import os
+from typing import Iterator, List, Set, Tuple
+
+from dace.codegen.instrumentation.report import InstrumentationReport
+
+
+def _report_time(filename: str) -> int:
+    try:
+        return int(filename[len("report-"):-len(".json")])
+    except ValueError:
+        return -1
+
+
+def element_uuid(uuid) -> str:
+    """
+    Text form of a report element uuid, the (cfg_id, state_id, node_id) tuple joined by slashes.
+    """
+    if isinstance(uuid, (tuple, list)):
+        return "/".join(str(i) for i in uuid)
+    return str(uuid)
+
+
+def iter_counters(report: InstrumentationReport) -> Iterator[Tuple[str, str, str, str, int]]:
+    """
+    Flatten report.counters into (uuid, sdfg_element, event, thread_id, value) tuples.
+    """
+    for uuid, elements in report.counters.items():
+        for sdfg_element, events in elements.items():
+            for event_name, threads in events.items():
+                for tid, values in threads.items():
+                    yield uuid, sdfg_element, event_name, tid, values[0]
+
+
+class ReportStream:
+    """
+    :param build_folder: Build folder of the SDFG, reports already present in it are not returned.
+    """
+
+    def __init__(self, build_folder: str):
+        self.path = os.path.join(build_folder, "perf")
+        self._seen: Set[str] = self._list()
+
+    def _list(self) -> Set[str]:
+        try:
+            with os.scandir(self.path) as entries:
+                return {e.name for e in entries if e.name.startswith("report-") and e.name.endswith(".json")}
+        except FileNotFoundError:
+            return set()
+
+    def _new(self) -> List[str]:
+        new = sorted(self._list() - self._seen, key=_report_time)
+        self._seen.update(new)
+        return new
+
+    def skip(self) -> int:
+        """
+        Mark the reports written since the last call as seen without parsing them.
+        """
+        return len(self._new())
+
+    def take(self) -> List[InstrumentationReport]:
+        """
+        Parse and return the reports written since the last call, oldest first.
+        """
+        return [InstrumentationReport(os.path.join(self.path, name)) for name in self._new()]
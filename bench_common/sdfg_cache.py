@@ -0,0 +1,163 @@
+"""
+Content-addressed on-disk cache for the SDFGs of the npbench DaCe implementations.
+
+Parsing a DaCe program and running simplify()/auto_optimize() on it takes seconds to minutes per
+benchmark, and every script used to redo it on every invocation. The transformed SDFGs are stored
+as JSON files keyed by the source hash of the benchmark module, the DaCe version and the name of the
+transformation pipeline, so a change to any of these produces a new entry instead of a stale hit.
+"""
+import copy
+import hashlib
+import importlib
+import inspect
+import json
+import os
+
+import dace
+import dace.transformation.auto.auto_optimize as opt
+
+from npbench.infrastructure import (Benchmark, utilities as util, DaceFramework)
+
+CACHE_DIR = os.environ.get(
+    "BENCH_SDFG_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, ".cache", "sdfgs"))
+
+PIPELINE_PARSE = "parse"
+PIPELINE_SIMPLIFY = "parse+simplify"
+
+
+def auto_optimize_pipeline(device: dace.dtypes.DeviceType = dace.dtypes.DeviceType.CPU, **auto_opt_kwargs) -> str:
+    """
+    Name of the pipeline parse -> auto_optimize(device, **auto_opt_kwargs), used as part of the cache key.
+    """
+    options = [device.name] + [f"{k}={v}" for k, v in sorted(auto_opt_kwargs.items())]
+    return "parse+auto_optimize({})".format(",".join(options))
+
+
+def get_dace_implementation(bench: Benchmark, dace_framework: DaceFramework):
+    """
+    Import the DaCe implementation of a benchmark.
+
+    :return: (module, module_str, func_str)
+    """
+    module_pypath = "npbench.benchmarks.{r}.{m}".format(r=bench.info["relative_path"].replace('/', '.'),
+                                                        m=bench.info["module_name"])
+    if "postfix" in dace_framework.info.keys():
+        postfix = dace_framework.info["postfix"]
+    else:
+        postfix = dace_framework.fname
+    module_str = "{m}_{p}".format(m=module_pypath, p=postfix)
+    func_str = bench.info["func_name"]
+
+    try:
+        module = importlib.import_module(module_str)
+    except Exception as e:
+        print("Failed to load the DaCe implementation.")
+        raise (e)
+    return module, module_str, func_str
+
+
+def sdfg_cache_key(module, func_str: str, pipeline: str) -> str:
+    """
+    Key of a cached SDFG: hash of the benchmark module source, DaCe version and transformation pipeline.
+    """
+    source_hash = hashlib.sha256(inspect.getsource(module).encode()).hexdigest()
+    key = json.dumps({
+        "source": source_hash,
+        "function": func_str,
+        "dace": dace.__version__,
+        "pipeline": pipeline
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _cache_path(key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{key}.sdfg")
+
+
+def load_cached_sdfg(key: str, cache_dir: str = CACHE_DIR):
+    """
+    Return the cached SDFG for key or None on a cache miss.
+    """
+    path = _cache_path(key, cache_dir)
+    if not os.path.isfile(path):
+        return None
+    try:
+        return dace.SDFG.from_file(path)
+    except Exception:
+        # Truncated or written by an incompatible DaCe version, rebuild it
+        return None
+
+
+def store_cached_sdfg(key: str, sdfg: dace.SDFG, cache_dir: str = CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(key, cache_dir)
+    # Save next to the final location and rename, concurrent scripts never read half-written files
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    sdfg.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def get_bench_sdfg(bench: Benchmark, dace_framework: DaceFramework, use_cache: bool = True):
+    """
+    Return the parsed (unsimplified) SDFG of a benchmark and a simplified copy of it.
+
+    :param use_cache: Load the SDFGs from and store them in the on-disk cache.
+    :return: (base_sdfg, simplified_sdfg)
+    """
+    module, module_str, func_str = get_dace_implementation(bench, dace_framework)
+    base_key = sdfg_cache_key(module, func_str, PIPELINE_PARSE)
+    simplified_key = sdfg_cache_key(module, func_str, PIPELINE_SIMPLIFY)
+
+    if use_cache:
+        base_sdfg = load_cached_sdfg(base_key)
+        simplified_sdfg = load_cached_sdfg(simplified_key)
+        if base_sdfg is not None and simplified_sdfg is not None:
+            return base_sdfg, simplified_sdfg
+
+    ct_impl = getattr(module, func_str)
+    base_sdfg, _ = util.benchmark("__npb_result = ct_impl.to_sdfg(simplify=False)",
+                                  out_text="DaCe parsing time",
+                                  context=locals(),
+                                  output='__npb_result',
+                                  verbose=False)
+    strict_sdfg = copy.deepcopy(base_sdfg)
+    strict_sdfg._name = "strict"
+    util.benchmark("strict_sdfg.simplify()",
+                   out_text="DaCe Strict Transformations time",
+                   context=locals(),
+                   verbose=False)
+
+    if use_cache:
+        store_cached_sdfg(base_key, base_sdfg)
+        store_cached_sdfg(simplified_key, strict_sdfg)
+
+    return base_sdfg, strict_sdfg
+
+
+def get_optimized_sdfg(bench: Benchmark,
+                       dace_framework: DaceFramework,
+                       device: dace.dtypes.DeviceType = dace.dtypes.DeviceType.CPU,
+                       use_cache: bool = True,
+                       **auto_opt_kwargs):
+    """
+    Return the auto-optimized SDFG of a benchmark.
+
+    Exceptions raised by auto_optimize are propagated, failed pipelines are not cached.
+
+    :param auto_opt_kwargs: Additional keyword arguments for auto_optimize, e.g. expand_library_nodes=False.
+    """
+    module, _, func_str = get_dace_implementation(bench, dace_framework)
+    key = sdfg_cache_key(module, func_str, auto_optimize_pipeline(device, **auto_opt_kwargs))
+
+    if use_cache:
+        sdfg = load_cached_sdfg(key)
+        if sdfg is not None:
+            return sdfg
+
+    sdfg, _ = get_bench_sdfg(bench, dace_framework, use_cache=use_cache)
+    opt.auto_optimize(sdfg, device, **auto_opt_kwargs)
+
+    if use_cache:
+        store_cached_sdfg(key, sdfg)
+    return sdfg
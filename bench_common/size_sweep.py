@@ -0,0 +1,48 @@
+"""
+Synthetic presets for sweeping the problem size of a benchmark.
+
+npbench only defines the presets S, M, L and paper. sweep_factors() gives a geometric series of scale
+factors, and add_sweep_preset() registers a preset in benchmark.info["parameters"] whose integer
+parameters are those of a base preset times the factor, so Benchmark.get_data() generates inputs of
+that size. Time-step and iteration counts are not scaled, as they change the amount of work but not
+the size of the data.
+
+The compiled SDFG is symbolic in the size parameters, so all points of a sweep run with one build.
+"""
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# Parameters that count time steps or iterations, kept at their preset value
+TIME_PARAMETERS = {"TSTEPS", "TMAX", "nt", "nit", "niter", "maxiter"}
+
+
+def sweep_factors(low: float, high: float, points: int) -> List[float]:
+    """ Geometric series of points scale factors from low to high, rounded to 3 significant digits. """
+    factors = np.geomspace(low, high, num=max(1, points))
+    return sorted({float(f"{f:.3g}") for f in factors})
+
+
+def point_name(factor: float) -> str:
+    """ Suffix of the benchmark label and preset name of a sweep point. """
+    return f"x{factor:g}"
+
+
+def scale_parameters(parameters: Dict, factor: float, fixed: Iterable[str] = ()) -> Dict:
+    fixed = TIME_PARAMETERS | set(fixed)
+    scaled = dict()
+    for name, value in parameters.items():
+        if name in fixed or isinstance(value, bool) or not isinstance(value, (int, np.integer)):
+            scaled[name] = value
+        else:
+            scaled[name] = max(1, int(round(value * factor)))
+    return scaled
+
+
+def add_sweep_preset(benchmark, base_preset: str, factor: float, fixed: Iterable[str] = ()) -> str:
+    """
+    Register the parameters of a sweep point as a preset of benchmark and return the preset name.
+    """
+    name = f"{base_preset}_{point_name(factor)}"
+    benchmark.info["parameters"][name] = scale_parameters(benchmark.info["parameters"][base_preset], factor, fixed)
+    return name
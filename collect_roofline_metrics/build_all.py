@@ -0,0 +1,39 @@
+"""
+Compile every benchmark into the artifact cache ahead of the measurements.
+
+    python collect_roofline_metrics/build_all.py --backend papi -w 32
+    python collect_roofline_metrics/collect_roofline_metrics.py --backend papi -r 20
+
+The collectors then load the prebuilt libraries, and re-running a sweep with different measurement
+options (repetitions, cache flushing, thread counts, sizes) compiles nothing. The backend options
+that change the build (PAPI event sets, runtime events) have to match those of the collection run.
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.backends import BACKENDS
+from bench_common.collector import add_common_arguments, select_benchmarks
+from bench_common.compile_pipeline import build_all
+
+
+if __name__ == "__main__":
+    pre_parser = argparse.ArgumentParser(add_help=False)
+    pre_parser.add_argument("--backend", choices=sorted(BACKENDS), default="papi")
+    backend = BACKENDS[pre_parser.parse_known_args()[0].backend]()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="papi")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="Compile processes, defaults to all cores")
+    add_common_arguments(parser, backend)
+    backend.add_arguments(parser)
+    args = vars(parser.parse_args())
+    backend.configure(args)
+
+    errors = build_all(backend.jobs(select_benchmarks(args["benchmarks"])), args["workers"])
+    failed = [job for job, error in errors.items() if error is not None]
+    for job in failed:
+        print("="*50, job.benchmark, "="*50)
+        print(errors[job])
+    print(f"{len(errors) - len(failed)} of {len(errors)} builds in the artifact cache")
@@ -0,0 +1,10 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.collector import main
+
+
+if __name__ == "__main__":
+    # --backend papi|likwid|timer|fake, see bench_common/backends.py
+    main()
@@ -1,11 +1,7 @@
 import argparse
 import traceback
-import subprocess
-import re
-import copy
 import os
-import importlib
-import multiprocessing as mp
+import sys
 import json
 
 import dace.transformation.auto.auto_optimize as opt
@@ -16,73 +12,15 @@ from statistics import median
 
 import sympy as sp
 import dace
-import dace.sdfg.performance_evaluation.work_depth as wd
 from dace.config import Config
 from dace.codegen.instrumentation import papi
 
 from npbench.infrastructure import (Benchmark, utilities as util, DaceFramework)
 
-def get_bench_sdfg(bench:Benchmark, dace_framework:DaceFramework):
-        module_pypath = "npbench.benchmarks.{r}.{m}".format(r=bench.info["relative_path"].replace('/', '.'),
-                                                            m=bench.info["module_name"])
-        if "postfix" in dace_framework.info.keys():
-            postfix = dace_framework.info["postfix"]
-        else:
-            postfix = dace_framework.fname
-        module_str = "{m}_{p}".format(m=module_pypath, p=postfix)
-        func_str = bench.info["func_name"]
-
-        ldict = dict()
-        # Import DaCe implementation
-        try:
-            module = importlib.import_module(module_str)
-            ct_impl = getattr(module, func_str)
-
-        except Exception as e:
-            print("Failed to load the DaCe implementation.")
-            raise (e)
-
-        ##### Experimental: Load strict SDFG
-        sdfg_loaded = False
-        if dace_framework.load_strict:
-            path = os.path.join(os.getcwd(), 'dace_sdfgs', f"{module_str}-{func_str}.sdfg")
-            try:
-                strict_sdfg = dace.SDFG.from_file(path)
-                sdfg_loaded = True
-            except Exception:
-                pass
-
-        if not sdfg_loaded:
-            #########################################################
-            # Prepare SDFGs
-            base_sdfg, _ = util.benchmark("__npb_result = ct_impl.to_sdfg(simplify=False)",
-                                                   out_text="DaCe parsing time",
-                                                   context=locals(),
-                                                   output='__npb_result',
-                                                   verbose=False)
-            strict_sdfg = copy.deepcopy(base_sdfg)
-            strict_sdfg._name = "strict"
-            ldict['strict_sdfg'] = strict_sdfg
-            simplified_sdfg, _ = util.benchmark("strict_sdfg.simplify()",
-                                            out_text="DaCe Strict Transformations time",
-                                            context=locals(),
-                                            verbose=False)
-            # sdfg_list = [strict_sdfg]
-            # time_list = [parse_time[0] + strict_time[0]]
-        else:
-            ldict['strict_sdfg'] = strict_sdfg
-
-        ##### Experimental: Saving strict SDFG
-        if dace_framework.save_strict and not sdfg_loaded:
-            path = os.path.join(os.getcwd(), 'dace_sdfgs')
-            try:
-                os.mkdir(path)
-            except FileExistsError:
-                pass
-            path = os.path.join(os.getcwd(), 'dace_sdfgs', f"{module_str}-{func_str}.sdfg")
-            strict_sdfg.save(path)
-
-        return base_sdfg, simplified_sdfg
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.analysis_store import work_depth
+from bench_common.benchmark_registry import select_benchmarks
+from bench_common.sdfg_cache import get_optimized_sdfg
 
 
 if __name__ == "__main__":
@@ -108,30 +46,7 @@ if __name__ == "__main__":
 
     args = vars(parser.parse_args())
 
-    benchmark_set = ['adi','arc_distance','atax','azimint_hist','azimint_naive','bicg',
-                  'cavity_flow','channel_flow','cholesky2','cholesky','compute','contour_integral',
-                  'conv2d_bias','correlation',#'covariance2',
-                  'covariance','crc16','deriche',#'doitgen',
-                  'durbin','fdtd_2d',
-                  'floyd_warshall','gemm',
-                  'gemver','gesummv','go_fast','gramschmidt',
-                  'hdiff','heat_3d','jacobi_1d','jacobi_2d',
-                  'k2mm',
-                  'k3mm','lenet','ludcmp','lu','mandelbrot1',
-                  'mandelbrot2','mlp','mvt','nbody','nussinov','resnet','scattering_self_energies','seidel_2d',
-                  'softmax','spmv',#'stockham_fft',
-                  'symm','syr2k','syrk','trisolv','trmm','vadv']
-    
-    benchmarks = list()
-    if args["benchmarks"]:
-        requested_bms = []
-        for benchmark_name in args["benchmarks"]:
-            if benchmark_name in benchmark_set:
-                benchmarks.append(benchmark_name)
-            else:
-                print(f"Could not find a benchmark with the name {benchmark_name}")
-    else:
-        benchmarks = list(benchmark_set)
+    benchmarks = select_benchmarks(args["benchmarks"], requires=("work_depth", ))
     
 
     dace_cpu_framework = DaceFramework("dace_cpu")
@@ -146,12 +61,11 @@ if __name__ == "__main__":
         print("="*50, benchmark_name, "="*50)
         benchmark = Benchmark(benchmark_name)
 
-        sdfg, simplified_sdfg = get_bench_sdfg(benchmark, dace_cpu_framework)
         bdata = benchmark.get_data(args["preset"])
         
         try:
-            opt.auto_optimize(sdfg, dace.dtypes.DeviceType.CPU)
-            wd.analyze_sdfg(sdfg, {}, wd.get_tasklet_work_depth, [], False)
+            sdfg = get_optimized_sdfg(benchmark, dace_cpu_framework, dace.dtypes.DeviceType.CPU)
+            work_depth(sdfg)
             print("succ")
             w_succ.append(benchmark_name)
             
@@ -1,9 +1,14 @@
 import pandas as pd
 import numpy as np
 import sympy as sp
+import os
+import sys
 from scipy.stats import spearmanr, pearsonr, kendalltau
 from pathlib import Path
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.expr_eval import compile_expression
+
 # --- Configuration ---
 RESULTS_CSV = "results.csv"  
 OUTPUT_DIR = Path("simulated_analysis_results")
@@ -26,9 +31,8 @@ papi_points = {
 }
 
 def make_callable(expr_str):
-    N, k, TSTEPS = sp.symbols("N k TSTEPS")
-    expr = sp.sympify(expr_str, locals={"N": N, "k": k, "TSTEPS": TSTEPS, "Sum": sp.Sum, "Max": sp.Max, "log": sp.log})
-    return sp.lambdify(N, expr.subs(TSTEPS, 5).doit(), modules="math")
+    # Vectorized over N and cached by expression string
+    return compile_expression(expr_str, ("N", ), fixed={"TSTEPS": 5})
 
 def safe_log(x):
     return np.log10(x.replace(0, np.nan))
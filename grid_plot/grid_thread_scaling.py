@@ -0,0 +1,124 @@
+import argparse
+import math
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+from npbench.infrastructure import utilities as util
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-d", "--database", type=str, default="npbench_papi_metrics_autoopt.db", help="Database written by the collector")
+parser.add_argument("-s", "--sweep_id", type=int, default=None, help="Scaling sweep to plot, defaults to the latest one")
+parser.add_argument("-p", "--preset", type=str, default=None, help="Preset to plot, defaults to all presets of the sweep")
+parser.add_argument("-c", "--cols", type=int, default=6, help="Number of columns in the grid")
+parser.add_argument("-b", "--benchmarks", type=str, nargs="+", default=None)
+args = parser.parse_args()
+
+
+def generate_scaling_grid_plot(data: dict, n_rows, n_cols, benchmarks, metric: str = "speedup"):
+    """
+    Docstring for generate_scaling_grid_plot
+
+    :param data: Needs dict of form {"benchmark_name": {"threads": [1, 2, ...], "time": [t1, t2, ...]}}
+    :type data: dict
+    :param n_rows: number of grid rows
+    :param n_cols: number of grid cols
+    :param benchmarks: list of benchmarks to plot
+    :param metric: "speedup" (T1/Tn) or "efficiency" (T1/(n*Tn))
+    """
+    fig_width = 2.5 * n_cols
+    fig_height = 2.5 * n_rows
+    fig, axes = plt.subplots(n_rows, n_cols, figsize=(fig_width, fig_height))
+    axes_flat = np.asarray(axes).reshape(-1)
+
+    for idx, benchmark in enumerate(benchmarks):
+        if idx >= n_rows * n_cols:
+            break
+
+        ax = axes_flat[idx]
+        threads = np.asarray(data[benchmark]["threads"], dtype=float)
+        times = np.asarray(data[benchmark]["time"], dtype=float)
+        speedup = times[0] / times
+        # Relative to the smallest measured thread count, which is 1 in a full sweep
+        values = speedup if metric == "speedup" else speedup / (threads / threads[0])
+        ideal = threads / threads[0] if metric == "speedup" else np.ones_like(threads)
+
+        ax.plot(threads, ideal, color="gray", linewidth=0.8, linestyle="--", zorder=2)
+        ax.plot(threads, values, color="#1f77b4", linewidth=1.2, marker="o", markersize=3, zorder=3)
+
+        ax.set_xscale("log", base=2)
+        ax.set_xticks(threads)
+        ax.set_xticklabels([str(int(t)) for t in threads], fontsize=7)
+        if metric == "efficiency":
+            ax.set_ylim(0.0, max(1.1, float(np.max(values)) * 1.05))
+        ax.set_title(benchmark, fontsize=9, fontweight='bold')
+        ax.tick_params(axis='y', labelsize=7)
+        ax.set_xlabel('Threads', fontsize=6)
+        ax.set_ylabel('Speedup' if metric == "speedup" else 'Parallel efficiency', fontsize=6)
+        ax.grid(alpha=0.3, linestyle='--', linewidth=0.3)
+
+    for idx in range(len(benchmarks), n_rows * n_cols):
+        axes_flat[idx].axis('off')
+
+    title = 'Strong Scaling Speedup' if metric == "speedup" else 'Parallel Efficiency'
+    fig.suptitle(title, fontsize=16, fontweight='bold', y=0.995)
+
+    legend_elements = [
+        Line2D([0], [0], color="#1f77b4", linewidth=1.2, marker="o", markersize=4, label="dace_cpu (auto-optimized)"),
+        Line2D([0], [0], color="gray", linewidth=0.8, linestyle="--", label="Ideal"),
+    ]
+    legend = fig.legend(
+        handles=legend_elements,
+        loc="upper center",
+        ncol=2,
+        fontsize=11,
+        bbox_to_anchor=(0.5, -0.02),
+        frameon=True,
+        fancybox=True,
+        shadow=True,
+        borderpad=1
+    )
+    legend.get_frame().set_linewidth(1.5)
+    legend.get_frame().set_edgecolor('gray')
+
+    plt.tight_layout(rect=[0, 0.04, 1, 0.98])
+
+    filename_base = f'benchmark_grid_{n_rows}x{n_cols}_{metric}'
+    plt.savefig(f'{filename_base}.pdf', dpi=300, bbox_inches='tight')
+    print(f"Saved {filename_base}.pdf")
+    plt.savefig(f'{filename_base}.png', dpi=300, bbox_inches='tight')
+    print(f"Saved {filename_base}.png")
+    plt.close(fig)
+
+
+def get_data(database, sweep_id=None, preset=None, benchmarks=None):
+    conn = util.create_connection(database)
+    data = pd.read_sql_query("SELECT * FROM thread_scaling", conn)
+    if sweep_id is None:
+        sweep_id = data["sweep_id"].max()
+    data = data[data["sweep_id"] == sweep_id]
+    if preset is not None:
+        data = data[data["preset"] == preset]
+    if benchmarks:
+        data = data[data["benchmark"].isin(benchmarks)]
+
+    # The runtime is stored with every event, one value per benchmark and thread count is enough
+    times = data.groupby(["benchmark", "preset", "threads"]).agg({"median_time": "first"}).reset_index()
+    result = dict()
+    for (benchmark, bm_preset), group in times.groupby(["benchmark", "preset"]):
+        group = group.sort_values("threads")
+        name = benchmark if preset is not None or times["preset"].nunique() == 1 else f"{benchmark} ({bm_preset})"
+        result[name] = {"threads": group["threads"].tolist(), "time": group["median_time"].tolist()}
+    return result
+
+
+if __name__ == "__main__":
+    data = get_data(args.database, args.sweep_id, args.preset, args.benchmarks)
+    benchmarks = sorted(data.keys())
+    if not benchmarks:
+        print("No thread scaling data found")
+    else:
+        n_cols = min(args.cols, len(benchmarks))
+        n_rows = math.ceil(len(benchmarks) / n_cols)
+        for metric in ("speedup", "efficiency"):
+            generate_scaling_grid_plot(data, n_rows, n_cols, benchmarks, metric)
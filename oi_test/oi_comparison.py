@@ -4,6 +4,7 @@ import subprocess
 import re
 import copy
 import os
+import sys
 import importlib
 import multiprocessing as mp
 import pandas as pd
@@ -28,71 +29,9 @@ from dace.sdfg import infer_types
 
 from npbench.infrastructure import (Benchmark, utilities as util, DaceFramework)
 
-######################################## Helper Functions #######################################################
-
-def get_bench_sdfg(bench:Benchmark, dace_framework:DaceFramework):
-        module_pypath = "npbench.benchmarks.{r}.{m}".format(r=bench.info["relative_path"].replace('/', '.'),
-                                                            m=bench.info["module_name"])
-        if "postfix" in dace_framework.info.keys():
-            postfix = dace_framework.info["postfix"]
-        else:
-            postfix = dace_framework.fname
-        module_str = "{m}_{p}".format(m=module_pypath, p=postfix)
-        func_str = bench.info["func_name"]
-
-        ldict = dict()
-        # Import DaCe implementation
-        try:
-            module = importlib.import_module(module_str)
-            ct_impl = getattr(module, func_str)
-
-        except Exception as e:
-            print("Failed to load the DaCe implementation.")
-            raise (e)
-
-        ##### Experimental: Load strict SDFG
-        sdfg_loaded = False
-        if dace_framework.load_strict:
-            path = os.path.join(os.getcwd(), 'dace_sdfgs', f"{module_str}-{func_str}.sdfg")
-            try:
-                strict_sdfg = dace.SDFG.from_file(path)
-                sdfg_loaded = True
-            except Exception:
-                pass
-
-        if not sdfg_loaded:
-            #########################################################
-            # Prepare SDFGs
-            base_sdfg, _ = util.benchmark("__npb_result = ct_impl.to_sdfg(simplify=False)",
-                                                   out_text="DaCe parsing time",
-                                                   context=locals(),
-                                                   output='__npb_result',
-                                                   verbose=False)
-            strict_sdfg = copy.deepcopy(base_sdfg)
-            strict_sdfg._name = "strict"
-            ldict['strict_sdfg'] = strict_sdfg
-            simplified_sdfg, _ = util.benchmark("strict_sdfg.simplify()",
-                                            out_text="DaCe Strict Transformations time",
-                                            context=locals(),
-                                            verbose=False)
-            # sdfg_list = [strict_sdfg]
-            # time_list = [parse_time[0] + strict_time[0]]
-        else:
-            ldict['strict_sdfg'] = strict_sdfg
-
-        ##### Experimental: Saving strict SDFG
-        if dace_framework.save_strict and not sdfg_loaded:
-            path = os.path.join(os.getcwd(), 'dace_sdfgs')
-            try:
-                os.mkdir(path)
-            except FileExistsError:
-                pass
-            path = os.path.join(os.getcwd(), 'dace_sdfgs', f"{module_str}-{func_str}.sdfg")
-            strict_sdfg.save(path)
-
-        return base_sdfg, simplified_sdfg
-
-######################################## Helper Functions end ###################################################
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.analysis_store import total_volume
+from bench_common.sdfg_cache import get_optimized_sdfg
 
 if __name__ == "__main__":
     data_rows = []
@@ -153,11 +92,10 @@ if __name__ == "__main__":
         for benchmark_name in benchmarks:
             print("="*50, benchmark_name, "(", line_size, ")", "="*50)
             benchmark = Benchmark(benchmark_name)
-            sdfg, simplified_sdfg = get_bench_sdfg(benchmark, dace_cpu_framework)
             #base_sdfg = copy.deepcopy(sdfg)
             #infer_types.set_default_schedule_and_storage_types(base_sdfg)
 
-            opt.auto_optimize(sdfg, dace.dtypes.DeviceType.CPU, expand_library_nodes=False)
+            sdfg = get_optimized_sdfg(benchmark, dace_cpu_framework, dace.dtypes.DeviceType.CPU, expand_library_nodes=False)
             substitutions = benchmark.info["parameters"]['L']
             sdfg.save(f"{benchmark_name}.sdfg")
             infer_types.set_default_schedule_and_storage_types(sdfg)
@@ -165,7 +103,7 @@ if __name__ == "__main__":
                 sdfg.apply_transformations_once_everywhere(WCRToAugAssign)
 
             try:
-                vol_r, vol_w = tv.analyze_sdfg(sdfg)
+                vol_r, vol_w = total_volume(sdfg)
                 op_in_map = {}
                 assumps = {k: '35, 45,1' for k in substitutions}
                 mapping = {}
@@ -2,8 +2,13 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import sympy as sp
+import os
+import sys
 from io import StringIO
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.expr_eval import compile_expression
+
 # ============================================================
 # CSV DATA
 # ============================================================
@@ -32,9 +37,8 @@ papi_points = {
 }
 
 def make_callable(expr_str):
-    N, k, TSTEPS = sp.symbols("N k TSTEPS")
-    expr = sp.sympify(expr_str, locals={"N": N, "k": k, "TSTEPS": TSTEPS, "Sum": sp.Sum, "Max": sp.Max, "log": sp.log})
-    return sp.lambdify(N, expr.subs(TSTEPS, 5).doit(), modules="math")
+    # Vectorized over N and cached by expression string
+    return compile_expression(expr_str, ("N", ), fixed={"TSTEPS": 5})
 
 # ============================================================
 # PLOTTING
@@ -59,8 +63,8 @@ for i, sub_df in enumerate(df_list):
         f_fn_raw = make_callable(row["OI_fitted_func"])
 
         # Clip values to Y_MIN_LIMIT so they stay visible on the plot
-        y_vol = [max(Y_MIN_LIMIT, float(v_fn_raw(int(n)))) for n in N_vals]
-        y_fit = [max(Y_MIN_LIMIT, float(f_fn_raw(int(n)))) for n in N_vals]
+        y_vol = np.maximum(Y_MIN_LIMIT, v_fn_raw(N_vals))
+        y_fit = np.maximum(Y_MIN_LIMIT, f_fn_raw(N_vals))
 
         ax.plot(N_vals, y_vol, color=color, linestyle="-", alpha=0.6, label=f"{row['kernel']} Static")
         ax.plot(N_vals, y_fit, color=color, linestyle=":", linewidth=2, label=f"{row['kernel']} Simulated")
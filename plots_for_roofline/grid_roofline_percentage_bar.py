@@ -1,6 +1,7 @@
 import argparse
 import copy
 import os
+import sys
 import importlib
 import json
 from pathlib import Path
@@ -11,6 +12,11 @@ from dace.config import Config
 from dace.codegen.instrumentation import papi
 
 from npbench.infrastructure import (Benchmark, utilities as util, DaceFramework)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.analysis_store import total_volume, work_depth
+from bench_common.benchmark_registry import select_benchmarks
+from bench_common.sdfg_cache import get_bench_sdfg
 import dace.sdfg.performance_evaluation.work_depth as wd
 import dace.sdfg.performance_evaluation.total_volume as tv 
 
@@ -204,28 +210,7 @@ if __name__ == "__main__":
     dace_cpu_framework = DaceFramework("dace_cpu")
     preset = args["preset"]
 
-    benchmark_set = ['adi','arc_distance','atax','azimint_hist','azimint_naive','bicg',
-                  'cavity_flow','channel_flow','cholesky2','cholesky','compute','contour_integral',
-                  'conv2d_bias','correlation',# 'covariance2', --> cov 2 dace does not exist
-                  'covariance','crc16','deriche',#'doitgen', --> doitgen, auto opt fails (more precisely, expand_library_nodes())
-                  'durbin','fdtd_2d','floyd_warshall','gemm',
-                  'gemver','gesummv','go_fast','gramschmidt',
-                  'hdiff','heat_3d','jacobi_1d','jacobi_2d','k2mm','k3mm','lenet','ludcmp','lu','mandelbrot1',
-                  #'mandelbrot2', --> mandelbrot2, auto_opt fails
-                  'mlp','mvt','nbody','nussinov','resnet','scattering_self_energies','seidel_2d',
-                  'softmax','spmv',# 'stockham_fft', --> stockham_fft compilation fails
-                  'symm','syr2k','syrk','trisolv','trmm','vadv']
-    
-    benchmarks = list()
-    if args["benchmarks"]:
-        requested_bms = []
-        for benchmark_name in args["benchmarks"]:
-            if benchmark_name in benchmark_set:
-                benchmarks.append(benchmark_name)
-            else:
-                print(f"Could not find a benchmark with the name {benchmark_name}")
-    else:
-        benchmarks = list(benchmark_set)
+    benchmarks = select_benchmarks(args["benchmarks"], requires=("auto_opt", ))
 
     
 
@@ -272,8 +257,8 @@ if __name__ == "__main__":
             benchmark = Benchmark(benchmark_name)
             substitutions = benchmark.info["parameters"][preset]
             sdfg, simplified_sdfg = get_bench_sdfg(benchmark, dace_cpu_framework)
-            vol_r, vol_w = tv.analyze_sdfg(sdfg)
-            work, _ = wd.analyze_sdfg(sdfg, {}, wd.get_tasklet_work_depth, [], False)
+            vol_r, vol_w = total_volume(sdfg)
+            work, _ = work_depth(sdfg)
 
             work = work.subs(substitutions)
             total_vol = (vol_r+vol_w).subs(substitutions)
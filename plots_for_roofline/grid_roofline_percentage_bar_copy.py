@@ -1,6 +1,7 @@
 import argparse
 import copy
 import os
+import sys
 import importlib
 import json
 import pathlib
@@ -15,6 +16,10 @@ from npbench.infrastructure import (Benchmark, utilities as util, DaceFramework)
 import dace.sdfg.performance_evaluation.work_depth as wd
 import dace.sdfg.performance_evaluation.total_volume as tv 
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.analysis_store import read_volume_table
+from bench_common.benchmark_registry import select_benchmarks
+
 import pandas as pd
 import sqlite3
 import numpy as np
@@ -225,20 +230,8 @@ if __name__ == "__main__":
     dace_cpu_framework = DaceFramework("dace_cpu")
     preset = args["preset"]
 
-    benchmark_set = {'adi','arc_distance','atax','azimint_hist','azimint_naive','bicg',
-                  'cavity_flow','channel_flow','cholesky2','cholesky','compute','contour_integral',
-                  'conv2d_bias','correlation',# 'covariance2', --> cov 2 dace does not exist
-                  'covariance','crc16','deriche',#'doitgen', --> doitgen, auto opt fails (more precisely, expand_library_nodes())
-                  'durbin','fdtd_2d','floyd_warshall','gemm',
-                  'gemver','gesummv','go_fast','gramschmidt',
-                  'hdiff','heat_3d','jacobi_1d','jacobi_2d','k2mm','k3mm','lenet','ludcmp','lu','mandelbrot1',
-                  #'mandelbrot2', --> mandelbrot2, auto_opt fails
-                  'mlp','mvt','nbody','nussinov','resnet','scattering_self_energies','seidel_2d',
-                  'softmax','spmv',# 'stockham_fft', --> stockham_fft compilation fails
-                  'symm','syr2k','syrk','trisolv','trmm','vadv'}
-    
-    
-    benchmarks = sorted([bm for bm in args["benchmarks"] if bm in benchmark_set]) if args["benchmarks"] else list(benchmark_set)
+    # Benchmarks with measured auto_opt runs, the work and volumes come from the volumes table
+    benchmarks = select_benchmarks(args["benchmarks"], requires=("auto_opt", "compiles"))
 
     path = pathlib.Path(args["database"])
 
@@ -247,8 +240,7 @@ if __name__ == "__main__":
     elif args.path.is_dir():
         raise Exception("Directory input not supported in this version.")
 
-    symbolic_data = pd.read_csv("volumes_per_preset.csv")
-    symbolic_data = symbolic_data[symbolic_data["preset"] == preset]
+    symbolic_data = read_volume_table(benchmarks, [preset])
     time_table = dfs["results"]
 
     time_table = time_table.copy()
@@ -1,6 +1,7 @@
 import argparse
 import copy
 import os
+import sys
 import importlib
 import json
 import pathlib
@@ -14,6 +15,11 @@ from dace.config import Config
 from dace.codegen.instrumentation import papi
 
 from npbench.infrastructure import (Benchmark, utilities as util, DaceFramework)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.analysis_store import read_volume_table
+from bench_common.benchmark_registry import select_benchmarks
+from bench_common.sdfg_cache import get_bench_sdfg
 import dace.sdfg.performance_evaluation.work_depth as wd
 import dace.sdfg.performance_evaluation.total_volume as tv 
 
@@ -49,68 +55,6 @@ def read_sqlite_db(db_path: pathlib.Path):
 
 
 
-def get_bench_sdfg(bench:Benchmark, dace_framework:DaceFramework):
-        module_pypath = "npbench.benchmarks.{r}.{m}".format(r=bench.info["relative_path"].replace('/', '.'),
-                                                            m=bench.info["module_name"])
-        if "postfix" in dace_framework.info.keys():
-            postfix = dace_framework.info["postfix"]
-        else:
-            postfix = dace_framework.fname
-        module_str = "{m}_{p}".format(m=module_pypath, p=postfix)
-        func_str = bench.info["func_name"]
-
-        ldict = dict()
-        # Import DaCe implementation
-        try:
-            module = importlib.import_module(module_str)
-            ct_impl = getattr(module, func_str)
-
-        except Exception as e:
-            print("Failed to load the DaCe implementation.")
-            raise (e)
-
-        ##### Experimental: Load strict SDFG
-        sdfg_loaded = False
-        if dace_framework.load_strict:
-            path = os.path.join(os.getcwd(), 'dace_sdfgs', f"{module_str}-{func_str}.sdfg")
-            try:
-                strict_sdfg = dace.SDFG.from_file(path)
-                sdfg_loaded = True
-            except Exception:
-                pass
-
-        if not sdfg_loaded:
-            #########################################################
-            # Prepare SDFGs
-            base_sdfg, _ = util.benchmark("__npb_result = ct_impl.to_sdfg(simplify=False)",
-                                                   out_text="DaCe parsing time",
-                                                   context=locals(),
-                                                   output='__npb_result',
-                                                   verbose=False)
-            strict_sdfg = copy.deepcopy(base_sdfg)
-            strict_sdfg._name = "strict"
-            ldict['strict_sdfg'] = strict_sdfg
-            simplified_sdfg, _ = util.benchmark("strict_sdfg.simplify()",
-                                            out_text="DaCe Strict Transformations time",
-                                            context=locals(),
-                                            verbose=False)
-            # sdfg_list = [strict_sdfg]
-            # time_list = [parse_time[0] + strict_time[0]]
-        else:
-            ldict['strict_sdfg'] = strict_sdfg
-
-        ##### Experimental: Saving strict SDFG
-        if dace_framework.save_strict and not sdfg_loaded:
-            path = os.path.join(os.getcwd(), 'dace_sdfgs')
-            try:
-                os.mkdir(path)
-            except FileExistsError:
-                pass
-            path = os.path.join(os.getcwd(), 'dace_sdfgs', f"{module_str}-{func_str}.sdfg")
-            strict_sdfg.save(path)
-
-        return base_sdfg, simplified_sdfg
-
 import seaborn as sns
 
 def generate_grid_plot(data: dict, frameworks, benchmarks, n_cols=4):
@@ -206,20 +150,8 @@ if __name__ == "__main__":
     dace_cpu_framework = DaceFramework("dace_cpu")
     preset = args["preset"]
 
-    benchmark_set = {'adi','arc_distance','atax','azimint_hist','azimint_naive','bicg',
-                  'cavity_flow','channel_flow','cholesky2','cholesky','compute','contour_integral',
-                  'conv2d_bias','correlation',# 'covariance2', --> cov 2 dace does not exist
-                  'covariance','crc16','deriche',#'doitgen', --> doitgen, auto opt fails (more precisely, expand_library_nodes())
-                  'durbin','fdtd_2d','floyd_warshall','gemm',
-                  'gemver','gesummv','go_fast','gramschmidt',
-                  'hdiff','heat_3d','jacobi_1d','jacobi_2d','k2mm','k3mm','lenet','ludcmp','lu','mandelbrot1',
-                  #'mandelbrot2', --> mandelbrot2, auto_opt fails
-                  'mlp','mvt','nbody','nussinov','resnet','scattering_self_energies','seidel_2d',
-                  'softmax','spmv',# 'stockham_fft', --> stockham_fft compilation fails
-                  'symm','syr2k','syrk','trisolv','trmm','vadv'}
-    
-    
-    benchmarks = sorted([bm for bm in args["benchmarks"] if bm in benchmark_set]) if args["benchmarks"] else list(benchmark_set)
+    # Benchmarks with measured auto_opt runs, the work and volumes come from the volumes table
+    benchmarks = select_benchmarks(args["benchmarks"], requires=("auto_opt", "compiles"))
 
     path = pathlib.Path(args["database"])
 
@@ -228,8 +160,7 @@ if __name__ == "__main__":
     elif args.path.is_dir():
         raise Exception("Directory input not supported in this version.")
 
-    symbolic_data = pd.read_csv("volumes_per_preset.csv")
-    symbolic_data = symbolic_data[symbolic_data["preset"] == preset]
+    symbolic_data = read_volume_table(benchmarks, [preset])
     time_table = dfs["results"]
 
     time_table = time_table.copy()
@@ -0,0 +1,294 @@
+"""
+Bookkeeping of the collection engine with the fake backend, a stub benchmark and a stub compiled SDFG.
+
+Nothing is parsed or compiled: iter_compiled and Benchmark of the collector are replaced, so these tests
+cover resuming, failure rows, event set checkpoints and the scaling tables without DaCe, npbench or a
+C++ compiler. Where DaCe or npbench are not installed, stand-ins for the few names the modules of the
+collector use at import time are registered while the tests of this file run.
+"""
+import enum
+import importlib.util
+import os
+import sqlite3
+import sys
+import time
+import types
+
+import numpy as np
+import pytest
+
+BENCHMARK = "gemm"
+BROKEN = "broken"  # its stub build fails
+EVENTS = ["FAKE_FP_OPS", "FAKE_L1_DCM", "FAKE_L2_DCM"]
+EVENT_SETS = ["FAKE_FP_OPS,FAKE_L1_DCM", "FAKE_L2_DCM"]
+REPEAT = 3
+
+
+def _modules(**modules):
+    """ Modules by dotted name with their attributes, children are also set as attributes of their parent. """
+    created = {name: types.ModuleType(name) for name in modules}
+    for name, attributes in modules.items():
+        created[name].__dict__.update(attributes)
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(created[parent], child, created[name])
+    return created
+
+
+def _dace_stand_ins():
+    instrumentation_type = enum.Enum("InstrumentationType", ["No_Instrumentation", "Timer", "PAPI_Counters",
+                                                             "LIKWID_CPU", "PAPI_Runtime_Counters"])
+
+    class Config:
+
+        @staticmethod
+        def get(*keys):
+            return None
+
+        @staticmethod
+        def set(*keys, value=None):
+            pass
+
+    return _modules(**{
+        "dace": {"__version__": "stand-in", "SDFG": object, "InstrumentationType": instrumentation_type},
+        "dace.dtypes": {"InstrumentationType": instrumentation_type,
+                        "DeviceType": enum.Enum("DeviceType", ["CPU", "GPU"])},
+        "dace.registry": {"autoregister_params": lambda **kwargs: lambda cls: cls},
+        "dace.config": {"Config": Config},
+        "dace.codegen": {},
+        "dace.codegen.instrumentation": {},
+        "dace.codegen.instrumentation.papi": {"PAPIInstrumentation": object},
+        "dace.codegen.instrumentation.provider": {"InstrumentationProvider": object},
+        "dace.codegen.instrumentation.report": {"InstrumentationReport": object},
+        "dace.sdfg": {},
+        "dace.sdfg.utils": {"load_precompiled_sdfg": None},
+        "dace.transformation": {},
+        "dace.transformation.auto": {},
+        "dace.transformation.auto.auto_optimize": {"auto_optimize": None},
+    })
+
+
+def _str2bool(value):
+    if isinstance(value, bool):
+        return value
+    return value.lower() in ("yes", "true", "t", "y", "1")
+
+
+def _benchmark(stmt, setup="pass", out_text="", repeat=1, context=None, output=None, verbose=True):
+    ldict = dict(context or {})
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        exec(stmt, ldict)
+        times.append(time.perf_counter() - start)
+    return ldict.get(output) if output else None, times
+
+
+def _npbench_stand_ins():
+    return _modules(**{
+        "npbench": {},
+        "npbench.infrastructure": {"Benchmark": object, "DaceFramework": object},
+        "npbench.infrastructure.utilities": {
+            "create_connection": sqlite3.connect,
+            "create_table": lambda conn, create_table_sql: conn.execute(create_table_sql),
+            "str2bool": _str2bool,
+            "benchmark": _benchmark,
+        },
+    })
+
+
+class StubBenchmark:
+
+    def __init__(self, bname: str):
+        self.bname = bname
+        self.info = {"short_name": bname, "parameters": {"S": {"N": 8}}}
+
+    def get_data(self, preset: str):
+        return {"A": np.ones(self.info["parameters"][preset]["N"]), "N": self.info["parameters"][preset]["N"]}
+
+
+class StubSDFG:
+    name = "stub"
+
+    def nodes(self):
+        return []
+
+
+class StubCompiledSDFG:
+
+    def __init__(self):
+        self.sdfg = StubSDFG()
+
+    def __call__(self, **kwargs):
+        pass
+
+
+def stub_iter_compiled(jobs, **kwargs):
+    for job in jobs:
+        if job.benchmark == BROKEN:
+            yield job, None, "stub build failed"
+        else:
+            yield job, StubCompiledSDFG(), None
+
+
+@pytest.fixture(scope="module")
+def collector_module():
+    before = set(sys.modules)
+    for package, stand_ins in (("dace", _dace_stand_ins), ("npbench", _npbench_stand_ins)):
+        if importlib.util.find_spec(package) is None:
+            sys.modules.update(stand_ins())
+    from bench_common import collector
+    yield collector
+    import bench_common
+    for name in set(sys.modules) - before:
+        del sys.modules[name]
+        if name.startswith("bench_common."):
+            bench_common.__dict__.pop(name.rpartition(".")[2], None)
+
+
+@pytest.fixture
+def collector(collector_module, monkeypatch):
+    monkeypatch.setattr(collector_module, "iter_compiled", stub_iter_compiled)
+    monkeypatch.setattr(collector_module, "Benchmark", StubBenchmark)
+    monkeypatch.setattr(collector_module, "registry_select", lambda requested, requires: list(requested))
+    # apply() sets these and the affinity for the measured runs, restore them after each test
+    for name in ("OMP_PROC_BIND", "OMP_PLACES", "OMP_NUM_THREADS"):
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+    affinity = os.sched_getaffinity(0)
+    yield collector_module
+    os.sched_setaffinity(0, affinity)
+
+
+@pytest.fixture
+def fake_backend(collector_module):
+    from bench_common.backends import FakeBackend
+    return FakeBackend
+
+
+def collect(collector, database, *extra, benchmarks=(BENCHMARK, )):
+    collector.main("fake", ["-b", *benchmarks, "-p", "S", "-r", str(REPEAT), "--database", str(database),
+                            "--fake_events", *EVENTS, "--fake_event_set_size", "2", *extra])
+
+
+def interrupt_at(fake_backend, monkeypatch, event, threads=None):
+    """ Stop the collection like Ctrl+C when event is measured, with threads OpenMP threads if given. """
+    original_select = fake_backend.select
+
+    def select(self, job, event_set):
+        if event in event_set and (threads is None or os.environ.get("OMP_NUM_THREADS") == str(threads)):
+            raise KeyboardInterrupt
+        original_select(self, job, event_set)
+
+    monkeypatch.setattr(fake_backend, "select", select)
+    return original_select
+
+
+def query(database, sql, *params):
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def run_ids(database):
+    return [r[0] for r in query(database, "SELECT collection_script_timestamp FROM collection_runs "
+                                          "ORDER BY collection_script_timestamp")]
+
+
+def test_every_event_set_is_checkpointed(collector, tmp_path):
+    database = tmp_path / "fake.db"
+    collect(collector, database)
+
+    completed = query(database, "SELECT benchmark, event_set, repetitions FROM completed_event_sets")
+    assert sorted(completed) == [(BENCHMARK, event_set, REPEAT) for event_set in EVENT_SETS]
+    averages = query(database, "SELECT event_name, repetitions FROM event_averages")
+    assert sorted(averages) == [(e, REPEAT) for e in sorted(EVENTS)]
+    assert query(database, "SELECT COUNT(*) FROM event_counts")[0][0] == REPEAT * len(EVENTS)
+    assert query(database, "SELECT * FROM failures") == []
+    assert query(database, "SELECT finished_timestamp IS NOT NULL FROM collection_runs") == [(1, )]
+
+
+def test_failures_are_recorded(collector, fake_backend, tmp_path, monkeypatch):
+    database = tmp_path / "fake.db"
+
+    def select(self, job, event_set):
+        if "FAKE_L2_DCM" in event_set:
+            raise RuntimeError("event set cannot be counted")
+
+    monkeypatch.setattr(fake_backend, "select", select)
+    collect(collector, database, benchmarks=(BENCHMARK, BROKEN))
+
+    failures = query(database, "SELECT benchmark, event_set, kind FROM failures ORDER BY benchmark")
+    assert failures == [(BROKEN, "", "compile"), (BENCHMARK, "FAKE_L2_DCM", "error")]
+    # The failed event set leaves no rows behind, the other one is complete
+    assert query(database, "SELECT event_set FROM completed_event_sets") == [(EVENT_SETS[0], )]
+    assert sorted(query(database, "SELECT DISTINCT event_name FROM event_averages")) == [(e, ) for e in EVENTS[:2]]
+
+
+def test_interrupted_run_resumes_missing_event_sets(collector, fake_backend, tmp_path, monkeypatch):
+    database = tmp_path / "fake.db"
+    original_select = interrupt_at(fake_backend, monkeypatch, "FAKE_L2_DCM")
+    with pytest.raises(KeyboardInterrupt):
+        collect(collector, database)
+    [run_id] = run_ids(database)
+    assert query(database, "SELECT finished_timestamp FROM collection_runs") == [(None, )]
+    first = query(database, "SELECT event_name, average FROM event_averages")
+
+    monkeypatch.setattr(fake_backend, "select", original_select)
+    collect(collector, database, "--resume")
+
+    assert run_ids(database) == [run_id]
+    averages = query(database, "SELECT event_name, average FROM event_averages")
+    assert sorted(e for e, _ in averages) == sorted(EVENTS)
+    assert set(first) <= set(averages)  # the completed event set was not measured again
+    assert sorted(r[0] for r in query(database, "SELECT event_set FROM completed_event_sets")) == EVENT_SETS
+    assert query(database, "SELECT finished_timestamp IS NOT NULL FROM collection_runs") == [(1, )]
+
+
+@pytest.mark.parametrize("argument, value", [("-r", str(REPEAT + 1)), ("--fake_noise", "0.5")])
+def test_resume_refuses_different_settings(collector, tmp_path, argument, value):
+    database = tmp_path / "fake.db"
+    collect(collector, database)
+    [run_id] = run_ids(database)
+
+    with pytest.raises(SystemExit, match="repeat" if argument == "-r" else argument.lstrip("-")):
+        collect(collector, database, "--resume", str(run_id), argument, value)
+    assert query(database, "SELECT COUNT(*) FROM completed_event_sets")[0][0] == len(EVENT_SETS)
+
+
+def test_scaling_sweep_tables(collector, tmp_path):
+    database = tmp_path / "fake.db"
+    collect(collector, database, "--scaling", "True", "--threads", "1", "2")
+
+    first, second = run_ids(database)
+    assert query(database, "SELECT threads FROM run_environment ORDER BY threads") == [(1, ), (2, )]
+    assert query(database, "SELECT DISTINCT sweep_id FROM thread_scaling") == [(first, )]
+    assert sorted(query(database, "SELECT collection_script_timestamp, threads FROM sweep_runs")) == \
+        [(first, 1), (second, 2)]
+    rows = query(database, "SELECT threads, event, repetitions FROM thread_scaling")
+    assert sorted(rows) == sorted((t, e, REPEAT) for t in (1, 2) for e in EVENTS)
+
+
+def test_resumed_sweep_keeps_its_sweep_id(collector, fake_backend, tmp_path, monkeypatch):
+    database = tmp_path / "fake.db"
+    sweep = ("--scaling", "True", "--threads", "1", "2", "4")
+    original_select = interrupt_at(fake_backend, monkeypatch, "FAKE_L2_DCM", threads=2)
+    with pytest.raises(KeyboardInterrupt):
+        collect(collector, database, *sweep)
+    first, second = run_ids(database)
+
+    monkeypatch.setattr(fake_backend, "select", original_select)
+    collect(collector, database, *sweep, "--resume")
+
+    # The finished run with one thread is kept, the one with two threads continued and four threads added
+    assert run_ids(database)[:2] == [first, second]
+    assert len(run_ids(database)) == 3
+    assert query(database, "SELECT COUNT(*) FROM collection_runs WHERE finished_timestamp IS NULL") == [(0, )]
+    assert query(database, "SELECT DISTINCT sweep_id FROM thread_scaling") == [(first, )]
+    assert query(database, "SELECT DISTINCT sweep_id FROM sweep_runs") == [(first, )]
+    counts = query(database, "SELECT threads, COUNT(*) FROM thread_scaling GROUP BY threads ORDER BY threads")
+    assert counts == [(1, len(EVENTS)), (2, len(EVENTS)), (4, len(EVENTS))]
+    assert query(database, "SELECT COUNT(*) FROM event_counts WHERE collection_script_timestamp = ?", first) == \
+        [(REPEAT * len(EVENTS), )]
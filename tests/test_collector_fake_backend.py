@@ -0,0 +1,125 @@
+"""
+End-to-end runs of the collection engine with the fake backend against a temporary SQLite database.
+
+The fake backend compiles the benchmark without instrumentation and produces synthetic counters, so
+these tests need DaCe, npbench and a C++ compiler but no PAPI or LIKWID.
+"""
+import sqlite3
+
+import pytest
+
+pytest.importorskip("dace")
+pytest.importorskip("npbench")
+
+from bench_common import collector  # noqa: E402
+from bench_common.backends import FakeBackend  # noqa: E402
+
+BENCHMARK = "gemm"
+EVENTS = ["FAKE_FP_OPS", "FAKE_L1_DCM", "FAKE_L2_DCM"]
+REPEAT = 3
+
+
+@pytest.fixture(autouse=True)
+def measurement_environment(monkeypatch):
+    # apply() sets these for the measured runs, restore them after each test
+    for name in ("OMP_PROC_BIND", "OMP_PLACES", "OMP_NUM_THREADS"):
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+
+
+def collect(database, *extra):
+    collector.main("fake", ["-b", BENCHMARK, "-p", "S", "-r", str(REPEAT), "--database", str(database),
+                            "--artifact_cache", "False", "--reuse_builds", "False",
+                            "--fake_events", *EVENTS, "--fake_event_set_size", "2", *extra])
+
+
+def query(database, sql, *params):
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def run_ids(database):
+    return [r[0] for r in query(database, "SELECT collection_script_timestamp FROM collection_runs")]
+
+
+def test_collects_every_event_set(tmp_path):
+    database = tmp_path / "fake.db"
+    collect(database)
+
+    [run_id] = run_ids(database)
+    averages = query(database, "SELECT benchmark, event_name, repetitions FROM event_averages "
+                               "WHERE collection_script_timestamp = ?", run_id)
+    assert sorted(averages) == [(BENCHMARK, e, REPEAT) for e in sorted(EVENTS)]
+
+    completed = query(database, "SELECT benchmark, event_set, repetitions FROM completed_event_sets")
+    assert sorted(completed) == [(BENCHMARK, "FAKE_FP_OPS,FAKE_L1_DCM", REPEAT), (BENCHMARK, "FAKE_L2_DCM", REPEAT)]
+
+    # One row per measured run and event, the fake backend reports two threads
+    assert query(database, "SELECT COUNT(*) FROM event_counts")[0][0] == REPEAT * len(EVENTS)
+    assert query(database, "SELECT COUNT(DISTINCT thread_id) FROM thread_counts")[0][0] == 2
+    assert query(database, "SELECT * FROM failures") == []
+    assert query(database, "SELECT finished_timestamp IS NOT NULL FROM collection_runs") == [(1, )]
+
+
+def test_failed_event_set_leaves_no_rows(tmp_path, monkeypatch):
+    database = tmp_path / "fake.db"
+
+    def select(self, job, event_set):
+        if "FAKE_L2_DCM" in event_set:
+            raise RuntimeError("event set cannot be counted")
+
+    monkeypatch.setattr(FakeBackend, "select", select)
+    collect(database)
+
+    events = query(database, "SELECT DISTINCT event_name FROM event_averages")
+    assert sorted(events) == [("FAKE_FP_OPS", ), ("FAKE_L1_DCM", )]
+    assert query(database, "SELECT event_set FROM completed_event_sets") == [("FAKE_FP_OPS,FAKE_L1_DCM", )]
+    failures = query(database, "SELECT benchmark, event_set, kind FROM failures")
+    assert failures == [(BENCHMARK, "FAKE_L2_DCM", "error")]
+
+
+def test_resume_measures_only_missing_event_sets(tmp_path, monkeypatch):
+    database = tmp_path / "fake.db"
+    original_select = FakeBackend.select
+
+    def failing_select(self, job, event_set):
+        if "FAKE_L2_DCM" in event_set:
+            raise RuntimeError("interrupted")
+        original_select(self, job, event_set)
+
+    monkeypatch.setattr(FakeBackend, "select", failing_select)
+    collect(database)
+    [run_id] = run_ids(database)
+    first = query(database, "SELECT event_name, average FROM event_averages")
+
+    monkeypatch.setattr(FakeBackend, "select", original_select)
+    collect(database, "--resume", str(run_id))
+
+    assert run_ids(database) == [run_id]
+    averages = query(database, "SELECT event_name, average FROM event_averages")
+    assert sorted(e for e, _ in averages) == sorted(EVENTS)
+    assert set(first) <= set(averages)  # the completed event sets were not measured again
+    assert len(query(database, "SELECT * FROM completed_event_sets")) == 2
+
+
+def test_resume_refuses_different_settings(tmp_path):
+    database = tmp_path / "fake.db"
+    collect(database)
+    [run_id] = run_ids(database)
+
+    with pytest.raises(SystemExit, match="repeat"):
+        collector.main("fake", ["-b", BENCHMARK, "-p", "S", "-r", str(REPEAT + 1), "--database", str(database),
+                                "--artifact_cache", "False", "--reuse_builds", "False",
+                                "--fake_events", *EVENTS, "--fake_event_set_size", "2", "--resume", str(run_id)])
+
+
+def test_isolated_run_writes_the_same_tables(tmp_path):
+    database = tmp_path / "fake.db"
+    collect(database, "--isolate", "True", "--timeout", "600")
+
+    assert len(query(database, "SELECT * FROM event_averages")) == len(EVENTS)
+    assert len(query(database, "SELECT * FROM completed_event_sets")) == 2
+    assert query(database, "SELECT * FROM failures") == []
@@ -0,0 +1,67 @@
+"""
+Event discovery and event set packing against the stand-in PAPI tools in bench_common/fake_papi.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+from bench_common import papi_events
+
+FAKE_PAPI = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bench_common", "fake_papi")
+sys.path.insert(0, FAKE_PAPI)
+from _model import DEFAULT_MODEL, can_count  # noqa: E402
+
+
+@pytest.fixture
+def fake_papi(monkeypatch):
+    monkeypatch.setenv("PATH", os.path.abspath(FAKE_PAPI) + os.pathsep + os.environ.get("PATH", ""))
+    monkeypatch.delenv("FAKE_PAPI_MODEL", raising=False)
+
+
+def test_available_events(fake_papi):
+    assert papi_events.get_available_papi_events() == set(DEFAULT_MODEL["events"])
+
+
+def test_addable_events(fake_papi):
+    # PAPI_FP_OPS and PAPI_DP_OPS share counter 0
+    addable = papi_events.papi_addable_events(["PAPI_FP_OPS"])
+    assert "PAPI_DP_OPS" not in addable
+    assert "PAPI_L3_DCM" in addable
+    assert papi_events.papi_addable_events(["PAPI_FP_OPS", "PAPI_DP_OPS"]) is None
+
+
+@pytest.mark.parametrize("packing", papi_events.PACKINGS)
+def test_event_sets_are_countable(fake_papi, packing):
+    events = sorted(e for e in DEFAULT_MODEL["events"] if e != "PAPI_FP_OPS")
+    event_sets = papi_events.get_papi_event_sets(events, packing=packing, use_cache=False)
+
+    measured = [e for event_set in event_sets for e in event_set]
+    assert sorted(measured) == events  # every event exactly once
+    for event_set in event_sets:
+        assert can_count(DEFAULT_MODEL, event_set)
+
+
+def test_colouring_needs_no_more_sets_than_greedy(fake_papi):
+    events = sorted(DEFAULT_MODEL["events"])
+    greedy = papi_events.get_papi_event_sets(events, packing="greedy", use_cache=False)
+    colouring = papi_events.get_papi_event_sets(events, packing="colouring", use_cache=False)
+    assert len(colouring) <= len(greedy)
+
+
+def test_event_sets_are_cached_per_machine(fake_papi, tmp_path, monkeypatch):
+    events = ["PAPI_L1_DCM", "PAPI_L1_ICM", "PAPI_L1_TCM"]
+    first = papi_events.get_papi_event_sets(events, cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+
+    # Another machine whose counters can count all three events together
+    model = dict(DEFAULT_MODEL, cpu_model="Other fake PMU", events={e: [0, 1, 2] for e in events})
+    model_path = tmp_path / "model.json"
+    model_path.write_text(json.dumps(model))
+    monkeypatch.setenv("FAKE_PAPI_MODEL", str(model_path))
+    second = papi_events.get_papi_event_sets(events, cache_dir=str(tmp_path))
+
+    assert len(first) > 1
+    assert [sorted(s) for s in second] == [sorted(events)]
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(".json") and f != "model.json"]) == 2
@@ -0,0 +1,48 @@
+"""
+Run the work-depth, total-volume, may-access and OI analyses of all benchmarks in parallel.
+
+    python work_depth_bytes_accessed/run_analyses.py -j 32 --timeout 1200 --memory_limit 16000
+    python work_depth_bytes_accessed/run_analyses.py -a op_in -b gemm atax -p L
+
+Each (benchmark, analysis) task ends in a row of the analysis_results table of --database with its
+status (success, failure, timeout, memory, crash), duration, result and traceback. Benchmarks whose
+SDFG did not change since the last run are served from the analysis store instead of analyzed again.
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.analysis_runner import (ANALYSES, print_record, print_summary, run_analyses, store_records,
+                                             update_hashes)
+from bench_common.benchmark_registry import BenchmarkRegistry, select_benchmarks
+
+# Capability of the benchmark registry each analysis needs
+REQUIRES = {"work_depth": "work_depth", "total_volume": "volume", "may_access": "auto_opt", "op_in": "simulation"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--preset", choices=['S', 'M', 'L', 'paper'], nargs="?", default='S')
+    parser.add_argument("-a", "--analyses", choices=sorted(ANALYSES), nargs="+", default=list(ANALYSES))
+    parser.add_argument("-b", "--benchmarks", type=str, nargs="+", default=None)
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Analysis processes, defaults to all cores")
+    parser.add_argument("--timeout", type=float, default=20 * 60, help="Seconds per benchmark and analysis")
+    parser.add_argument("--memory_limit", type=float, default=None, help="Resident set size limit per process in MB")
+    parser.add_argument("--sdfg", choices=["parsed", "optimized"], default=None,
+                        help="Analyze this SDFG for all analyses instead of the per-analysis default")
+    parser.add_argument("--database", type=str, default="npbench_analysis_results.db")
+    args = vars(parser.parse_args())
+
+    # Only skip benchmarks known to fail every requested analysis, the others fail per task
+    registry = BenchmarkRegistry()
+    benchmarks = [b for b in select_benchmarks(args["benchmarks"], registry=registry)
+                  if any(registry.status(b, REQUIRES[a]) is not False for a in args["analyses"])]
+    records = run_analyses(benchmarks, args["analyses"], workers=args["jobs"] or len(os.sched_getaffinity(0)),
+                           timeout=args["timeout"], memory_limit_mb=args["memory_limit"], preset=args["preset"],
+                           sdfg=args["sdfg"], on_record=print_record)
+    run_timestamp = store_records(args["database"], records)
+    print(f"Stored {len(records)} records with run_timestamp {run_timestamp} in {args['database']}")
+    changed = update_hashes(records)
+    print(f"SDFGs new or changed since the last run ({len(changed)}):", changed)
+    print_summary(records)
@@ -4,6 +4,7 @@ import subprocess
 import re
 import copy
 import os
+import sys
 import importlib
 import multiprocessing as mp
 
@@ -20,71 +21,10 @@ from dace.codegen.instrumentation import papi
 
 from npbench.infrastructure import (Benchmark, utilities as util, DaceFramework)
 
-######################################## Helper Functions #######################################################
-
-def get_bench_sdfg(bench:Benchmark, dace_framework:DaceFramework):
-        module_pypath = "npbench.benchmarks.{r}.{m}".format(r=bench.info["relative_path"].replace('/', '.'),
-                                                            m=bench.info["module_name"])
-        if "postfix" in dace_framework.info.keys():
-            postfix = dace_framework.info["postfix"]
-        else:
-            postfix = dace_framework.fname
-        module_str = "{m}_{p}".format(m=module_pypath, p=postfix)
-        func_str = bench.info["func_name"]
-
-        ldict = dict()
-        # Import DaCe implementation
-        try:
-            module = importlib.import_module(module_str)
-            ct_impl = getattr(module, func_str)
-
-        except Exception as e:
-            print("Failed to load the DaCe implementation.")
-            raise (e)
-
-        ##### Experimental: Load strict SDFG
-        sdfg_loaded = False
-        if dace_framework.load_strict:
-            path = os.path.join(os.getcwd(), 'dace_sdfgs', f"{module_str}-{func_str}.sdfg")
-            try:
-                strict_sdfg = dace.SDFG.from_file(path)
-                sdfg_loaded = True
-            except Exception:
-                pass
-
-        if not sdfg_loaded:
-            #########################################################
-            # Prepare SDFGs
-            base_sdfg, _ = util.benchmark("__npb_result = ct_impl.to_sdfg(simplify=False)",
-                                                   out_text="DaCe parsing time",
-                                                   context=locals(),
-                                                   output='__npb_result',
-                                                   verbose=False)
-            strict_sdfg = copy.deepcopy(base_sdfg)
-            strict_sdfg._name = "strict"
-            ldict['strict_sdfg'] = strict_sdfg
-            simplified_sdfg, _ = util.benchmark("strict_sdfg.simplify()",
-                                            out_text="DaCe Strict Transformations time",
-                                            context=locals(),
-                                            verbose=False)
-            # sdfg_list = [strict_sdfg]
-            # time_list = [parse_time[0] + strict_time[0]]
-        else:
-            ldict['strict_sdfg'] = strict_sdfg
-
-        ##### Experimental: Saving strict SDFG
-        if dace_framework.save_strict and not sdfg_loaded:
-            path = os.path.join(os.getcwd(), 'dace_sdfgs')
-            try:
-                os.mkdir(path)
-            except FileExistsError:
-                pass
-            path = os.path.join(os.getcwd(), 'dace_sdfgs', f"{module_str}-{func_str}.sdfg")
-            strict_sdfg.save(path)
-
-        return base_sdfg, simplified_sdfg
-
-######################################## Helper Functions end ###################################################
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.analysis_runner import print_record, print_summary, run_analyses, store_records
+from bench_common.expr_eval import evaluate
+from bench_common.benchmark_registry import select_benchmarks
 
 if __name__ == "__main__":
 
@@ -106,31 +46,14 @@ if __name__ == "__main__":
                         default=True)
     parser.add_argument("-r", "--repeat", type=int, nargs="?", default=10)
     parser.add_argument("-b", "--benchmarks", type=str, nargs="+", default=None)
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Analysis processes, defaults to all cores")
+    parser.add_argument("--timeout", type=float, default=20 * 60, help="Seconds per benchmark and analysis")
+    parser.add_argument("--memory_limit", type=float, default=None, help="Resident set size limit per process in MB")
+    parser.add_argument("--database", type=str, default="npbench_analysis_results.db")
 
     args = vars(parser.parse_args())
 
-    benchmark_set = ['adi','arc_distance','atax','azimint_hist','azimint_naive','bicg',
-                  'cavity_flow','channel_flow','cholesky2','cholesky','compute','contour_integral',
-                  'conv2d_bias','correlation',#'covariance2',
-                  'covariance','crc16','deriche',#'doitgen',
-                  'durbin','fdtd_2d','floyd_warshall','gemm',
-                  'gemver','gesummv','go_fast','gramschmidt',
-                  'hdiff','heat_3d','jacobi_1d','jacobi_2d','k2mm','k3mm','lenet','ludcmp','lu',#'mandelbrot1',
-                  #'mandelbrot2',
-                  'mlp','mvt','nbody','nussinov','resnet','scattering_self_energies','seidel_2d',
-                  'softmax','spmv',#'stockham_fft',
-                  'symm','syr2k','syrk','trisolv','trmm','vadv']
-    
-    benchmarks = list()
-    if args["benchmarks"]:
-        requested_bms = []
-        for benchmark_name in args["benchmarks"]:
-            if benchmark_name in benchmark_set:
-                benchmarks.append(benchmark_name)
-            else:
-                print(f"Could not find a benchmark with the name {benchmark_name}")
-    else:
-        benchmarks = list(benchmark_set)
+    benchmarks = select_benchmarks(args["benchmarks"], requires=("auto_opt", "volume"))
     
 
     dace_cpu_framework = DaceFramework("dace_cpu")
@@ -138,47 +61,36 @@ if __name__ == "__main__":
     preset = args["preset"]
 
     start = (int(datetime.now(timezone.utc).timestamp() * 1000))
-    ba_fail=[]
-
-    timeout_fail = []
-    error_fail = []
-    import dace.sdfg.performance_evaluation.work_depth as wd
-    import dace.sdfg.performance_evaluation.may_access_analysis as maa
-    import dace.sdfg.performance_evaluation.total_volume as tv 
-    import dace.sdfg.performance_evaluation.operational_intensity as oi
     substitute = True
-    
-    for benchmark_name in benchmarks:
-        print("="*50, benchmark_name, "="*50)
-        benchmark = Benchmark(benchmark_name)
-        sdfg, simplified_sdfg = get_bench_sdfg(benchmark, dace_cpu_framework)
-        
-        work, depth = wd.analyze_sdfg(sdfg, {}, wd.get_tasklet_work_depth, [], False)  
-
-        opt.auto_optimize(sdfg, dace.dtypes.DeviceType.CPU)
-        substitutions = benchmark.info["parameters"][preset]
-        sdfg.save("curr_sdfg.sdfg")
-        
-        
 
+    # Work-depth of the parsed and volume of the optimized SDFGs, all benchmarks in parallel
+    records = run_analyses(benchmarks, ["work_depth", "total_volume"],
+                           workers=args["jobs"] or len(os.sched_getaffinity(0)), timeout=args["timeout"],
+                           memory_limit_mb=args["memory_limit"], preset=preset, on_record=print_record)
+    store_records(args["database"], records)
+    results = defaultdict(dict)
+    for record in records:
+        if record.status == "success":
+            results[record.benchmark][record.analysis] = record.result
 
-        try:
-            vol_r, vol_w = tv.analyze_sdfg(sdfg)     
-            print("Volume read symbolic:", vol_r ,"bytes", "\nVolume write symbolic:", vol_w, "bytes")
-            oi_val = work/(vol_r+vol_w) 
-            print("OI:", oi_val.evalf(6))
-            if substitute:
-                vol_r = vol_r.subs(substitutions)
-                vol_w = vol_w.subs(substitutions)
-                work = work.subs(substitutions)
-            print(f"Volume read with subs for preset [{preset}]:", vol_r, "bytes", f"\nVolume write with subs for preset [{preset}]:", vol_w, "bytes")
-            oi_val = work/(vol_r+vol_w) 
-            print("OI:", oi_val.evalf(6))
-        except Exception as e:
-            print(traceback.print_exc())
-            ba_fail.append(benchmark_name)
+    for benchmark_name in benchmarks:
+        if "work_depth" not in results[benchmark_name] or "total_volume" not in results[benchmark_name]:
+            continue
+        print("="*50, benchmark_name, "="*50)
+        substitutions = Benchmark(benchmark_name).info["parameters"][preset]
+        work, depth = results[benchmark_name]["work_depth"]
+        vol_r, vol_w = results[benchmark_name]["total_volume"]
+        print("Volume read symbolic:", vol_r ,"bytes", "\nVolume write symbolic:", vol_w, "bytes")
+        print("OI:", f"({work})/({vol_r} + {vol_w})")
+        if substitute:
+            vol_r = evaluate(vol_r, substitutions)
+            vol_w = evaluate(vol_w, substitutions)
+            work = evaluate(work, substitutions)
+        print(f"Volume read with subs for preset [{preset}]:", vol_r, "bytes", f"\nVolume write with subs for preset [{preset}]:", vol_w, "bytes")
+        oi_val = work/(vol_r+vol_w) 
+        print("OI:", f"{oi_val:.6g}")
 
     end = (int(datetime.now(timezone.utc).timestamp() * 1000))
 
     print("Duration:",  (end - start)/(1000*60), "min")
-    print("Total vol failed for:", ba_fail)
+    print_summary(records)
@@ -0,0 +1,84 @@
+"""
+Regenerate the volumes table read by the roofline plots (read_volume_table of the analysis store).
+
+Each benchmark is analyzed once through the analysis runner, work-depth of the parsed and total volume
+of the auto-optimized SDFG as in test_volume.py, with a time and memory limit per analysis. Then all
+presets are substituted in one vectorized pass per expression:
+
+    python work_depth_bytes_accessed/volume_table.py -j 16 --timeout 1200
+    python work_depth_bytes_accessed/volume_table.py -b gemm atax -p S L -o /tmp/volumes
+
+The rows of the analyzed benchmarks and presets replace their rows in <output>.csv, the other rows are
+kept. Benchmarks whose analysis fails or times out get rows with empty values, and the records of all
+analyses go to the analysis_results table of --database. If pyarrow or fastparquet is installed, the
+table is also written to <output>.parquet.
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from bench_common.analysis_runner import print_record, print_summary, run_analyses, store_records
+from bench_common.analysis_store import VOLUME_COLUMNS, VOLUME_TABLE, preset_table
+from bench_common.benchmark_registry import select_benchmarks
+
+PRESETS = ['S', 'M', 'L', 'paper']
+DEFAULT_OUTPUT = os.path.splitext(VOLUME_TABLE)[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--presets", choices=PRESETS, nargs="+", default=PRESETS)
+    parser.add_argument("-b", "--benchmarks", type=str, nargs="+", default=None)
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Analysis processes, defaults to all cores")
+    parser.add_argument("--timeout", type=float, default=20 * 60, help="Seconds per benchmark and analysis")
+    parser.add_argument("--memory_limit", type=float, default=None, help="Resident set size limit per process in MB")
+    parser.add_argument("--database", type=str, default="npbench_analysis_results.db")
+    parser.add_argument("-o", "--output", type=str, default=DEFAULT_OUTPUT, help="Output path without extension")
+    args = vars(parser.parse_args())
+
+    benchmarks = select_benchmarks(args["benchmarks"], requires=("auto_opt", "volume"))
+
+    records = run_analyses(benchmarks, ["work_depth", "total_volume"],
+                           workers=args["jobs"] or len(os.sched_getaffinity(0)), timeout=args["timeout"],
+                           memory_limit_mb=args["memory_limit"], on_record=print_record)
+    store_records(args["database"], records)
+
+    results, failed = defaultdict(dict), dict()
+    for record in records:
+        if record.status == "success":
+            results[record.benchmark][record.analysis] = record.result
+        else:
+            failed[record.benchmark] = f"{record.analysis} {record.status}: {record.detail}"
+
+    # Keep the benchmark order of the registry, failed benchmarks get rows with empty values
+    volumes = dict()
+    for benchmark_name in benchmarks:
+        if benchmark_name in failed:
+            volumes[benchmark_name] = None
+            continue
+        work, _ = results[benchmark_name]["work_depth"]
+        vol_r, vol_w = results[benchmark_name]["total_volume"]
+        volumes[benchmark_name] = (vol_r, vol_w, work)
+    table = preset_table(volumes, args["presets"], failed)
+
+    path = f"{args['output']}.csv"
+    if os.path.isfile(path):
+        previous = pd.read_csv(path).astype({c: "Int64" for c in VOLUME_COLUMNS[2:]})
+        replaced = previous.set_index(["kernel", "preset"]).index.isin(table.set_index(["kernel", "preset"]).index)
+        table = pd.concat([previous[~replaced], table], ignore_index=True)
+    table.to_csv(path, index=False)
+    print(f"Saved {path}")
+    try:
+        table.to_parquet(f"{args['output']}.parquet", index=False)
+        print(f"Saved {args['output']}.parquet")
+    except ImportError as e:
+        print(f"Parquet output skipped: {e}")
+
+    for benchmark_name, error in failed.items():
+        print("="*50, benchmark_name, "="*50)
+        print(error)
+    print_summary(records)